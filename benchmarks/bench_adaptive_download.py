@@ -0,0 +1,51 @@
+"""
+Concurrence fixe contre limiteur AIMD (core.download_control.AdaptiveLimiter)
+sur le serveur local benchmarks/statement_server.py, dont la capacité est
+limitée (429 au-delà). Les relevés refusés sont retéléchargés jusqu'au succès.
+
+Usage: python benchmarks/bench_adaptive_download.py [<nb_relevés>] [<capacité_serveur>] [<latence_s>]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import logging
+import time
+from core.async_downloader import AsyncStatementDownloader
+from core.download_control import AdaptiveLimiter
+from benchmarks.statement_server import StatementServer, synthetic_fixtures
+
+FIXED_LIMITS = (6, 64)
+ADAPTIVE_MAX = 64
+
+
+def download_until_done(downloader, clients):
+    """Relance les échecs jusqu'à ce que tous les relevés soient téléchargés ; retourne le nombre de tentatives."""
+    attempts = 0
+    remaining = clients
+    while remaining:
+        attempts += len(remaining)
+        results = downloader.download_all(remaining, "2017-01-01", "2025-04-10")
+        remaining = [client for client, _, error in results if error]
+    return attempts
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    n_statements = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    capacity = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.2
+    clients = [{"nom": f"Client {i}", "client_id": i} for i in range(n_statements)]
+    print(f"{n_statements} relevés, capacité serveur {capacity}, latence {latency}s")
+    with StatementServer(synthetic_fixtures(), latency, capacity=capacity) as server:
+        runs = [(f"fixe ({limit})", limit, None) for limit in FIXED_LIMITS]
+        runs.append((f"AIMD (6 → {ADAPTIVE_MAX})", ADAPTIVE_MAX, AdaptiveLimiter(initial=6, max_limit=ADAPTIVE_MAX)))
+        for label, max_per_host, limiter in runs:
+            server.rejected_count = 0
+            with AsyncStatementDownloader({"session": "bench"}, max_per_host=max_per_host, api_url=server.url,
+                                          limiter=limiter) as downloader:
+                start = time.perf_counter()
+                attempts = download_until_done(downloader, clients)
+                elapsed = time.perf_counter() - start
+            final = f", limite finale {limiter.limit}" if limiter else ""
+            print(f"{label:>16} : {elapsed:.2f}s, {attempts} requêtes, {server.rejected_count} refus 429{final}")
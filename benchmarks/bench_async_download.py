@@ -0,0 +1,57 @@
+"""
+Compare le téléchargement des relevés par threads (requests.Session partagée,
+comme PharmaScraper avec DOWNLOAD_WORKERS) et par AsyncStatementDownloader
+(httpx) sur le serveur local benchmarks/statement_server.py.
+
+Usage: python benchmarks/bench_async_download.py [<nb_relevés>] [<latence_s>]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import logging
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from core.async_downloader import AsyncStatementDownloader
+from benchmarks.statement_server import StatementServer, synthetic_fixtures
+
+THREAD_WORKERS = 6
+ASYNC_LIMITS = (6, 32, 128)
+
+
+def download_with_threads(url, clients, workers):
+    session = requests.Session()
+
+    def fetch(client):
+        params = {"type": "advanced", "start_date": "2017-01-01", "end_date": "2025-04-10",
+                  "customer_id": client["client_id"]}
+        response = session.get(url, params=params, timeout=30)
+        if response.status_code != 200 or len(response.content) < 1000:
+            raise Exception(f"Réponse invalide pour {client['nom']}")
+        return len(response.content)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(fetch, clients))
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    n_statements = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    clients = [{"nom": f"Client {i}", "client_id": i} for i in range(n_statements)]
+    with StatementServer(synthetic_fixtures(), latency) as server:
+        print(f"{n_statements} relevés, latence serveur {latency}s")
+        start = time.perf_counter()
+        download_with_threads(server.url, clients, THREAD_WORKERS)
+        elapsed = time.perf_counter() - start
+        print(f"threads ({THREAD_WORKERS:>3})  : {elapsed:.2f}s ({n_statements / elapsed:.1f} relevés/s)")
+        for limit in ASYNC_LIMITS:
+            server.max_in_flight = 0
+            with AsyncStatementDownloader({"session": "bench"}, max_per_host=limit, api_url=server.url) as downloader:
+                start = time.perf_counter()
+                results = downloader.download_all(clients, "2017-01-01", "2025-04-10")
+                elapsed = time.perf_counter() - start
+            errors = sum(1 for _, _, error in results if error)
+            print(f"async ({limit:>3})    : {elapsed:.2f}s ({n_statements / elapsed:.1f} relevés/s, "
+                  f"{server.max_in_flight} requêtes simultanées max, {errors} erreur(s))")
@@ -0,0 +1,121 @@
+"""
+Latence par client de la sauvegarde (suppression + insertion) et de la lecture
+de simple_transactions sur une base volumineuse, avant et après les migrations
+de database/migrations.py (index (nom, date) et identité stable des lignes).
+Après migration, la ligne « inchangé » mesure la sauvegarde d'un relevé identique
+au précédent : l'upsert ne réécrit alors aucune ligne.
+La base « avant » est créée avec le schéma d'origine, sans aucun index, puis
+ouverte avec DBManager, qui applique les migrations.
+
+Usage: python benchmarks/bench_db_indexes.py [<nb_lignes>] [<lignes_par_client>] [<nb_mesures>]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import datetime
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from database.db_manager import DBManager
+
+LEGACY_SCHEMA = """
+    CREATE TABLE simple_transactions (nom TEXT, date TEXT, reference TEXT, libelle TEXT, total REAL, solde REAL);
+    CREATE TABLE client_keys (nom TEXT PRIMARY KEY, client_key TEXT);
+    CREATE TABLE solde_final (nom TEXT PRIMARY KEY, solde REAL);
+"""
+FIRST_DAY = datetime.date(2017, 1, 1)
+
+
+def client_rows(name, n_rows):
+    """Lignes synthétiques d'un client, quelques-unes par jour, dans l'ordre du relevé."""
+    rows = []
+    solde = 0.0
+    for i in range(n_rows):
+        total = round(random.uniform(-500, 500), 2)
+        solde = round(solde + total, 2)
+        rows.append({"nom": name, "date": (FIRST_DAY + datetime.timedelta(days=i // 3)).isoformat(),
+                     "reference": f"VNT-{i:06d}", "libelle": "Vente", "total": total, "solde": solde,
+                     "type": 0})
+    return rows
+
+
+def build_legacy_db(path, n_rows, rows_per_client):
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    for start in range(0, n_rows, rows_per_client):
+        conn.executemany("""
+            INSERT INTO simple_transactions (nom, date, reference, libelle, total, solde)
+            VALUES (:nom, :date, :reference, :libelle, :total, :solde)
+        """, client_rows(f"Client {start // rows_per_client}", min(rows_per_client, n_rows - start)))
+    conn.commit()
+    conn.close()
+
+
+def measure(save, select, names, rows_per_client):
+    """Médiane (ms) de la sauvegarde puis de la lecture complète d'un client."""
+    saves, selects = [], []
+    for name in names:
+        rows = client_rows(name, rows_per_client)
+        start = time.perf_counter()
+        save(name, rows)
+        saves.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        select(name)
+        selects.append(time.perf_counter() - start)
+    return statistics.median(saves) * 1000, statistics.median(selects) * 1000
+
+
+if __name__ == "__main__":
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    rows_per_client = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    n_samples = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    random.seed(0)
+    names = [f"Client {i}" for i in random.sample(range(n_rows // rows_per_client), n_samples)]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "bench_indexes.db")
+        start = time.perf_counter()
+        build_legacy_db(path, n_rows, rows_per_client)
+        print(f"{n_rows} lignes ({n_rows // rows_per_client} clients) créées en {time.perf_counter() - start:.1f}s")
+
+        conn = sqlite3.connect(path)
+
+        def legacy_save(name, rows):
+            conn.execute("DELETE FROM simple_transactions WHERE nom = ?", (name,))
+            conn.executemany("""
+                INSERT INTO simple_transactions (nom, date, reference, libelle, total, solde)
+                VALUES (:nom, :date, :reference, :libelle, :total, :solde)
+            """, rows)
+            conn.commit()
+
+        def legacy_select(name):
+            conn.execute("SELECT * FROM simple_transactions WHERE nom = ?", (name,)).fetchall()
+
+        before = measure(legacy_save, legacy_select, names, rows_per_client)
+        conn.close()
+
+        start = time.perf_counter()
+        db = DBManager(path)
+        print(f"Migrations appliquées en {time.perf_counter() - start:.1f}s")
+        conn = db.connect()
+
+        def save(name, rows):
+            db._save_simple_transactions(conn, rows, rows[-1]["solde"], {"nom": name}, None)
+            conn.commit()
+
+        def select(name):
+            conn.execute("SELECT nom, date, reference, libelle, total, solde FROM simple_transactions "
+                         "WHERE nom = ? ORDER BY date, ordre", (name,)).fetchall()
+
+        after = measure(save, select, names, rows_per_client)
+        stored = {name: client_rows(name, rows_per_client) for name in names}
+        for name in names:
+            save(name, stored[name])
+        unchanged = measure(lambda name, rows: save(name, stored[name]), select, names, rows_per_client)
+        conn.close()
+
+    print(f"{'':>8} {'sauvegarde':>12} {'lecture':>10}")
+    for label, (save_ms, select_ms) in (("avant", before), ("après", after), ("inchangé", unchanged)):
+        print(f"{label:>8} {save_ms:>10.1f}ms {select_ms:>8.1f}ms")
@@ -0,0 +1,47 @@
+"""
+Débit de l'étape d'analyse de runners/detailed_pdf.py (ProcessPoolExecutor
+sur parse_pdf_file) selon le nombre de processus.
+
+Usage: python benchmarks/bench_parse_pool.py [<nb_pdfs>] [<pages_par_pdf>]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import contextlib
+import io
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from core.pdf_processor import parse_pdf_file
+from benchmarks.synthetic_statement import generate_statement
+
+WORKER_COUNTS = (1, 2, 4, 8)
+
+
+def parse_quietly(pdf_file, client):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return parse_pdf_file(pdf_file, client)
+
+
+if __name__ == "__main__":
+    n_pdfs = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    n_pages = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    print(f"{n_pdfs} relevés synthétiques de {n_pages} pages, {os.cpu_count()} CPU disponibles")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdf_files = []
+        for i in range(n_pdfs):
+            pdf_path = os.path.join(tmp_dir, f"statement_{i}.pdf")
+            generate_statement(pdf_path, n_pages=n_pages, seed=i)
+            pdf_files.append(pdf_path)
+        clients = [{"nom": f"Client {i}"} for i in range(n_pdfs)]
+
+        for workers in WORKER_COUNTS:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # Démarrage des processus hors chronométrage
+                list(executor.map(int, range(workers)))
+                start = time.perf_counter()
+                results = list(executor.map(parse_quietly, pdf_files, clients))
+                elapsed = time.perf_counter() - start
+            n_rows = sum(len(records) for records, _ in results)
+            print(f"{workers} processus : {elapsed:.2f}s, {n_pdfs / elapsed:.2f} PDF/s, {n_rows / elapsed:.0f} lignes/s")
@@ -0,0 +1,42 @@
+"""
+Pipeline complet de runners/detailed_pdf.py (téléchargement → analyse → écriture)
+sur le serveur local benchmarks/statement_server.py, avec une base SQLite temporaire.
+Affiche la durée totale et, via les journaux du pipeline, la profondeur des files
+et l'occupation de chaque étape ; la durée totale doit rester proche de celle de
+l'étape la plus lente et non de leur somme.
+
+Usage: python benchmarks/bench_pipeline.py [<nb_clients>] [<latence_s>] [<pages_par_pdf>]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import contextlib
+import io
+import logging
+import tempfile
+import time
+from runners import detailed_pdf
+from core.async_downloader import AsyncStatementDownloader
+from database.db_manager import DBManager
+from benchmarks.statement_server import StatementServer, synthetic_fixtures
+
+if __name__ == "__main__":
+    n_clients = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    n_pages = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger(detailed_pdf.__name__).setLevel(logging.INFO)
+    detailed_pdf.STATS_INTERVAL = 5
+    clients = [{"nom": f"Client {i}", "client_id": i} for i in range(n_clients)]
+    with tempfile.TemporaryDirectory() as tmp_dir, \
+            StatementServer(synthetic_fixtures(n_pages=n_pages), latency) as server, \
+            AsyncStatementDownloader({"session": "bench"}, max_per_host=16, api_url=server.url) as downloader:
+        db = DBManager(os.path.join(tmp_dir, "bench_pipeline.db"))
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            failed = detailed_pdf.run_pipeline(clients, None, db, "2017-01-01", "2025-04-10", 16,
+                                               detailed_pdf.PARSE_WORKERS, lambda client, error: None,
+                                               downloader=downloader)
+        elapsed = time.perf_counter() - start
+    print(f"{n_clients} clients en {elapsed:.2f}s ({n_clients / elapsed:.1f} clients/s), {len(failed)} échec(s)")
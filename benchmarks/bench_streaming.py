@@ -0,0 +1,48 @@
+"""
+Compare les modes liste et streaming de PDFProcessor.extract_detailed_data
+sur un relevé synthétique de 50 pages.
+
+Usage: python benchmarks/bench_streaming.py [<pages>] [<pages_annexe>]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import contextlib
+import io
+import tempfile
+import time
+import tracemalloc
+from core.pdf_processor import PDFProcessor
+from benchmarks.synthetic_statement import generate_statement
+
+
+def measure(processor, pdf_path, repeat=3):
+    """Meilleur temps sur `repeat` exécutions, puis pic mémoire (tracemalloc) sur une exécution dédiée."""
+    client = {"nom": "Client Benchmark"}
+    best_time = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            records, solde_final = processor.extract_detailed_data(pdf_path, client)
+        elapsed = time.perf_counter() - start
+        best_time = elapsed if best_time is None else min(best_time, elapsed)
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        processor.extract_detailed_data(pdf_path, client)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best_time, peak, len(records), solde_final
+
+
+if __name__ == "__main__":
+    n_pages = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    trailing_pages = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdf_path = os.path.join(tmp_dir, "statement.pdf")
+        n_rows = generate_statement(pdf_path, n_pages=n_pages, trailing_pages=trailing_pages)
+        print(f"Relevé synthétique : {n_pages} pages + {trailing_pages} pages d'annexe, {n_rows} transactions")
+        for label, processor in (("liste", PDFProcessor(streaming=False)), ("streaming", PDFProcessor(streaming=True))):
+            elapsed, peak, n_records, solde_final = measure(processor, pdf_path)
+            print(f"{label:>10} : {elapsed:.2f}s, pic mémoire {peak / 1024 / 1024:.1f} Mo, "
+                  f"{n_records} lignes, solde final {solde_final}")
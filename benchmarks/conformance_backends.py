@@ -0,0 +1,66 @@
+"""
+Vérifie que tous les backends de texte (TEXT_BACKENDS) produisent exactement
+les mêmes lignes simple_transactions, et mesure le temps d'extraction par page.
+
+Corpus : relevés synthétiques, plus les PDFs d'un dossier optionnel (relevés réels).
+Usage: python benchmarks/conformance_backends.py [<dossier_pdfs>]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import contextlib
+import io
+import tempfile
+import time
+from core.pdf_processor import PDFProcessor, TEXT_BACKENDS
+from benchmarks.synthetic_statement import generate_statement
+
+SYNTHETIC_CORPUS = [(1, 0), (3, 1), (10, 2), (25, 3)]  # (pages, seed)
+
+
+def build_corpus(tmp_dir, fixtures_dir=None):
+    corpus = []
+    for n_pages, seed in SYNTHETIC_CORPUS:
+        pdf_path = os.path.join(tmp_dir, f"synthetic_{n_pages}p_{seed}.pdf")
+        generate_statement(pdf_path, n_pages=n_pages, trailing_pages=1, seed=seed)
+        corpus.append(pdf_path)
+    if fixtures_dir:
+        corpus.extend(
+            os.path.join(fixtures_dir, name) for name in sorted(os.listdir(fixtures_dir)) if name.lower().endswith(".pdf")
+        )
+    return corpus
+
+
+if __name__ == "__main__":
+    fixtures_dir = sys.argv[1] if len(sys.argv) > 1 else None
+    client = {"nom": "Client Conformité"}
+    mismatches = 0
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        corpus = build_corpus(tmp_dir, fixtures_dir)
+        timings = {name: [0.0, 0] for name in TEXT_BACKENDS}
+        for pdf_path in corpus:
+            results = {}
+            for name, backend_class in TEXT_BACKENDS.items():
+                start = time.perf_counter()
+                nb_pages = sum(1 for _ in backend_class().iter_pages(pdf_path))
+                timings[name][0] += time.perf_counter() - start
+                timings[name][1] += nb_pages
+                with contextlib.redirect_stdout(io.StringIO()):
+                    results[name] = PDFProcessor(backend=name).extract_detailed_data(pdf_path, client)
+            reference = results["pdfplumber"]
+            for name, result in results.items():
+                if result != reference:
+                    mismatches += 1
+                    print(f"ÉCART {name} vs pdfplumber sur {os.path.basename(pdf_path)}")
+            print(f"{os.path.basename(pdf_path)} : {len(reference[0])} lignes, solde final {reference[1]}")
+
+        reference_time = timings["pdfplumber"][0] / timings["pdfplumber"][1]
+        for name, (elapsed, nb_pages) in timings.items():
+            per_page = elapsed / nb_pages
+            print(f"{name:>10} : {per_page * 1000:.1f} ms/page (x{reference_time / per_page:.1f} vs pdfplumber)")
+
+    if mismatches:
+        print(f"{mismatches} écart(s) détecté(s)")
+        sys.exit(1)
+    print("Tous les backends sont conformes")
@@ -0,0 +1,149 @@
+"""
+Serveur HTTP local qui remplace api.pharma.sobrus.com pour les tests de
+téléchargement : /customers/export-customer-statement renvoie un PDF de
+fixture (choisi par customer_id) après une latence configurable. Avec
+capacity, les requêtes au-delà de cette concurrence reçoivent un 429
+(avec Retry-After si retry_after est fourni), comme une API saturée ; avec
+errors, certains customer_id reçoivent une erreur HTTP fixe.
+
+Usage: python benchmarks/statement_server.py [<port>] [<latence_s>] [<dossier_pdfs>]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from benchmarks.synthetic_statement import generate_statement
+
+STATEMENT_PATH = "/customers/export-customer-statement"
+
+
+class _Server(ThreadingHTTPServer):
+    request_queue_size = 1024  # File d'attente des connexions (5 par défaut)
+    daemon_threads = True
+
+
+class StatementServer:
+    """
+    fixtures : liste de PDFs (bytes) servis selon customer_id modulo leur nombre.
+    latency : délai (secondes) avant chaque réponse, simulant le rendu côté serveur.
+    capacity : requêtes simultanées acceptées (illimité si None), 429 au-delà.
+    errors : {customer_id: (code HTTP, Retry-After ou None)} renvoyés à la place du PDF.
+    """
+
+    def __init__(self, fixtures, latency=0.0, port=0, capacity=None, retry_after=None, errors=None):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.capacity = capacity
+        self.retry_after = retry_after
+        self.errors = errors or {}
+        self.rejected_count = 0
+        self.requests_count = 0
+        self.max_in_flight = 0
+        self.in_flight = 0
+        self.lock = threading.Lock()
+        self.server = _Server(("127.0.0.1", port), self._handler_class())
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}{STATEMENT_PATH}"
+
+    def _handler_class(self):
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Connexions keep-alive
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                if parts.path != STATEMENT_PATH:
+                    self.send_error(404)
+                    return
+                params = parse_qs(parts.query)
+                customer_id = int(params.get("customer_id", ["0"])[0])
+                with owner.lock:
+                    owner.requests_count += 1
+                    owner.in_flight += 1
+                    owner.max_in_flight = max(owner.max_in_flight, owner.in_flight)
+                    overloaded = owner.capacity is not None and owner.in_flight > owner.capacity
+                    if overloaded:
+                        owner.rejected_count += 1
+                try:
+                    if overloaded or customer_id in owner.errors:
+                        status, retry_after = (429, owner.retry_after) if overloaded else owner.errors[customer_id]
+                        body = self.responses[status][0].encode()
+                        self.send_response(status)
+                        if retry_after is not None:
+                            self.send_header("Retry-After", str(retry_after))
+                        self.send_header("Content-Length", str(len(body)))
+                        self.end_headers()
+                        self.wfile.write(body)
+                        return
+                    time.sleep(owner.latency)
+                    body = owner.fixtures[customer_id % len(owner.fixtures)]
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/pdf")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                finally:
+                    with owner.lock:
+                        owner.in_flight -= 1
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def synthetic_fixtures(count=4, n_pages=3):
+    """Génère count relevés synthétiques et retourne leur contenu."""
+    fixtures = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for seed in range(count):
+            pdf_path = os.path.join(tmp_dir, f"fixture_{seed}.pdf")
+            generate_statement(pdf_path, n_pages=n_pages, seed=seed)
+            with open(pdf_path, 'rb') as f:
+                fixtures.append(f.read())
+    return fixtures
+
+
+def load_fixtures(fixtures_dir):
+    fixtures = []
+    for name in sorted(os.listdir(fixtures_dir)):
+        if name.lower().endswith(".pdf"):
+            with open(os.path.join(fixtures_dir, name), 'rb') as f:
+                fixtures.append(f.read())
+    return fixtures
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    fixtures = load_fixtures(sys.argv[3]) if len(sys.argv) > 3 else synthetic_fixtures()
+    server = StatementServer(fixtures, latency, port).start()
+    print(f"Serveur de relevés sur {server.url} ({len(fixtures)} PDFs, latence {latency}s)")
+    try:
+        server.thread.join()
+    except KeyboardInterrupt:
+        server.stop()
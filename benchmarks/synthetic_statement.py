@@ -0,0 +1,147 @@
+"""
+Générateur de relevés clients synthétiques au format Sobrus (export-customer-statement).
+
+Le relevé contient un en-tête (pharmacie, bloc adresse du client, période, solde
+initial), le tableau "Date Transaction N° Libellé Total Solde" répété sur chaque
+page, des lignes de vente / paiement / retour / avoir, des pieds de page et le
+solde final. Totaux et soldes utilisent les séparateurs de milliers (1 929,90).
+
+Chaque retour ou avoir est suivi le même jour d'un paiement du même montant,
+que extract_detailed_data neutralise : la colonne Solde et le solde final sont
+calculés selon les mêmes règles, le solde recalculé doit donc tomber juste.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import datetime
+import random
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 en points
+TOP_MARGIN, BOTTOM_MARGIN = 60, 60
+LINE_HEIGHT = 16
+FONT_SIZE = 9
+COLUMNS = {"date": 40, "transaction": 110, "libelle": 200, "total": 430, "solde": 500}
+ROWS_PER_PAGE = (PAGE_HEIGHT - TOP_MARGIN - BOTTOM_MARGIN) // LINE_HEIGHT - 3
+FIRST_PAGE_HEADER_LINES = 8
+
+# Répartition des événements : (type, poids)
+EVENT_WEIGHTS = (("vente", 60), ("paiement", 28), ("retour", 6), ("avoir", 6))
+
+
+def format_montant(value):
+    """Formate un montant à la française : 1 929,90"""
+    signe = "-" if value < 0 else ""
+    entier, decimales = f"{abs(value):.2f}".split(".")
+    groupes = []
+    while entier:
+        groupes.insert(0, entier[-3:])
+        entier = entier[:-3]
+    return f"{signe}{' '.join(groupes)},{decimales}"
+
+
+def generate_rows(n_lines, solde_initial=1500.0, seed=0):
+    """
+    Produit n_lines lignes (date, transaction, libellé, total, solde) en appliquant
+    les règles de netting du parseur. Les totaux suivent une loi log-uniforme de
+    5 à environ 16 000 : un tiers environ dépasse 1 000.
+    """
+    rng = random.Random(seed)
+    types, weights = zip(*EVENT_WEIGHTS)
+    date = datetime.date(2017, 1, 1)
+    solde = solde_initial
+    rows = []
+    while len(rows) < n_lines:
+        event = rng.choices(types, weights)[0]
+        montant = round(10 ** rng.uniform(0.7, 4.2), 2)
+        if event in ("retour", "avoir") and len(rows) + 2 <= n_lines:
+            # Jour dédié : retour/avoir et son paiement de remboursement (neutralisé)
+            date += datetime.timedelta(days=1)
+            libelle = "- Retour vente" if event == "retour" else "- Avoir client"
+            prefix = "RET" if event == "retour" else "AVO"
+            solde = round(solde - montant, 2)
+            rows.append((date, f"{prefix}{len(rows) + 1:06d}", libelle, montant, solde))
+            rows.append((date, f"PAI{len(rows) + 1:06d}", "- Paiement", montant, solde))
+            date += datetime.timedelta(days=1)
+            continue
+        if event == "paiement":
+            libelle, prefix = "- Paiement vente", "PAI"
+            solde = round(solde - montant, 2)
+        else:
+            libelle, prefix = "- Vente", "VTE"
+            solde = round(solde + montant, 2)
+        date += datetime.timedelta(days=rng.randint(0, 1))
+        rows.append((date, f"{prefix}{len(rows) + 1:06d}", libelle, montant, solde))
+    return rows
+
+
+def _insert_row(page, y, cells):
+    for text, x in zip(cells, COLUMNS.values()):
+        page.insert_text((x, y), text, fontsize=FONT_SIZE)
+
+
+def generate_statement(path, n_lines=None, n_pages=None, trailing_pages=0, solde_initial=1500.0, seed=0,
+                       solde_final_x=40):
+    """
+    Écrit un relevé synthétique de n_lines transactions (ou de n_pages pages pleines).
+    trailing_pages ajoute des pages d'annexe après le "Solde final" ; solde_final_x
+    place ce dernier dans la marge gauche s'il est inférieur à la colonne Date (40).
+    Retourne le nombre de lignes de transactions écrites.
+    """
+    import pymupdf
+
+    if n_lines is None:
+        n_lines = (n_pages or 1) * ROWS_PER_PAGE - FIRST_PAGE_HEADER_LINES
+    rows = generate_rows(n_lines, solde_initial, seed)
+    solde_final = rows[-1][4] if rows else solde_initial
+    rng = random.Random(seed)
+    first_page_rows = ROWS_PER_PAGE - FIRST_PAGE_HEADER_LINES
+    nb_pages = 1 + max(0, -(-(len(rows) - first_page_rows) // ROWS_PER_PAGE))
+
+    doc = pymupdf.open()
+    index = 0
+    for page_number in range(1, nb_pages + 1):
+        page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        y = TOP_MARGIN
+        if page_number == 1:
+            page.insert_text((40, y), "Pharmacie Synthétique", fontsize=FONT_SIZE + 3)
+            page.insert_text((360, y), "Client : SARL Exemple", fontsize=FONT_SIZE)
+            y += LINE_HEIGHT
+            page.insert_text((40, y), "12, avenue des Tests - Casablanca", fontsize=FONT_SIZE)
+            page.insert_text((360, y), "45 rue 2025, Quartier 17", fontsize=FONT_SIZE)
+            y += LINE_HEIGHT
+            page.insert_text((40, y), "Tél : 05 22 00 00 00", fontsize=FONT_SIZE)
+            page.insert_text((360, y), "ICE 001234567000089", fontsize=FONT_SIZE)
+            y += 2 * LINE_HEIGHT
+            page.insert_text((40, y), "Relevé de compte client", fontsize=FONT_SIZE + 2)
+            y += LINE_HEIGHT
+            first_date = rows[0][0] if rows else datetime.date(2017, 1, 1)
+            last_date = rows[-1][0] if rows else first_date
+            page.insert_text((40, y), f"Période du {first_date:%d/%m/%Y} au {last_date:%d/%m/%Y}", fontsize=FONT_SIZE)
+            y += LINE_HEIGHT
+            page.insert_text((40, y), f"Solde initial : {format_montant(solde_initial)}", fontsize=FONT_SIZE)
+            y += LINE_HEIGHT
+        _insert_row(page, y, ("Date", "Transaction N°", "Libellé", "Total", "Solde"))
+        y += LINE_HEIGHT
+        capacity = first_page_rows if page_number == 1 else ROWS_PER_PAGE
+        for date, transaction, libelle, montant, solde in rows[index:index + capacity]:
+            _insert_row(page, y, (date.isoformat(), transaction, libelle, format_montant(montant), format_montant(solde)))
+            y += LINE_HEIGHT
+        index += capacity
+        if page_number == nb_pages:
+            page.insert_text((solde_final_x, y + LINE_HEIGHT), f"Solde final : {format_montant(solde_final)}", fontsize=FONT_SIZE)
+        page.insert_text((40, PAGE_HEIGHT - 30), "Document généré par Sobrus Pharma", fontsize=FONT_SIZE - 1)
+        page.insert_text((PAGE_WIDTH - 100, PAGE_HEIGHT - 30), f"Page {page_number} / {nb_pages}", fontsize=FONT_SIZE - 1)
+
+    for annex_number in range(trailing_pages):
+        page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        y = TOP_MARGIN
+        page.insert_text((40, y), f"Annexe {annex_number + 1} - Détail des articles", fontsize=FONT_SIZE + 1)
+        while y < PAGE_HEIGHT - BOTTOM_MARGIN:
+            y += LINE_HEIGHT
+            page.insert_text((40, y), f"Article {rng.randint(1000, 9999)} Quantité {rng.randint(1, 20)}",
+                             fontsize=FONT_SIZE)
+
+    doc.save(path)
+    doc.close()
+    return len(rows)
@@ -0,0 +1,89 @@
+"""
+Benchmarks pytest-benchmark du parseur de relevés sur des PDFs synthétiques
+(benchmarks/synthetic_statement.py, 10 à 5 000 lignes) : extract_sorted_lines,
+parse_line et extract_detailed_data sont mesurés séparément. Les lignes par
+seconde et le pic de RSS (mesuré dans un processus neuf) sont ajoutés à
+extra_info, conservé par --benchmark-autosave pour suivre l'évolution d'un
+commit à l'autre.
+
+Usage: python -m pytest benchmarks --benchmark-autosave [--benchmark-compare]
+"""
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import pytest
+from core.pdf_processor import PDFProcessor, DEFAULT_TEXT_BACKEND
+from benchmarks.synthetic_statement import generate_statement
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SIZES = (10, 100, 1000, 5000)
+CLIENT = {"nom": "Client Benchmark"}
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss est en octets sous macOS, en kilo-octets sous Linux
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def run_stage(stage, pdf_path):
+    """Exécuté dans un processus neuf : un passage de l'étape, retourne le pic de RSS en Mo."""
+    processor = PDFProcessor()
+    if stage == "extract_detailed_data":
+        processor.extract_detailed_data(pdf_path, CLIENT)
+    else:
+        lines = processor.extract_sorted_lines(pdf_path)
+        if stage == "parse_line":
+            [processor.parse_line(line) for line in lines]
+    return peak_rss_mb()
+
+
+def record(benchmark, stage, pdf_path, count):
+    if benchmark.stats is None:
+        return  # --benchmark-disable : un seul passage, vérifications seulement
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        rss = executor.submit(run_stage, stage, pdf_path).result()
+    benchmark.extra_info.update({
+        "backend": DEFAULT_TEXT_BACKEND,
+        "lignes": count,
+        "lignes_par_s": round(count / benchmark.stats.stats.median, 1),
+        "peak_rss_mb": rss and round(rss, 1),
+    })
+
+
+@pytest.fixture(scope="module", params=SIZES, ids=lambda n_lines: f"{n_lines}_lignes")
+def statement(request, tmp_path_factory):
+    n_lines = request.param
+    pdf_path = str(tmp_path_factory.mktemp("releves") / f"statement_{n_lines}.pdf")
+    generate_statement(pdf_path, n_lines=n_lines, seed=n_lines)
+    return pdf_path, n_lines
+
+
+def test_extract_sorted_lines(benchmark, statement):
+    pdf_path, n_lines = statement
+    lines = benchmark(PDFProcessor().extract_sorted_lines, pdf_path)
+    assert len(lines) > n_lines
+    record(benchmark, "extract_sorted_lines", pdf_path, len(lines))
+
+
+def test_parse_line(benchmark, statement):
+    pdf_path, n_lines = statement
+    processor = PDFProcessor()
+    lines = processor.extract_sorted_lines(pdf_path)
+    parsed = benchmark(lambda: [row for row in map(processor.parse_line, lines) if row])
+    # Toutes les lignes de transactions reconnues (totaux à séparateur de milliers : voir parse_columns)
+    assert len(parsed) == n_lines
+    record(benchmark, "parse_line", pdf_path, len(lines))
+
+
+def test_extract_detailed_data(benchmark, statement):
+    pdf_path, n_lines = statement
+    records, solde_final = benchmark(PDFProcessor().extract_detailed_data, pdf_path, CLIENT)
+    assert len(records) == n_lines
+    assert records[-1]["solde"] == pytest.approx(solde_final)
+    record(benchmark, "extract_detailed_data", pdf_path, n_lines)
@@ -19,4 +19,21 @@ START_DATE = "2017-01-01"
 END_DATE = (datetime.date.today() - datetime.timedelta(days=1)).strftime("%Y-%m-%d")
 
 # Chemins
-DOWNLOAD_DIR = os.path.join(os.getcwd(), "downloads")
\ No newline at end of file
+DOWNLOAD_DIR = os.path.join(os.getcwd(), "downloads")
+
+# Téléchargement en mémoire : au-delà de cette taille le PDF bascule dans un fichier temporaire
+PDF_SPOOL_MAX_BYTES = 32 * 1024 * 1024
+
+# Relevés par tranches de dates (première synchronisation ou resynchronisation complète)
+SHARD_WORKERS = 4  # Tranches téléchargées en parallèle pour un même client
+SHARD_RETRIES = 3  # Tentatives par tranche
+
+# Session : durée de vie des cookies, et durée pendant laquelle une validation réussie
+# (enregistrée dans cookies_<port>.json) dispense de toute requête de contrôle
+COOKIES_MAX_AGE = 3600
+SESSION_PROBE_TTL = 300
+SESSION_PROBE_CUSTOMER_ID = 2211711  # Client du relevé d'un jour demandé pour tester la session
+
+# Cache des analyses de PDFs (clé : SHA-256 du PDF + version du parseur)
+PARSE_CACHE_PATH = os.path.join(os.getcwd(), "parse_cache.db")
+PARSE_CACHE_MAX_BYTES = 256 * 1024 * 1024
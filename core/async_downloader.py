@@ -0,0 +1,130 @@
+import asyncio
+import importlib.util
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+import httpx
+from core.download_control import DownloadError
+from core.statement_download import STATEMENT_API_URL, StatementBuffer
+
+logger = logging.getLogger(__name__)
+
+MAX_PER_HOST = 32  # Requêtes simultanées par hôte
+KEEPALIVE_EXPIRY = 60  # Secondes avant fermeture d'une connexion inutilisée
+
+
+class AsyncStatementDownloader:
+    """
+    Téléchargement asynchrone (httpx, HTTP/2 si h2 est installé) des relevés clients.
+    Une boucle asyncio tourne dans un thread dédié ; submit() retourne un
+    concurrent.futures.Future de (client, pdf, erreur), comme runners.detailed_pdf.download_pdf,
+    ce qui permet de l'utiliser à la place du pool de threads de téléchargement.
+    Le nombre de requêtes en cours est limité par hôte (max_per_host), ou par
+    limiter (core.download_control.AdaptiveLimiter) s'il est fourni.
+    """
+
+    def __init__(self, cookies, max_per_host=MAX_PER_HOST, http2=True, timeout=30, api_url=STATEMENT_API_URL,
+                 limiter=None):
+        self.cookies = dict(cookies)
+        self.max_per_host = max_per_host
+        # HTTP/2 seulement si le paquet h2 est disponible, HTTP/1.1 keep-alive sinon
+        self.http2 = http2 and importlib.util.find_spec("h2") is not None
+        self.timeout = timeout
+        self.api_url = api_url
+        self.loop = None
+        self.thread = None
+        self.http = None
+        self.host_limits = {}
+        self.limiter = limiter
+
+    @classmethod
+    def from_scraper(cls, scraper, **kwargs):
+        """Reprend les cookies de la session requests du scraper (après access_site)."""
+        return cls(scraper.session.cookies.get_dict(), **kwargs)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def start(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="async-downloader", daemon=True)
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self._open(), self.loop).result()
+        logger.info(f"Téléchargeur asynchrone démarré (HTTP/2 : {self.http2}, {self.max_per_host} requêtes par hôte)")
+
+    async def _open(self):
+        limits = httpx.Limits(max_connections=self.max_per_host, max_keepalive_connections=self.max_per_host,
+                              keepalive_expiry=KEEPALIVE_EXPIRY)
+        self.http = httpx.AsyncClient(http2=self.http2, cookies=self.cookies, limits=limits,
+                                      timeout=self.timeout)
+
+    def close(self):
+        if self.loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.http.aclose(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        self.loop = None
+
+    def submit(self, client, start_date, end_date):
+        """Planifie le téléchargement du relevé d'un client ; retourne un concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(self.download(client, start_date, end_date), self.loop)
+
+    def download_all(self, clients, start_date, end_date):
+        """Télécharge les relevés de tous les clients ; retourne [(client, pdf, exception)] dans l'ordre."""
+        return [future.result() for future in [self.submit(client, start_date, end_date) for client in clients]]
+
+    async def download(self, client, start_date, end_date):
+        start_date = client.get("start_date", start_date)
+        params = {"type": "advanced", "start_date": start_date, "end_date": end_date, "customer_id": client['client_id']}
+        if self.limiter is not None:
+            await self.limiter.acquire_async()
+            started = time.monotonic()
+            error = None
+            try:
+                return client, await self._fetch(params, client), None
+            except Exception as e:
+                error = e
+                return self._failure(client, e)
+            finally:
+                self.limiter.release(time.monotonic() - started, error)
+        host = urlsplit(self.api_url).netloc
+        if host not in self.host_limits:
+            self.host_limits[host] = asyncio.Semaphore(self.max_per_host)
+        async with self.host_limits[host]:
+            try:
+                return client, await self._fetch(params, client), None
+            except Exception as e:
+                return self._failure(client, e)
+
+    def _failure(self, client, error):
+        logger.error(f"Erreur lors du téléchargement pour {client['nom']} : {str(error) or type(error).__name__}")
+        return client, None, error
+
+    def set_cookies(self, cookies):
+        """Remplace les cookies du client HTTP (après une réauthentification du scraper)."""
+        def update():
+            self.http.cookies.clear()
+            self.http.cookies.update(cookies)
+        self.loop.call_soon_threadsafe(update)
+
+    async def _fetch(self, params, client):
+        """Même contrat que PharmaScraper._download_pdf_to_buffer : io.BytesIO, ou chemin temporaire si volumineux."""
+        buffer = StatementBuffer(client)
+        try:
+            async with self.http.stream("GET", self.api_url, params=params) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    raise DownloadError.from_response(response.status_code, response.text, response.headers)
+                async for chunk in response.aiter_bytes(65536):
+                    buffer.write(chunk)
+            return buffer.result()
+        except Exception:
+            buffer.discard()
+            raise
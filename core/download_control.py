@@ -0,0 +1,321 @@
+import asyncio
+import email.utils
+import logging
+import random
+import threading
+import time
+from collections import deque
+import requests
+
+try:
+    import httpx
+except ImportError:  # httpx ne sert qu'au téléchargement asynchrone (core/async_downloader.py)
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+# Limiteur AIMD des téléchargements : +1 après une fenêtre saine, x DECREASE_FACTOR sur congestion
+LATENCY_TARGET_P95 = 20.0  # Secondes ; au-delà, la concurrence est réduite
+ERROR_RATE_MAX = 0.05  # Part maximale d'erreurs de congestion pour augmenter la concurrence
+DECREASE_FACTOR = 0.5
+LATENCY_WINDOW = 100  # Nombre de latences récentes conservées
+
+# Réessais par client : délai exponentiel avec gigue (full jitter), borné
+RETRY_BASE_DELAY = 5.0
+RETRY_MAX_DELAY = 120.0
+
+# Disjoncteur : échecs consécutifs avant ouverture, puis pause avant un essai de reprise
+AUTH_FAILURE_THRESHOLD = 3  # 401 / 403 / Unauthorized
+OUTAGE_THRESHOLD = 5  # 429 / 5xx / délai dépassé / connexion impossible
+BREAKER_COOLDOWN = 30.0
+BREAKER_MAX_COOLDOWN = 300.0
+
+TIMEOUT_ERRORS = (TimeoutError, requests.exceptions.Timeout) + ((httpx.TimeoutException,) if httpx else ())
+CONNECTION_ERRORS = (ConnectionError, requests.exceptions.ConnectionError) + ((httpx.TransportError,) if httpx else ())
+
+
+class DownloadError(Exception):
+    """Erreur HTTP d'un téléchargement, avec le code et le délai Retry-After (secondes) éventuel."""
+
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+    @classmethod
+    def from_response(cls, status, text, headers):
+        """Erreur d'une réponse HTTP non 200 (requests ou httpx)."""
+        return cls(f"Erreur HTTP {status}: {text}", status, parse_retry_after(headers.get("Retry-After")))
+
+
+def parse_retry_after(value):
+    """En-tête Retry-After (secondes ou date HTTP) converti en secondes, ou None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def is_congestion(error):
+    """Vrai pour les erreurs qui signalent une surcharge de l'API : 429, 5xx, délai dépassé."""
+    if isinstance(error, TIMEOUT_ERRORS):
+        return True
+    status = getattr(error, "status", None)
+    return status is not None and (status == 429 or status >= 500)
+
+
+def is_auth_failure(error):
+    """Vrai si la session n'est plus acceptée par l'API."""
+    return getattr(error, "status", None) in (401, 403) or "Unauthorized" in str(error)
+
+
+def is_outage(error):
+    """Vrai si l'API semble indisponible : congestion ou connexion impossible."""
+    return is_congestion(error) or isinstance(error, CONNECTION_ERRORS)
+
+
+def backoff_delay(attempt, base=RETRY_BASE_DELAY, cap=RETRY_MAX_DELAY):
+    """Délai avant le réessai n° attempt : tirage uniforme dans [0, min(cap, base * 2^(attempt-1))]."""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """
+    Suspend tous les téléchargements quand l'API ou la session est manifestement hors service.
+    - AUTH_FAILURE_THRESHOLD échecs d'authentification consécutifs : une seule
+      réauthentification (reauthenticate) pour tout le traitement ; si la session
+      est de nouveau refusée ensuite, le circuit reste ouvert (is_failed).
+    - OUTAGE_THRESHOLD pannes consécutives : circuit ouvert pendant cooldown secondes
+      (doublé à chaque rechute), puis un seul téléchargement d'essai (semi-ouvert).
+    Appelé uniquement depuis le thread qui planifie les téléchargements. Chaque
+    téléchargement est rattaché à l'époque (epoch) du circuit à son lancement : les
+    résultats de requêtes lancées avant une réauthentification ou une ouverture sont ignorés.
+    """
+
+    def __init__(self, reauthenticate=None, auth_threshold=AUTH_FAILURE_THRESHOLD,
+                 outage_threshold=OUTAGE_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.reauthenticate = reauthenticate
+        self.auth_threshold = auth_threshold
+        self.outage_threshold = outage_threshold
+        self.base_cooldown = cooldown
+        self.cooldown = cooldown
+        self.state = "fermé"
+        self.open_until = 0.0
+        self.probe_in_flight = False
+        self.auth_failures = 0
+        self.outages = 0
+        self.reauthenticated = False
+        self.epoch = 0
+
+    def allow_request(self):
+        """Vrai si un téléchargement peut être lancé maintenant."""
+        if self.state == "fermé":
+            return True
+        if self.state == "ouvert" and time.monotonic() >= self.open_until:
+            logger.info("Disjoncteur semi-ouvert : téléchargement d'essai")
+            self.state = "semi-ouvert"
+        if self.state == "semi-ouvert" and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        return False
+
+    def retry_in(self):
+        """Secondes avant le prochain essai possible (None si fermé ou définitivement ouvert)."""
+        if self.state == "ouvert":
+            return max(0.0, self.open_until - time.monotonic())
+        return None
+
+    def is_failed(self):
+        return self.state == "échec"
+
+    def record(self, error=None, epoch=None):
+        """Résultat d'un téléchargement lancé à l'époque epoch (error=None en cas de succès)."""
+        if self.state == "échec" or (epoch is not None and epoch != self.epoch):
+            return
+        if error is None:
+            if self.state != "fermé":
+                logger.info("Disjoncteur refermé : l'API répond de nouveau")
+            self.state = "fermé"
+            self.probe_in_flight = False
+            self.cooldown = self.base_cooldown
+            self.auth_failures = self.outages = 0
+            return
+        if is_auth_failure(error):
+            self.auth_failures += 1
+            self.outages = 0
+            if self.auth_failures >= self.auth_threshold or self.state == "semi-ouvert":
+                self._on_session_lost()
+        elif is_outage(error):
+            self.outages += 1
+            self.auth_failures = 0
+            if self.outages >= self.outage_threshold or self.state == "semi-ouvert":
+                self._open(f"{self.outages} panne(s) consécutive(s) : {error}")
+        elif self.state == "semi-ouvert":
+            # Autre erreur (PDF invalide...) : l'API a répondu, le circuit se referme
+            self.record(None, epoch)
+
+    def _open(self, reason):
+        if self.state == "semi-ouvert":
+            self.cooldown = min(self.cooldown * 2, BREAKER_MAX_COOLDOWN)
+        self.state = "ouvert"
+        self.epoch += 1
+        self.probe_in_flight = False
+        self.open_until = time.monotonic() + self.cooldown
+        self.outages = 0
+        logger.warning(f"Disjoncteur ouvert pour {self.cooldown:.0f}s ({reason})")
+
+    def _on_session_lost(self):
+        if self.reauthenticated or self.reauthenticate is None:
+            self.state = "échec"
+            logger.error("Session refusée par l'API après réauthentification : téléchargements abandonnés")
+            return
+        self.reauthenticated = True
+        logger.warning(f"{self.auth_failures} échec(s) d'authentification consécutifs : réauthentification unique")
+        try:
+            self.reauthenticate()
+        except Exception as e:
+            self.state = "échec"
+            logger.error(f"Réauthentification impossible : {e}")
+            return
+        self.state = "fermé"
+        self.epoch += 1
+        self.probe_in_flight = False
+        self.auth_failures = 0
+
+
+class AdaptiveLimiter:
+    """
+    Limite le nombre de téléchargements simultanés et l'ajuste en AIMD :
+    - après une fenêtre de `limit` succès, +1 si le p95 des latences reste sous
+      latency_target et le taux d'erreurs de congestion sous ERROR_RATE_MAX ;
+    - sur 429 / 5xx / délai dépassé (ou p95 trop élevé), limite x DECREASE_FACTOR,
+      au plus une fois par fenêtre ;
+    - Retry-After suspend tous les nouveaux téléchargements pendant le délai demandé.
+    Utilisable depuis des threads (acquire) et depuis une boucle asyncio (acquire_async).
+    """
+
+    def __init__(self, initial=6, min_limit=1, max_limit=64, latency_target=LATENCY_TARGET_P95,
+                 name="téléchargements"):
+        self.limit = max(min_limit, min(initial, max_limit))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.name = name
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.outcomes = deque(maxlen=LATENCY_WINDOW)  # True pour une erreur de congestion
+        self.successes = 0
+        self.last_decrease = 0.0
+        self.condition = threading.Condition()
+        self.async_waiters = []
+
+    def _blocked_delay(self):
+        return max(0.0, self.blocked_until - time.monotonic())
+
+    def _can_start(self):
+        return self.in_flight < self.limit and self._blocked_delay() == 0.0
+
+    def acquire(self):
+        with self.condition:
+            while not self._can_start():
+                self.condition.wait(self._blocked_delay() or None)
+            self.in_flight += 1
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self.condition:
+                if self._can_start():
+                    self.in_flight += 1
+                    return
+                waiter = loop.create_future()
+                self.async_waiters.append((loop, waiter))
+                delay = self._blocked_delay() or None
+            await asyncio.wait([waiter], timeout=delay)
+
+    def call(self, fn, *args, **kwargs):
+        """Exécute fn(*args, **kwargs) en occupant un créneau ; latence et erreur transmises à release."""
+        self.acquire()
+        started = time.monotonic()
+        error = None
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.release(time.monotonic() - started, error)
+
+    def release(self, latency=None, error=None):
+        """Fin d'un téléchargement : latence (secondes) et erreur éventuelle."""
+        with self.condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            congested = error is not None and is_congestion(error)
+            retry_after = getattr(error, "retry_after", None)
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+                logger.warning(f"Retry-After : {self.name} suspendus pendant {retry_after:.0f}s")
+            if latency is not None and error is None:
+                self.latencies.append(latency)
+            self.outcomes.append(congested)
+            if congested:
+                self._decrease(now, f"congestion ({error})")
+            elif error is None:
+                self.successes += 1
+                if self.successes >= self.limit:
+                    self.successes = 0
+                    p95 = self.p95()
+                    if p95 is not None and p95 > self.latency_target:
+                        self._decrease(now, f"p95 {p95:.1f}s > {self.latency_target:.0f}s")
+                    elif self.error_rate() <= ERROR_RATE_MAX and self.limit < self.max_limit:
+                        self._set_limit(self.limit + 1, "fenêtre saine")
+            self._notify()
+
+    def _decrease(self, now, reason):
+        # Une seule réduction par fenêtre : les échecs simultanés d'une même rafale ne comptent qu'une fois
+        window = max(1.0, self.p50() or 0.0)
+        if now - self.last_decrease < window:
+            return
+        self.last_decrease = now
+        self.successes = 0
+        self._set_limit(max(self.min_limit, int(self.limit * DECREASE_FACTOR)), reason)
+
+    def _set_limit(self, limit, reason):
+        if limit != self.limit:
+            previous, self.limit = self.limit, limit
+            logger.info(f"Concurrence {self.name} : {previous} → {limit} ({reason}) - {self.summary()}")
+
+    def _notify(self):
+        self.condition.notify_all()
+        for loop, waiter in self.async_waiters:
+            loop.call_soon_threadsafe(lambda w=waiter: w.done() or w.set_result(None))
+        self.async_waiters = []
+
+    def _percentile(self, fraction):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(fraction * (len(ordered) - 1))]
+
+    def p50(self):
+        return self._percentile(0.5)
+
+    def p95(self):
+        return self._percentile(0.95)
+
+    def error_rate(self):
+        return sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+
+    def summary(self):
+        p50, p95 = self.p50(), self.p95()
+        latencies = f"p50 {p50:.2f}s, p95 {p95:.2f}s" if p95 is not None else "aucune latence"
+        return (f"limite {self.limit}, {self.in_flight} en cours, {latencies}, "
+                f"{self.error_rate():.0%} d'erreurs sur {len(self.outcomes)} derniers")
@@ -0,0 +1,79 @@
+import hashlib
+import json
+import sqlite3
+import time
+from core.pdf_processor import PARSER_VERSION, open_pdf_source
+
+
+class ParseCache:
+    """
+    Cache des résultats de PDFProcessor.extract_detailed_data, indexé par le
+    SHA-256 du PDF et la version du parseur. Éviction LRU au-delà de max_bytes.
+    """
+
+    def __init__(self, db_path, max_bytes):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.init_db()
+
+    def connect(self):
+        return sqlite3.connect(self.db_path)
+
+    def init_db(self):
+        with self.connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS parse_cache (
+                    key TEXT PRIMARY KEY,
+                    payload TEXT,
+                    size INTEGER,
+                    last_used REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_parse_cache_last_used ON parse_cache (last_used)")
+            conn.commit()
+
+    @staticmethod
+    def key_for_file(pdf_file):
+        """Clé du cache pour un PDF (chemin ou io.BytesIO)."""
+        sha = hashlib.sha256()
+        with open_pdf_source(pdf_file) as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                sha.update(chunk)
+        return f"{sha.hexdigest()}:v{PARSER_VERSION}"
+
+    def get(self, key, client):
+        """Retourne (records, solde_final_pdf) pour ce client, ou None si absent."""
+        with self.connect() as conn:
+            row = conn.execute("SELECT payload FROM parse_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE parse_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+        payload = json.loads(row[0])
+        records = payload["records"]
+        for record in records:
+            record["nom"] = client["nom"]
+        return records, payload["solde_final"]
+
+    def put(self, key, records, solde_final):
+        payload = json.dumps({"records": records, "solde_final": solde_final}, ensure_ascii=False)
+        size = len(payload.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self.connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO parse_cache (key, payload, size, last_used) VALUES (?, ?, ?, ?)",
+                         (key, payload, size, time.time()))
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM parse_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        to_delete = []
+        for key, size in conn.execute("SELECT key, size FROM parse_cache ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            to_delete.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM parse_cache WHERE key = ?", to_delete)
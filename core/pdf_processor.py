@@ -1,43 +1,438 @@
+import os
 import re
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+from core.reconciliation import reconcile
 
-class PDFProcessor:
-    def __init__(self):
-        pass
+# À incrémenter à chaque changement du résultat de extract_detailed_data (invalide le cache)
+PARSER_VERSION = 8
 
-    def extract_sorted_lines(self, pdf_path):
+# Tolérances de regroupement des caractères, identiques aux valeurs par défaut de pdfplumber
+X_TOLERANCE = 3
+Y_TOLERANCE = 3
+
+
+@contextlib.contextmanager
+def open_pdf_source(pdf_source):
+    """Ouvre un chemin en lecture binaire, ou rembobine un flux déjà ouvert (io.BytesIO)."""
+    if hasattr(pdf_source, 'read'):
+        pdf_source.seek(0)
+        yield pdf_source
+    else:
+        with open(pdf_source, 'rb') as f:
+            yield f
+
+
+def group_line_words(words):
+    """Regroupe des mots (texte, x0, x1, top) en lignes : [(top arrondi, mots dans l'ordre reçu)], triées verticalement."""
+    line_map = {}
+    for word in words:
+        top = round(word[3])
+        if top not in line_map:
+            line_map[top] = []
+        line_map[top].append(word)
+    return [(top, line_map[top]) for top in sorted(line_map.keys())]
+
+
+def group_lines(words):
+    """Regroupe des mots (texte, x0, x1, top) en lignes de texte triées verticalement."""
+    return [" ".join(word[0] for word in line_words) for _, line_words in group_line_words(words)]
+
+
+def in_box(box, x0, x1, top):
+    """Vrai si l'objet (centre horizontal, haut) est dans box = (gauche, haut, droite, bas)."""
+    left, box_top, right, bottom = box
+    return left <= (x0 + x1) / 2 <= right and box_top <= top < bottom
+
+
+def chars_to_words(chars):
+    """
+    Reproduit le découpage en mots de pdfplumber (extract_words) à partir de
+    caractères (texte, x0, x1, top) : regroupement vertical à Y_TOLERANCE près,
+    tri horizontal, coupure sur les blancs ou un écart supérieur à X_TOLERANCE.
+    Retourne des mots (texte, x0, x1, top).
+    """
+    words = []
+    clusters = []
+    for char in sorted(chars, key=lambda c: c[3]):
+        if clusters and char[3] - clusters[-1][-1][3] <= Y_TOLERANCE:
+            clusters[-1].append(char)
+        else:
+            clusters.append([char])
+    for cluster in clusters:
+        current, current_top, first_x0, last_x1 = [], None, None, None
+        for text, x0, x1, top in sorted(cluster, key=lambda c: c[1]):
+            if text.isspace() or (current and x0 > last_x1 + X_TOLERANCE):
+                if current:
+                    words.append(("".join(current), first_x0, last_x1, current_top))
+                current, current_top = [], None
+                if text.isspace():
+                    continue
+            if not current:
+                first_x0 = x0
+            current.append(text)
+            current_top = top if current_top is None else min(current_top, top)
+            last_x1 = x1
+        if current:
+            words.append(("".join(current), first_x0, last_x1, current_top))
+    return words
+
+
+class PdfplumberBackend:
+    """Backend de référence : page.extract_words() de pdfplumber."""
+    name = "pdfplumber"
+
+    def page_count(self, pdf_path):
         import pdfplumber
-        all_lines = []
         with pdfplumber.open(pdf_path) as pdf:
-            print(f"Nombre de pages dans {pdf_path}: {len(pdf.pages)}")
+            return len(pdf.pages)
+
+    def iter_page_words(self, pdf_path, pages=None, crop=None):
+        """
+        Mots (texte, x0, x1, top) de chaque page ; pages : indices (base 0) à lire,
+        toutes par défaut ; crop(largeur, hauteur) : zone à conserver ou None.
+        """
+        import pdfplumber
+        with pdfplumber.open(pdf_path, pages=None if pages is None else [i + 1 for i in pages]) as pdf:
             for page in pdf.pages:
-                words = page.extract_words()
-                line_map = {}
-                for word in words:
-                    top = round(word['top'])
-                    if top not in line_map:
-                        line_map[top] = []
-                    line_map[top].append(word['text'])
-                for top in sorted(line_map.keys()):
-                    line = " ".join(line_map[top])
-                    all_lines.append(line)
+                try:
+                    box = crop(page.width, page.height) if crop else None
+                    source = page
+                    if box is not None:
+                        # Ne garde que les caractères de la zone avant le découpage en mots
+                        source = page.filter(
+                            lambda obj: obj.get("object_type") != "char" or in_box(box, obj["x0"], obj["x1"], obj["top"])
+                        )
+                    yield [(word['text'], word['x0'], word['x1'], word['top']) for word in source.extract_words()]
+                finally:
+                    # Libère le cache des objets de la page déjà consommée
+                    page.close()
+
+    def iter_pages(self, pdf_path, pages=None):
+        """Lignes de chaque page ; pages : indices (base 0) à lire, toutes par défaut."""
+        for words in self.iter_page_words(pdf_path, pages):
+            yield group_lines(words)
+
+
+class PdfiumBackend(PdfplumberBackend):
+    """Backend pypdfium2 : boîtes des caractères calculées par PDFium (C)."""
+    name = "pdfium"
+
+    def page_count(self, pdf_path):
+        import pypdfium2 as pdfium
+        pdf = pdfium.PdfDocument(pdf_path)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+    def iter_page_words(self, pdf_path, pages=None, crop=None):
+        import pypdfium2 as pdfium
+        pdf = pdfium.PdfDocument(pdf_path)
+        try:
+            for index in (range(len(pdf)) if pages is None else pages):
+                page = pdf[index]
+                textpage = page.get_textpage()
+                try:
+                    width, height = page.get_size()
+                    box = crop(width, height) if crop else None
+                    text = textpage.get_text_range()
+                    chars = []
+                    for char_index, char in enumerate(text):
+                        if char in "\r\n":
+                            continue
+                        left, bottom, right, top = textpage.get_charbox(char_index, loose=True)
+                        if box is None or in_box(box, left, right, height - top):
+                            chars.append((char, left, right, height - top))
+                    yield chars_to_words(chars)
+                finally:
+                    textpage.close()
+                    page.close()
+        finally:
+            pdf.close()
+
+
+class PdfminerBackend(PdfplumberBackend):
+    """Backend pdfminer brut : interprétation des pages sans analyse de mise en page (laparams=None)."""
+    name = "pdfminer"
+
+    def page_count(self, pdf_path):
+        from pdfminer.pdfpage import PDFPage
+        with open_pdf_source(pdf_path) as f:
+            return sum(1 for _ in PDFPage.get_pages(f))
+
+    def iter_page_words(self, pdf_path, pages=None, crop=None):
+        from pdfminer.converter import PDFPageAggregator
+        from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
+        from pdfminer.pdfpage import PDFPage
+        from pdfminer.layout import LTChar, LTContainer
+
+        def iter_chars(container):
+            for obj in container:
+                if isinstance(obj, LTChar):
+                    yield obj
+                elif isinstance(obj, LTContainer):
+                    yield from iter_chars(obj)
+
+        resource_manager = PDFResourceManager(caching=True)
+        device = PDFPageAggregator(resource_manager, laparams=None)
+        interpreter = PDFPageInterpreter(resource_manager, device)
+        with open_pdf_source(pdf_path) as f:
+            for page in PDFPage.get_pages(f, pagenos=None if pages is None else set(pages)):
+                interpreter.process_page(page)
+                layout = device.get_result()
+                box = crop(layout.width, layout.height) if crop else None
+                chars = [(c.get_text(), c.x0, c.x1, layout.y1 - c.y1) for c in iter_chars(layout)]
+                if box is not None:
+                    chars = [c for c in chars if in_box(box, c[1], c[2], c[3])]
+                yield chars_to_words(chars)
+
+
+TEXT_BACKENDS = {
+    backend.name: backend for backend in (PdfplumberBackend, PdfiumBackend, PdfminerBackend)
+}
+DEFAULT_TEXT_BACKEND = "pdfium"
+
+# Relevés volumineux : au-delà de PARALLEL_PAGES_THRESHOLD pages, extraction par
+# lots de PAGE_BATCH_SIZE pages dans PAGE_WORKERS processus
+PARALLEL_PAGES_THRESHOLD = 100
+PAGE_BATCH_SIZE = 16
+PAGE_WORKERS = os.cpu_count() or 1
+
+
+def extract_page_range(backend_name, pdf_path, start, stop):
+    """Point d'entrée picklable : mots de chaque page [start, stop) d'un relevé, avec la taille de la page."""
+    backend = TEXT_BACKENDS[backend_name]()
+    pages = []
+
+    def keep_size(width, height):
+        pages.append((width, height))
+        return None
+
+    words = list(backend.iter_page_words(pdf_path, range(start, stop), crop=keep_size))
+    return [(width, height, page_words) for (width, height), page_words in zip(pages, words)]
+
+
+HEADER_PATTERN = re.compile(r"^Date\s+Transaction\s+N°\s+Libellé\s+Total\s+Solde", re.IGNORECASE)
+DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}")
+TABLE_COLUMNS = ("date", "transaction", "libelle", "total", "solde")
+TABLE_MARGIN = 5  # Marge (points) autour du gabarit du tableau
+# Ligne simple (secours du gabarit de colonnes) : date, libellé, total et solde. Le total
+# n'admet pas de séparateur de milliers : un libellé terminé par un nombre (« Réf 100 »)
+# y serait absorbé ; les totaux à séparateur sont lus par colonnes (parse_columns)
+LINE_PATTERN = re.compile(
+    r"^(\d{4}-\d{2}-\d{2})\s+(.*?)\s+(-?\d+[\.,]\d{2})\s+(-?\d{1,3}(?:[\s.,]\d{3})*[\.,]\d{2})$"
+)
+# Montant signé des lignes "Solde initial" / "Solde final" (1 865 552,60 / -4 085,36 / 1500.00)
+SOLDE_PATTERN = re.compile(r"-?(?:\d{1,3}(?:[\s.]\d{3})+[.,]\d+|\d+[.,]\d+)")
+
+
+def parse_amount(text):
+    """Convertit un montant lu dans une colonne (1 929,90 / -84,91 / 1.929,90) en float."""
+    value = text.replace(" ", "").replace("\u00a0", "").replace("\u202f", "")
+    if "," in value:
+        value = value.replace(".", "").replace(",", ".")
+    if not re.fullmatch(r"-?\d+(?:\.\d+)?", value):
+        raise ValueError(f"Montant illisible : {text}")
+    return float(value)
+
+
+class TableLayout:
+    """
+    Gabarit du tableau des transactions, appris une fois par relevé sur la ligne
+    d'en-tête : limites des colonnes Date / Transaction N° / Libellé / Total / Solde,
+    bord gauche du tableau et, après la première page, haut du pied de page.
+    """
+
+    def __init__(self, left, boundaries):
+        self.left = left
+        self.boundaries = boundaries  # abscisses séparant deux colonnes consécutives
+        self.footer_top = None
+
+    @classmethod
+    def from_header(cls, words):
+        """Construit le gabarit depuis les mots de la ligne d'en-tête, ou None si elle est incomplète."""
+        labels = {"date": "date", "transaction": "transaction", "libellé": "libelle", "total": "total", "solde": "solde"}
+        anchors = {}
+        for index, word in enumerate(words):
+            column = labels.get(word[0].lower())
+            if column and column not in anchors:
+                anchors[column] = index
+        if len(anchors) != len(TABLE_COLUMNS):
+            return None
+        indexes = [anchors[column] for column in TABLE_COLUMNS]
+        if indexes != sorted(indexes):
+            return None
+        # Limite entre deux colonnes : milieu de l'espace entre les libellés d'en-tête
+        boundaries = [(words[index - 1][2] + words[index][1]) / 2 for index in indexes[1:]]
+        return cls(words[indexes[0]][1] - TABLE_MARGIN, boundaries)
+
+    def crop_box(self, width, height):
+        """Zone (gauche, haut, droite, bas) des lignes du tableau sur les pages suivantes : sans marge gauche ni pied de page."""
+        bottom = self.footer_top if self.footer_top is not None else height
+        return self.left, 0, width, bottom
+
+    def split(self, words):
+        """Répartit les mots d'une ligne dans les colonnes selon leur position horizontale."""
+        cells = {column: [] for column in TABLE_COLUMNS}
+        for text, x0, x1, top in words:
+            center = (x0 + x1) / 2
+            column = sum(1 for boundary in self.boundaries if center >= boundary)
+            cells[TABLE_COLUMNS[column]].append(text)
+        return {column: " ".join(texts) for column, texts in cells.items()}
+
+    def learn_footer(self, row_tops, trailing_tops):
+        """
+        Fixe le haut du pied de page à partir de la première page complète : les lignes
+        qui suivent la dernière transaction après un écart nettement supérieur à
+        l'interligne du tableau (un libellé sur deux lignes n'est donc pas pris).
+        """
+        if self.footer_top is not None or len(row_tops) < 2 or not trailing_tops:
+            return
+        spacing = min(b - a for a, b in zip(row_tops, row_tops[1:]) if b > a) if len(set(row_tops)) > 1 else 0
+        first_trailing = min(trailing_tops)
+        if spacing and first_trailing - row_tops[-1] > 1.5 * spacing:
+            self.footer_top = first_trailing - Y_TOLERANCE
+
+
+class PDFProcessor:
+    def __init__(self, streaming=True, backend=DEFAULT_TEXT_BACKEND,
+                 parallel_pages_threshold=PARALLEL_PAGES_THRESHOLD, page_workers=PAGE_WORKERS, layout=True):
+        # streaming=True : lecture page par page avec arrêt dès le "Solde final"
+        # layout=True : gabarit du tableau (mots hors tableau écartés et colonnes par position)
+        self.streaming = streaming
+        if backend not in TEXT_BACKENDS:
+            raise ValueError(f"Backend PDF inconnu : {backend} (disponibles : {', '.join(TEXT_BACKENDS)})")
+        self.backend = TEXT_BACKENDS[backend]()
+        self.parallel_pages_threshold = parallel_pages_threshold
+        self.page_workers = page_workers
+        self.layout = layout
+
+    def iter_page_words(self, pdf_path, crop=None):
+        """
+        Mots de chaque page, page par page. Le PDF est fermé dès que le générateur est
+        épuisé ou fermé (close()), la mémoire reste donc bornée par une seule page.
+        Les relevés de plus de parallel_pages_threshold pages passent par
+        iter_page_words_parallel.
+        """
+        if self.page_workers > 1 and self.parallel_pages_threshold is not None:
+            nb_pages = self.backend.page_count(pdf_path)
+            if nb_pages > self.parallel_pages_threshold:
+                yield from self.iter_page_words_parallel(pdf_path, nb_pages, crop)
+                return
+        yield from self.backend.iter_page_words(pdf_path, crop=crop)
+
+    def iter_page_words_parallel(self, pdf_path, nb_pages, crop=None):
+        """
+        Extrait les lots de pages en parallèle et produit leurs mots dans l'ordre
+        du document : en-tête, solde initial et solde final sont détectés ensuite
+        sur le flux fusionné, quelle que soit leur page. Le rognage est appliqué
+        ici, mot par mot. Les lots restants sont annulés dès que le générateur est fermé.
+        """
+        executor = ProcessPoolExecutor(max_workers=self.page_workers)
+        try:
+            futures = [
+                executor.submit(extract_page_range, self.backend.name, pdf_path, start,
+                                min(start + PAGE_BATCH_SIZE, nb_pages))
+                for start in range(0, nb_pages, PAGE_BATCH_SIZE)
+            ]
+            for future in futures:
+                for width, height, words in future.result():
+                    box = crop(width, height) if crop else None
+                    if box is not None:
+                        words = [word for word in words if in_box(box, word[1], word[2], word[3])]
+                    yield words
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def iter_sorted_lines(self, pdf_path):
+        """Version générateur de extract_sorted_lines : produit les lignes page par page, sans gabarit."""
+        for words in self.iter_page_words(pdf_path):
+            yield from group_lines(words)
+
+    def iter_table_lines(self, pdf_path):
+        """
+        Produit (ligne, colonnes) page par page. Le gabarit du tableau est appris sur
+        la ligne d'en-tête ; ensuite chaque ligne datée est découpée en colonnes par
+        position (colonnes=None sinon) et, sur les pages suivantes, les mots hors de
+        la zone du tableau (marge gauche, pied de page) sont écartés. Les lignes
+        "Solde initial / final" sont toujours produites entières, où qu'elles soient.
+        """
+        state = {"layout": None, "size": None}
+
+        def keep_size(width, height):
+            state["size"] = (width, height)
+            return None
+
+        for words in self.iter_page_words(pdf_path, keep_size):
+            box = state["layout"].crop_box(*state["size"]) if state["layout"] else None
+            row_tops, trailing_tops = [], []
+            for top, line_words in group_line_words(words):
+                line = " ".join(word[0] for word in line_words)
+                if box is not None and "solde" not in line.lower():
+                    line_words = [word for word in line_words if in_box(box, word[1], word[2], word[3])]
+                    if not line_words:
+                        continue
+                    line = " ".join(word[0] for word in line_words)
+                table = state["layout"]
+                if table is None and self.layout and HEADER_PATTERN.match(line):
+                    state["layout"] = TableLayout.from_header(line_words)
+                columns = None
+                if table is not None and DATE_PATTERN.match(line):
+                    columns = table.split(line_words)
+                    row_tops.append(top)
+                    trailing_tops = []
+                elif row_tops and "solde" not in line.lower():
+                    trailing_tops.append(top)
+                yield line, columns
+            if state["layout"] is not None:
+                state["layout"].learn_footer(row_tops, trailing_tops)
+
+    def extract_sorted_lines(self, pdf_path):
+        all_lines = []
+        nb_pages = 0
+        for words in self.iter_page_words(pdf_path):
+            nb_pages += 1
+            all_lines.extend(group_lines(words))
+        print(f"Nombre de pages dans {pdf_path}: {nb_pages}")
         print(f"Lignes extraites de {pdf_path}: {len(all_lines)}")
         if all_lines:
             print(f"Premières lignes extraites: {all_lines[:5]}")
         return all_lines
 
+    def parse_columns(self, columns):
+        """Lit une ligne du tableau découpée par le gabarit ; None si une colonne est incohérente."""
+        date = columns["date"].strip()
+        libelle = columns["libelle"].strip().removeprefix("- ").strip()
+        if not re.fullmatch(r"\d{4}-\d{2}-\d{2}", date) or not libelle:
+            return None
+        try:
+            total = parse_amount(columns["total"])
+            solde = parse_amount(columns["solde"])
+        except ValueError:
+            return None
+        reference = columns["transaction"].strip()
+        return {
+            "date": date,
+            "reference": reference if reference not in ("", "-") else None,
+            "libelle": libelle,
+            "total_brut": total,
+            "solde_lu": solde
+        }
+
     def parse_line(self, line):
         """
         Extrait date, libellé, total, solde d'une ligne simple de type :
-        2024-03-27 - Paiement vente 84,91 -1 929,9
+        2024-03-27 - Paiement vente 1284,91 -1 929,90
         """
-        match = re.match(
-            r"^(\d{4}-\d{2}-\d{2})\s+(.*?)\s+(-?\d{1,3}(?:[\.,]\d{2}))\s+(-?\d{1,3}(?:[\s.,]\d{3})*[\.,]\d{2})$",
-            line.strip()
-        )
+        match = LINE_PATTERN.match(line.strip())
         if match:
             date, libelle, total_str, solde_str = match.groups()
-            total = float(total_str.replace(",", "."))
-            solde = float(solde_str.replace(" ", "").replace(",", "."))
+            try:
+                total = parse_amount(total_str)
+                solde = parse_amount(solde_str)
+            except ValueError:
+                return None
             return {
                 "date": date,
                 "reference": None,
@@ -48,118 +443,119 @@ class PDFProcessor:
         return None
 
     def extract_detailed_data(self, pdf_file, client):
-        import pdfplumber
-
         def parse_line(line):
-            match = re.match(
-                r"^(\d{4}-\d{2}-\d{2})\s+(.*?)\s+(-?\d{1,3}(?:[\.,]\d{2}))\s+(-?\d{1,3}(?:[\s.,]\d{3})*[\.,]\d{2})$",
-                line.strip()
-            )
-            if match:
-                date, libelle, total_str, solde_str = match.groups()
-                total = float(total_str.replace(",", "."))
-                solde = float(solde_str.replace(" ", "").replace(",", "."))
-                return {
-                    "date": date,
-                    "reference": None,
-                    "libelle": libelle.strip().removeprefix("- ").strip(),
-                    "total_brut": total,
-                    "solde_lu": solde
-                }
-            return None
+            parsed = self.parse_line(line)
+            if parsed:
+                parsed["libelle"] = parsed["libelle"].removeprefix("- ").strip()
+            return parsed
 
-        records = []
         solde = 0.0
         solde_final_pdf = None
         raw_rows = []
 
-        # Lire le contenu du PDF
-        lines = self.extract_sorted_lines(pdf_file)
+        # Lire le contenu du PDF : (ligne, colonnes) page par page, matérialisé hors streaming
+        lines = self.iter_table_lines(pdf_file)
+        if not self.streaming:
+            lines = list(lines)
+            print(f"Lignes extraites de {pdf_file}: {len(lines)}")
 
         start_parsing = False
-        for i, line in enumerate(lines):
-            line = line.strip()
-
-            if "solde initial" in line.lower():
-                match = re.search(r"(\d+[ ,]?\d{0,3}(?:[.,]\d+))", line)
-                if match:
-                    solde = float(match.group(1).replace(" ", "").replace(",", "."))
-                    print(f"Solde initial détecté : {solde:.2f}")
-
-            if re.match(r"^Date\s+Transaction\s+N°\s+Libellé\s+Total\s+Solde", line, re.IGNORECASE):
-                start_parsing = True
-                continue
-
-            if "solde final" in line.lower():
-                match = re.search(r"(\d+[ ,]?\d{0,3}(?:[.,]\d+))", line)
-                if match:
-                    solde_final_pdf = float(match.group(1).replace(" ", "").replace(",", "."))
-                    print(f"Solde final indiqué dans le PDF : {solde_final_pdf:.2f}")
-                break
-
-            if start_parsing and re.match(r"^\d{4}-\d{2}-\d{2}", line):
-                parsed = parse_line(line)
-                if parsed:
-                    parsed["nom"] = client["nom"]
-                    raw_rows.append(parsed)
-
-        # Étape 1 : regrouper les paiements par date
-        paiements_par_date = {}
-        for row in raw_rows:
-            if "paiement" in row["libelle"].lower():
-                date = row["date"]
-                montant = abs(row["total_brut"])
-                paiements_par_date.setdefault(date, []).append(montant)
-
-        # Étape 2 : identifier les dates où paiements = retour
-        paiements_a_ignorer = set()
-        for row in raw_rows:
-            if "retour" in row["libelle"].lower():
-                date = row["date"]
-                montant_retour = abs(row["total_brut"])
-                paiements_du_jour = paiements_par_date.get(date, [])
-                if abs(sum(paiements_du_jour) - montant_retour) < 0.01:
-                    paiements_a_ignorer.add(date)
-
-        # Retours et avoirs pour les règles précédentes
-        retours = {(r["date"], abs(r["total_brut"])) for r in raw_rows if "retour" in r["libelle"].lower()}
-        avoirs = {(r["date"], abs(r["total_brut"])) for r in raw_rows if "avoir" in r["libelle"].lower()}
-
-        for row in raw_rows:
-            date = row["date"]
-            reference = row.get("reference")
-            libelle = row["libelle"]
-            type_ligne = libelle.lower()
-            brut = abs(row["total_brut"])
-
-            if "paiement" in type_ligne:
-                montant = -brut
-            elif "retour" in type_ligne:
-                montant = -brut
-            elif "avoir" in type_ligne:
-                montant = -brut
-            else:
-                montant = brut
-
-            appliquer = True
-            if "paiement" in type_ligne and (
-                    (date, brut) in retours or (date, brut) in avoirs or date in paiements_a_ignorer):
-                appliquer = False
-
-            effet = montant if appliquer else 0.0
-            solde = round(solde + effet, 2)
-
-            records.append({
-                "nom": client["nom"],
-                "date": date,
-                "reference": reference,
-                "libelle": libelle,
-                "total": montant,
-                "solde": solde
-            })
+        try:
+            for line, columns in lines:
+                line = line.strip()
+
+                if "solde initial" in line.lower():
+                    match = SOLDE_PATTERN.search(line)
+                    if match:
+                        solde = parse_amount(match.group(0))
+                        print(f"Solde initial détecté : {solde:.2f}")
+
+                if HEADER_PATTERN.match(line):
+                    start_parsing = True
+                    continue
+
+                if "solde final" in line.lower():
+                    match = SOLDE_PATTERN.search(line)
+                    if match:
+                        solde_final_pdf = parse_amount(match.group(0))
+                        print(f"Solde final indiqué dans le PDF : {solde_final_pdf:.2f}")
+                    break
+
+                if start_parsing and DATE_PATTERN.match(line):
+                    # Colonnes du gabarit d'abord, expression régulière sur la ligne en secours
+                    parsed = self.parse_columns(columns) if columns else None
+                    if parsed is None:
+                        parsed = parse_line(line)
+                    if parsed:
+                        parsed["nom"] = client["nom"]
+                        raw_rows.append(parsed)
+        finally:
+            # En mode streaming, ferme le PDF sans lire les pages restantes
+            if self.streaming:
+                lines.close()
+
+        # Solde initial lu dans le PDF, gardé pour le chaînage des relevés par tranches
+        self.solde_initial_pdf = solde
+
+        # Synchronisation incrémentale : solde courant repris de la base au lieu du PDF
+        if client.get("solde_initial") is not None:
+            if abs(client["solde_initial"] - solde) > 0.01:
+                print(f"[AVERTISSEMENT] Solde initial du PDF ({solde:.2f}) != solde stocké ({client['solde_initial']:.2f})")
+            solde = client["solde_initial"]
+
+        # Rapprochement paiements / retours / avoirs et solde courant (moteur en colonnes)
+        records = reconcile(raw_rows, solde)
+        if records:
+            solde = records[-1]["solde"]
 
         if solde_final_pdf is not None and abs(solde - solde_final_pdf) > 0.01:
             print(f"[AVERTISSEMENT] Solde final recalculé ({solde:.2f}) != PDF ({solde_final_pdf:.2f})")
 
         return records, solde_final_pdf
 
+
+def count_pages(pdf_file, backend=DEFAULT_TEXT_BACKEND):
+    """Nombre de pages d'un relevé (chemin ou io.BytesIO), sans en extraire le texte."""
+    return TEXT_BACKENDS[backend]().page_count(pdf_file)
+
+
+def parse_pdf_file(pdf_file, client, streaming=True, backend=DEFAULT_TEXT_BACKEND,
+                   parallel_pages_threshold=PARALLEL_PAGES_THRESHOLD, page_workers=PAGE_WORKERS):
+    """
+    Point d'entrée picklable pour un ProcessPoolExecutor : analyse un relevé
+    dans un processus séparé et retourne (records, solde_final_pdf).
+    Dans un pool de processus, page_workers est limité aux cœurs que les autres
+    analyses en cours laissent libres (voir runners.detailed_pdf.run_pipeline).
+    """
+    processor = PDFProcessor(streaming=streaming, backend=backend, parallel_pages_threshold=parallel_pages_threshold,
+                             page_workers=page_workers)
+    return processor.extract_detailed_data(pdf_file, client)
+
+
+def parse_pdf_shards(shards, client, streaming=True, backend=DEFAULT_TEXT_BACKEND, page_workers=PAGE_WORKERS):
+    """
+    Point d'entrée picklable pour un relevé téléchargé par tranches de dates :
+    shards = [(début, fin, pdf)] dans l'ordre chronologique. Chaque tranche est
+    analysée séparément, le solde courant repartant du solde recalculé à la fin de
+    la précédente : les lignes fusionnées sont celles d'une analyse unique. Un solde
+    initial différent du "Solde final" du PDF précédent est signalé, sans échec,
+    comme l'écart de solde final d'un relevé complet. Retourne (records, solde_final_pdf).
+    """
+    processor = PDFProcessor(streaming=streaming, backend=backend, page_workers=page_workers)
+    records = []
+    solde_courant = None
+    solde_final_pdf = None
+    for start_date, end_date, pdf_file in shards:
+        shard_client = client if solde_courant is None else dict(client, solde_initial=solde_courant)
+        shard_records, shard_solde_final = processor.extract_detailed_data(pdf_file, shard_client)
+        solde_initial = processor.solde_initial_pdf
+        if solde_final_pdf is not None and abs(solde_initial - solde_final_pdf) > 0.01:
+            print(f"[AVERTISSEMENT] Tranche {start_date} → {end_date} : solde initial ({solde_initial:.2f}) "
+                  f"!= solde final de la tranche précédente ({solde_final_pdf:.2f})")
+        records.extend(shard_records)
+        if shard_records:
+            solde_courant = shard_records[-1]["solde"]
+        elif solde_courant is None:
+            solde_courant = solde_initial
+        solde_final_pdf = shard_solde_final
+    return records, solde_final_pdf
@@ -0,0 +1,94 @@
+"""
+Moteur de rapprochement en colonnes (pandas/NumPy) des lignes de relevé.
+
+Règles (identiques à la boucle historique de extract_detailed_data) :
+- paiement, retour et avoir diminuent le solde, tout le reste l'augmente ;
+- un paiement est neutralisé s'il a le même (date, montant) qu'un retour ou
+  un avoir, ou si les paiements du jour égalent le montant d'un retour ;
+- le solde courant est calculé en centimes entiers par somme cumulée, ce qui
+  reproduit exactement round(solde + effet, 2) ligne à ligne.
+"""
+import numpy as np
+import pandas as pd
+
+# Type de ligne, calculé une fois à l'analyse et stocké dans simple_transactions.type
+TYPE_VENTE, TYPE_PAIEMENT, TYPE_RETOUR, TYPE_AVOIR = 0, 1, 2, 3
+TYPE_LABELS = {TYPE_VENTE: "Vente", TYPE_PAIEMENT: "Paiement", TYPE_RETOUR: "Retour", TYPE_AVOIR: "Avoir"}
+
+
+def classify(libelles):
+    """Classe les libellés en une seule passe : drapeaux paiement/retour/avoir et type de ligne."""
+    lower = pd.Series(libelles, dtype="object").str.lower()
+    is_paiement = lower.str.contains("paiement", regex=False).to_numpy(dtype=bool)
+    is_retour = lower.str.contains("retour", regex=False).to_numpy(dtype=bool)
+    is_avoir = lower.str.contains("avoir", regex=False).to_numpy(dtype=bool)
+    types = np.select([is_paiement, is_retour, is_avoir], [TYPE_PAIEMENT, TYPE_RETOUR, TYPE_AVOIR], TYPE_VENTE)
+    return is_paiement, is_retour, is_avoir, types
+
+
+def compute_effects(frame):
+    """
+    frame : colonnes nom, date, libelle, total_brut (dans l'ordre du relevé).
+    Retourne (montant signé, effet sur le solde en centimes, type de ligne).
+    """
+    is_paiement, is_retour, is_avoir, types = classify(frame["libelle"])
+    brut = frame["total_brut"].abs().to_numpy(dtype=float)
+    montant = np.where(is_paiement | is_retour | is_avoir, -brut, brut)
+
+    keys = pd.MultiIndex.from_arrays([frame["nom"].to_numpy(), frame["date"].to_numpy()])
+    # Somme des paiements par (client, date), comparée au montant de chaque retour du jour
+    paiements_du_jour = pd.Series(np.where(is_paiement, brut, 0.0), index=keys).groupby(level=[0, 1]).sum()
+    somme_jour = paiements_du_jour.reindex(keys).to_numpy()
+    retour_egal = is_retour & (np.abs(somme_jour - brut) < 0.01)
+    dates_ignorees = keys[retour_egal]
+
+    # Paiement du même (client, date, montant) qu'un retour ou un avoir
+    keys_montant = pd.MultiIndex.from_arrays([frame["nom"].to_numpy(), frame["date"].to_numpy(), brut])
+    meme_montant = keys_montant.isin(keys_montant[is_retour]) | keys_montant.isin(keys_montant[is_avoir])
+
+    neutralise = is_paiement & (meme_montant | keys.isin(dates_ignorees))
+    effet_centimes = np.where(neutralise, 0, np.rint(montant * 100)).astype(np.int64)
+    return montant, effet_centimes, types
+
+
+def running_balance(noms, soldes_initiaux_centimes, effet_centimes):
+    """Solde courant par client : solde initial + somme cumulée des effets (en centimes)."""
+    cumul = pd.Series(effet_centimes).groupby(np.asarray(noms), sort=False).cumsum().to_numpy()
+    return (soldes_initiaux_centimes + cumul) / 100
+
+
+def reconcile(raw_rows, solde_initial):
+    """Rapproche les lignes lues dans un relevé (un seul client) et retourne les records."""
+    if not raw_rows:
+        return []
+    frame = pd.DataFrame(raw_rows, columns=["nom", "date", "reference", "libelle", "total_brut"])
+    montant, effet_centimes, types = compute_effects(frame)
+    soldes = running_balance(frame["nom"], int(round(solde_initial * 100)), effet_centimes)
+    return [
+        {"nom": nom, "date": date, "reference": reference, "libelle": libelle, "total": total, "solde": solde,
+         "type": type_}
+        for nom, date, reference, libelle, total, solde, type_ in zip(
+            frame["nom"].tolist(), frame["date"].tolist(), frame["reference"].tolist(),
+            frame["libelle"].tolist(), montant.tolist(), soldes.tolist(), types.tolist()
+        )
+    ]
+
+
+def rereconcile(frame):
+    """
+    Recalcule total et solde de lignes déjà stockées (plusieurs clients, ordre
+    d'insertion), sans relire les PDFs. Le solde initial de chaque client est
+    déduit de sa première ligne telle qu'elle a été stockée : solde stocké - total
+    signé, et non l'effet recalculé, qui change si les règles de neutralisation
+    du jour changent (un premier paiement déjà neutralisé au stockage n'est donc
+    pas reconnu comme tel).
+    frame : colonnes nom, date, libelle, total, solde. Retourne (total, solde).
+    """
+    frame = frame.assign(total_brut=frame["total"].abs())
+    montant, effet_centimes, _ = compute_effects(frame)
+    premiere = ~frame["nom"].duplicated().to_numpy()
+    # Totaux stockés éventuellement non signés : signe repris du libellé
+    stocke_centimes = np.rint(montant * 100).astype(np.int64)
+    initial_centimes = np.rint(frame["solde"].to_numpy(dtype=float) * 100).astype(np.int64) - stocke_centimes
+    initiaux = pd.Series(np.where(premiere, initial_centimes, 0)).groupby(frame["nom"].to_numpy(), sort=False).transform("sum")
+    return montant, running_balance(frame["nom"], initiaux.to_numpy(), effet_centimes)
@@ -2,10 +2,12 @@ import sys
 import os
 import re
 import time
+import datetime
 import shutil
 import requests
 import logging
 from requests.exceptions import RequestException
+from concurrent.futures import ThreadPoolExecutor
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
@@ -13,7 +15,10 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, StaleElementReferenceException, WebDriverException, ElementClickInterceptedException, NoSuchElementException
-from config.config import DOWNLOAD_DIR
+from core.download_control import DownloadError
+from core.statement_download import STATEMENT_API_URL, StatementBuffer
+from config.config import (DOWNLOAD_DIR, SHARD_WORKERS, SHARD_RETRIES, COOKIES_MAX_AGE,
+                           SESSION_PROBE_TTL, SESSION_PROBE_CUSTOMER_ID)
 import json
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -25,29 +30,125 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def split_date_range(start_date, end_date, period="year"):
+    """
+    Découpe [start_date, end_date] (YYYY-MM-DD, bornes incluses) en tranches
+    calendaires consécutives : "year" (années) ou "quarter" (trimestres).
+    """
+    if period not in ("year", "quarter"):
+        raise ValueError(f"Découpage inconnu : {period} (year ou quarter)")
+    start = datetime.date.fromisoformat(start_date)
+    end = datetime.date.fromisoformat(end_date)
+    shards = []
+    while start <= end:
+        if period == "year":
+            next_start = datetime.date(start.year + 1, 1, 1)
+        else:
+            month = (start.month - 1) // 3 * 3 + 4
+            next_start = datetime.date(start.year + (month > 12), (month - 1) % 12 + 1, 1)
+        shard_end = min(end, next_start - datetime.timedelta(days=1))
+        shards.append((start.isoformat(), shard_end.isoformat()))
+        start = next_start
+    return shards
+
+
+# Sérialise le tableau des clients en JSON dans le navigateur (un seul appel execute_script)
+CLIENTS_TABLE_SCRIPT = r"""
+const text = el => el ? el.innerText.trim() : "";
+const rows = document.querySelectorAll("table.sob-v2-table tbody tr");
+return JSON.stringify(Array.from(rows, row => {
+    const cells = row.querySelectorAll("td");
+    const link = row.querySelector("a[href*='/customer/']");
+    const href = link ? link.getAttribute("href") : (row.dataset.href || null);
+    const match = href ? href.match(/\/customers?\/(\d+)/) : null;
+    const dataId = row.dataset.id || row.dataset.customerId || null;
+    return {
+        nom: text(row.querySelector("th")),
+        email: text(cells[0]),
+        telephone: text(cells[1]),
+        organisme: text(cells[2]),
+        immatriculation: text(cells[3]),
+        lien: href,
+        client_id: match ? match[1] : dataId,
+        visible: row.offsetParent !== null
+    };
+}));
+"""
+
+CUSTOMER_NAME_KEYS = ("name", "nom", "full_name", "fullname", "display_name", "customer_name")
+
+
+def normalize_name(name):
+    return " ".join(str(name).split()).casefold()
+
+
+def customer_ids_from_payload(payload):
+    """
+    Parcourt une réponse JSON de l'API (liste des clients) et retourne {nom normalisé: id}
+    pour chaque objet portant un id et un nom (champ nom ou prénom + nom).
+    """
+    ids = {}
+    stack = [payload]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, list):
+            stack.extend(item)
+        elif isinstance(item, dict):
+            stack.extend(value for value in item.values() if isinstance(value, (dict, list)))
+            customer_id = item.get("id")
+            if not isinstance(customer_id, (int, str)) or not str(customer_id).isdigit():
+                continue
+            names = [item[key] for key in CUSTOMER_NAME_KEYS if isinstance(item.get(key), str)]
+            first, last = item.get("first_name") or item.get("firstname"), item.get("last_name") or item.get("lastname")
+            if isinstance(first, str) and isinstance(last, str):
+                names += [f"{first} {last}", f"{last} {first}"]
+            for name in names:
+                ids[normalize_name(name)] = str(customer_id)
+    return ids
+
+
 class PharmaScraper:
-    def __init__(self, download_dir=None, login=None, password=None, port=None):
+    def __init__(self, download_dir=None, login=None, password=None, port=None, capture_network=False):
         logger.info("Début initialisation PharmaScraper")
+        # Journal de performance de Chrome (réponses XHR) pour harvest_client_ids ; la capture réseau
+        # n'est activée qu'après un premier identifiant absent des attributs du tableau
+        self.capture_network = capture_network
+        self.network_capture_active = False
         self.download_dir = download_dir or DOWNLOAD_DIR
         self.login = login
         self.password = password
         self.port = port  # Ajouté pour identifier le worker
         self.session = requests.Session()
         self.cookies_file = f"cookies_{port or 'default'}.json"  # Fichier unique par port
-        self.driver = None  # Initialiser à None
+        # Chrome n'est lancé qu'au premier accès à self.driver (voir la propriété driver)
+        self._driver = None
+        self._wait = None
+        self.pending_cookies = None  # Cookies validés, à appliquer au driver à son lancement
         if os.path.exists(self.cookies_file):
             logger.info(f"Chargement des cookies depuis {self.cookies_file} pour requests")
             with open(self.cookies_file, 'r') as f:
-                cookies = json.load(f)
+                cookies = json.load(f).get("cookies", {})
             self.session.cookies.update(cookies)
-        self._setup_driver()
+        if os.path.exists(self.download_dir):
+            shutil.rmtree(self.download_dir)
+        os.makedirs(self.download_dir)
         logger.info("Fin initialisation PharmaScraper")
 
+    @property
+    def driver(self):
+        """WebDriver Chrome, lancé au premier usage : les traitements 100 % API n'ouvrent jamais Chrome."""
+        if self._driver is None:
+            self._setup_driver()
+        return self._driver
+
+    @property
+    def wait(self):
+        if self._wait is None:
+            self._setup_driver()
+        return self._wait
+
     def _setup_driver(self):
         logger.info("Configuration du driver Chrome")
-        if os.path.exists(self.download_dir):
-            shutil.rmtree(self.download_dir)
-        os.makedirs(self.download_dir)
         options = webdriver.ChromeOptions()
         # options.add_argument("--headless")  # Laisser commenté pour tests
         options.add_argument("--disable-gpu")
@@ -65,51 +166,39 @@ class PharmaScraper:
         }
         options.add_experimental_option("prefs", prefs)
         options.add_experimental_option("excludeSwitches", ["enable-automation"])
+        if self.capture_network:
+            options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+            options.add_experimental_option("perfLoggingPrefs", {"enableNetwork": True, "enablePage": False})
         try:
-            self.driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-            self.wait = WebDriverWait(self.driver, 30)
+            self._driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+            self._wait = WebDriverWait(self._driver, 30)
             logger.info("Driver Chrome configuré")
         except Exception as e:
             logger.error("Erreur lors de la configuration du driver: %s", str(e))
             raise
+        if self.capture_network:
+            self._set_network_capture(False)
+        if self.pending_cookies:
+            self._apply_cookies(self.pending_cookies)
+            self.pending_cookies = None
         logger.info("Fin configuration driver")
 
+    def _apply_cookies(self, cookie_dict):
+        self._driver.get("https://app.pharma.sobrus.com/")
+        for cookie in cookie_dict.items():
+            self._driver.add_cookie({"name": cookie[0], "value": cookie[1], "domain": ".pharma.sobrus.com"})
+        logger.info("Cookies appliqués au driver")
+
     def access_site(self, url, usern, password, force_auth=False):
         logger.info("Début access_site: %s", url)
         self.login = usern
         self.password = password
 
-        if not force_auth and os.path.exists(self.cookies_file):
-            logger.info("Test de validité des cookies chargés...")
-            with open(self.cookies_file, 'r') as f:
-                data = json.load(f)
-                cookies_timestamp = data.get("timestamp", 0)
-                cookies_age = time.time() - cookies_timestamp
-                if cookies_age > 3600:
-                    logger.info(f"Cookies trop vieux ({cookies_age:.0f}s), authentification requise")
-                else:
-                    cookie_dict = data.get("cookies", {})
-                    if not isinstance(cookie_dict, dict):
-                        logger.warning("Format des cookies invalide dans %s, authentification requise", self.cookies_file)
-                    else:
-                        self.session.cookies.clear()
-                        self.session.cookies.update(cookie_dict)
-                        test_url = "https://api.pharma.sobrus.com/customers/export-customer-statement?type=advanced&start_date=2017-01-01&end_date=2025-04-10&customer_id=2211711"
-                        try:
-                            test_response = self.session.get(test_url, timeout=10)
-                            if test_response.status_code == 200 and "Unauthorized" not in test_response.text:
-                                logger.info("Cookies valides pour requests, application au driver")
-                                self.driver.get("https://app.pharma.sobrus.com/")
-                                for cookie in cookie_dict.items():
-                                    self.driver.add_cookie({"name": cookie[0], "value": cookie[1], "domain": ".pharma.sobrus.com"})
-                                logger.info("Cookies appliqués au driver")
-                                return
-                            else:
-                                logger.info(f"Cookies invalides (code {test_response.status_code} ou contenu invalide), authentification requise")
-                        except RequestException as e:
-                            logger.warning(f"Erreur lors du test des cookies : {e}, authentification requise")
+        if not force_auth and self._restore_session():
+            return
 
         logger.info(f"Accès à {url} pour authentification complète")
+        self.pending_cookies = None
         self.driver.get(url)
         time.sleep(2)
 
@@ -155,6 +244,73 @@ class PharmaScraper:
         self.get_cookies_for_requests()
         logger.info("Fin access_site")
 
+    def _restore_session(self):
+        """
+        Reprend la session enregistrée dans cookies_file si elle est encore valide.
+        Une validation de moins de SESSION_PROBE_TTL secondes est réutilisée sans
+        requête ; sinon une seule petite requête de contrôle (probe_session).
+        """
+        if not os.path.exists(self.cookies_file):
+            return False
+        logger.info("Test de validité des cookies chargés...")
+        with open(self.cookies_file, 'r') as f:
+            data = json.load(f)
+        cookies_age = time.time() - data.get("timestamp", 0)
+        if cookies_age > COOKIES_MAX_AGE:
+            logger.info(f"Cookies trop vieux ({cookies_age:.0f}s), authentification requise")
+            return False
+        cookie_dict = data.get("cookies", {})
+        if not isinstance(cookie_dict, dict):
+            logger.warning("Format des cookies invalide dans %s, authentification requise", self.cookies_file)
+            return False
+        self.session.cookies.clear()
+        self.session.cookies.update(cookie_dict)
+        validated_age = time.time() - data.get("validated_at", 0)
+        if validated_age <= SESSION_PROBE_TTL:
+            logger.info(f"Session validée il y a {validated_age:.0f}s, aucun contrôle nécessaire")
+        elif self.probe_session():
+            data["validated_at"] = time.time()
+            with open(self.cookies_file, 'w') as f:
+                json.dump(data, f)
+        else:
+            return False
+        self.use_cookies(cookie_dict)
+        return True
+
+    def use_cookies(self, cookie_dict):
+        """Reprend une session déjà ouverte (fichier de cookies, autre processus) pour requests et pour le driver."""
+        self.session.cookies.clear()
+        self.session.cookies.update(cookie_dict)
+        if self._driver is not None:
+            logger.info("Cookies valides pour requests, application au driver")
+            self._apply_cookies(cookie_dict)
+        else:
+            # Pas de Chrome : cookies appliqués seulement s'il est lancé plus tard
+            logger.info("Cookies valides pour requests, driver non lancé")
+            self.pending_cookies = cookie_dict
+
+    def probe_session(self, timeout=10):
+        """
+        Contrôle léger de la session : relevé d'un seul jour, seuls le code HTTP,
+        les en-têtes et au besoin les premiers octets sont lus (le corps n'est pas
+        téléchargé). Valide seulement si la réponse est bien un PDF : une page
+        d'erreur servie en 200 (text/plain « Unauthorized ») ne l'est pas.
+        """
+        day = (datetime.date.today() - datetime.timedelta(days=1)).isoformat()
+        params = {"type": "advanced", "start_date": day, "end_date": day, "customer_id": SESSION_PROBE_CUSTOMER_ID}
+        try:
+            with self.session.get(STATEMENT_API_URL, params=params, stream=True, timeout=timeout) as response:
+                content_type = response.headers.get("Content-Type", "")
+                if response.status_code == 200 and ("application/pdf" in content_type or
+                                                    next(response.iter_content(chunk_size=4), b"") == b"%PDF"):
+                    logger.info("Session valide (contrôle léger)")
+                    return True
+                logger.info(f"Cookies invalides (code {response.status_code}, {content_type or 'type inconnu'}), "
+                            f"authentification requise")
+        except RequestException as e:
+            logger.warning(f"Erreur lors du test des cookies : {e}, authentification requise")
+        return False
+
     def is_session_active(self):
         logger.info("Vérification session active")
         try:
@@ -183,6 +339,10 @@ class PharmaScraper:
         logger.info("Fin ensure_session")
 
     def get_clients_from_page(self):
+        """
+        Lit tout le tableau des clients en un seul aller-retour WebDriver (CLIENTS_TABLE_SCRIPT).
+        client_id est renseigné quand la ligne expose un lien ou un attribut data-* vers la fiche client.
+        """
         logger.info("Début get_clients_from_page")
         if "login" in self.driver.current_url:
             logger.error("Redirigé vers la page de login, session invalide")
@@ -193,25 +353,20 @@ class PharmaScraper:
         retries = 3
         while retries > 0:
             try:
-                rows = self.driver.find_elements(By.CSS_SELECTOR, "table.sob-v2-table tbody tr")
-                if not rows or not rows[0].is_displayed():
+                rows = json.loads(self.driver.execute_script(CLIENTS_TABLE_SCRIPT))
+                if not rows or not rows[0]["visible"]:
                     raise StaleElementReferenceException("Rows not displayed yet")
                 for row in rows:
-                    nom = row.find_element(By.TAG_NAME, "th").text.strip()
-                    cells = row.find_elements(By.TAG_NAME, "td")
-                    email = cells[0].text.strip()
-                    telephone = cells[1].text.strip()
-                    organisme = cells[2].text.strip()
-                    immatriculation = cells[3].text.strip()
                     clients.append({
-                        "nom": nom,
-                        "email": email,
-                        "telephone": telephone,
-                        "organisme": organisme,
-                        "immatriculation": immatriculation,
-                        "lien": row
+                        "nom": row["nom"],
+                        "email": row["email"],
+                        "telephone": row["telephone"],
+                        "organisme": row["organisme"],
+                        "immatriculation": row["immatriculation"],
+                        "lien": row["lien"],
+                        "client_id": row["client_id"]
                     })
-                    logger.debug(f"Client extrait: {nom}")
+                    logger.debug(f"Client extrait: {row['nom']}")
                 break
             except StaleElementReferenceException as e:
                 retries -= 1
@@ -226,8 +381,71 @@ class PharmaScraper:
         logger.info(f"{len(clients)} clients extraits")
         return clients
 
+    def harvest_client_ids(self, clients):
+        """
+        Complète client_id des clients de la page courante sans ouvrir leur fiche : attributs
+        du tableau (get_clients_from_page), sinon réponse JSON de la liste des clients lue
+        dans le journal de performance de Chrome (capture_network=True).
+        La capture réseau ne démarre qu'au premier identifiant manquant : les clients de
+        cette page-là passent par leur fiche, les pages suivantes par le journal, vidé à
+        chaque appel même sans identifiant manquant.
+        Retourne le nombre de clients restés sans identifiant.
+        """
+        missing = [client for client in clients if not client.get("client_id")]
+        if self.network_capture_active:
+            entries = self._drain_performance_log()
+            if missing:
+                ids = self._customer_ids_from_network(entries)
+                for client in missing:
+                    client["client_id"] = ids.get(normalize_name(client["nom"]))
+                missing = [client for client in missing if not client["client_id"]]
+        elif missing and self.capture_network:
+            logger.info("Identifiants absents du tableau, capture réseau activée pour les pages suivantes")
+            self._set_network_capture(True)
+        logger.info(f"Identifiants lus sur la page : {len(clients) - len(missing)}/{len(clients)}")
+        return len(missing)
+
+    def _set_network_capture(self, active):
+        """Active ou coupe le domaine Network de Chrome, seule source du journal de performance."""
+        try:
+            self.driver.execute_cdp_cmd("Network.enable" if active else "Network.disable", {})
+            self.network_capture_active = active
+        except WebDriverException as e:
+            # Domaine Network laissé tel que chromedriver l'a ouvert (actif) : journal vidé à chaque page
+            logger.warning(f"Capture réseau non modifiée : {e}")
+            self.network_capture_active = True
+
+    def _drain_performance_log(self):
+        """Entrées du journal de performance reçues depuis le dernier appel (le journal est vidé)."""
+        try:
+            return self.driver.get_log("performance")
+        except WebDriverException as e:
+            logger.warning(f"Journal de performance indisponible : {e}")
+            return []
+
+    def _customer_ids_from_network(self, entries):
+        """{nom normalisé: id} extraits des réponses JSON de l'API clients parmi les entrées du journal."""
+        ids = {}
+        for entry in entries:
+            message = json.loads(entry["message"])["message"]
+            if message.get("method") != "Network.responseReceived":
+                continue
+            response = message["params"]["response"]
+            if "api.pharma.sobrus.com" not in response["url"] or "customers" not in response["url"] \
+                    or "json" not in response.get("mimeType", ""):
+                continue
+            try:
+                body = self.driver.execute_cdp_cmd("Network.getResponseBody",
+                                                   {"requestId": message["params"]["requestId"]})
+                ids.update(customer_ids_from_payload(json.loads(body["body"])))
+            except (WebDriverException, ValueError) as e:
+                logger.debug(f"Réponse {response['url']} illisible : {e}")
+        return ids
+
     def retrieve_client_key(self, client):
         logger.info(f"Début retrieve_client_key pour {client['nom']}")
+        if client.get("client_id"):
+            return client["client_id"]
         client_xpath = f'//table[contains(@class, "sob-v2-table")]//tbody/tr[th/span[normalize-space()="{client["nom"]}"]]'
         client_row = self.wait.until(EC.element_to_be_clickable((By.XPATH, client_xpath)))
         self.driver.execute_script("arguments[0].scrollIntoView(true);", client_row)
@@ -358,22 +576,34 @@ class PharmaScraper:
 
     def get_cookies_for_requests(self):
         logger.info("Début get_cookies_for_requests")
-        if self.driver:
+        if self._driver:
             cookies = self.driver.get_cookies()
             self.session.cookies.clear()
             for cookie in cookies:
                 self.session.cookies.set(cookie['name'], cookie['value'], domain=cookie['domain'])
             with open(self.cookies_file, 'w') as f:
-                json.dump({"cookies": {c['name']: c['value'] for c in cookies}, "timestamp": time.time()}, f)
+                # Session tout juste ouverte : validée, aucun contrôle pendant SESSION_PROBE_TTL
+                json.dump({"cookies": {c['name']: c['value'] for c in cookies}, "timestamp": time.time(),
+                           "validated_at": time.time()}, f)
             logger.info(f"Cookies extraits et sauvegardés dans {self.cookies_file}")
         else:
             logger.warning(f"Aucun driver actif, utilisation des cookies précédemment chargés depuis {self.cookies_file}")
         logger.info("Fin get_cookies_for_requests")
 
-    def download_detailed_pdf_api_with_requests(self, client, start_date, end_date, timeout=30):
+    def download_detailed_pdf_api_with_requests(self, client, start_date, end_date, timeout=30, in_memory=False):
+        """
+        Télécharge le relevé d'un client. Par défaut le PDF est écrit dans
+        downloads/<client_id>/ et son chemin est retourné ; avec in_memory=True
+        voir _download_pdf_to_buffer.
+        """
         logger.info("Début download_detailed_pdf_api_with_requests pour %s", client['nom'])
-        url = f"https://api.pharma.sobrus.com/customers/export-customer-statement?type=advanced&start_date={start_date}&end_date={end_date}&customer_id={client['client_id']}"
+        url = f"{STATEMENT_API_URL}?type=advanced&start_date={start_date}&end_date={end_date}&customer_id={client['client_id']}"
         logger.info(f"Téléchargement du PDF détaillé via l'URL: {url}")
+        if in_memory:
+            try:
+                return self._download_pdf_to_buffer(url, client, timeout)
+            finally:
+                logger.info("Fin download_detailed_pdf_api_with_requests")
         client_key = client['client_id']
         client_dir = os.path.join(self.download_dir, str(client_key))
         if not os.path.exists(client_dir):
@@ -384,7 +614,7 @@ class PharmaScraper:
         try:
             response = self.session.get(url, stream=True, timeout=30)
             if response.status_code != 200:
-                raise Exception(f"Erreur HTTP {response.status_code}: {response.text}")
+                raise DownloadError.from_response(response.status_code, response.text, response.headers)
             with open(pdf_path, 'wb') as f:
                 for chunk in response.iter_content(chunk_size=8192):
                     if chunk:
@@ -402,13 +632,76 @@ class PharmaScraper:
         finally:
             logger.info("Fin download_detailed_pdf_api_with_requests")
 
+    def download_detailed_pdf_shards(self, client, start_date, end_date, period="year", timeout=30,
+                                     in_memory=False, max_workers=SHARD_WORKERS, max_retries=SHARD_RETRIES,
+                                     limiter=None):
+        """
+        Télécharge le relevé par tranches de dates (voir split_date_range), en parallèle.
+        Chaque tranche est réessayée seule jusqu'à max_retries fois ; si l'une échoue
+        définitivement, les autres sont supprimées et l'erreur est levée. Avec limiter
+        (AdaptiveLimiter), chaque requête de tranche occupe un créneau.
+        Retourne [(début, fin, pdf)] dans l'ordre chronologique.
+        """
+        def download_shard(shard_start, shard_end):
+            for attempt in range(1, max_retries + 1):
+                try:
+                    if limiter is not None:
+                        pdf_file = limiter.call(self.download_detailed_pdf_api_with_requests, client, shard_start,
+                                                shard_end, timeout=timeout, in_memory=in_memory)
+                    else:
+                        pdf_file = self.download_detailed_pdf_api_with_requests(
+                            client, shard_start, shard_end, timeout=timeout, in_memory=in_memory
+                        )
+                    return shard_start, shard_end, pdf_file
+                except Exception as e:
+                    if attempt == max_retries:
+                        raise
+                    logger.warning(f"Tranche {shard_start} → {shard_end} de {client['nom']} : échec {attempt}/{max_retries} ({e})")
+                    time.sleep(2 * attempt)
+
+        shards = split_date_range(start_date, end_date, period)
+        logger.info(f"{client['nom']} : {len(shards)} tranche(s) de type {period} de {start_date} à {end_date}")
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(download_shard, shard_start, shard_end) for shard_start, shard_end in shards]
+            results, errors = [], []
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    errors.append(e)
+        if errors:
+            for _, _, pdf_file in results:
+                if isinstance(pdf_file, str) and os.path.exists(pdf_file):
+                    os.remove(pdf_file)
+            raise errors[0]
+        return results
+
+    def _download_pdf_to_buffer(self, url, client, timeout):
+        """
+        Télécharge le PDF sans passer par downloads/ : retourne un io.BytesIO, ou le
+        chemin d'un fichier temporaire si le PDF dépasse PDF_SPOOL_MAX_BYTES.
+        """
+        buffer = StatementBuffer(client)
+        try:
+            response = self.session.get(url, stream=True, timeout=timeout)
+            if response.status_code != 200:
+                raise DownloadError.from_response(response.status_code, response.text, response.headers)
+            for chunk in response.iter_content(chunk_size=65536):
+                buffer.write(chunk)
+            return buffer.result()
+        except Exception as e:
+            logger.error(f"Erreur lors du téléchargement pour {client['nom']} : {str(e)}")
+            buffer.discard()
+            raise
+
     def cleanup(self):
         logger.info("Début cleanup scraper")
         try:
-            if hasattr(self, 'driver') and self.driver:
+            if getattr(self, '_driver', None):
                 logger.info("Fermeture du driver Chrome")
-                self.driver.quit()
-                self.driver = None
+                self._driver.quit()
+                self._driver = None
+                self._wait = None
         except Exception as e:
             logger.error("Erreur lors de la fermeture du driver: %s", str(e))
         if os.path.exists(self.download_dir):
@@ -0,0 +1,55 @@
+import io
+import logging
+import os
+import tempfile
+from config.config import PDF_SPOOL_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+STATEMENT_API_URL = "https://api.pharma.sobrus.com/customers/export-customer-statement"
+MIN_PDF_BYTES = 1000  # En dessous, la réponse n'est pas un relevé exploitable
+
+
+class StatementBuffer:
+    """
+    Réception d'un relevé par morceaux, commune à PharmaScraper (requests) et à
+    AsyncStatementDownloader (httpx) : en mémoire (io.BytesIO), puis dans un
+    fichier temporaire dès que le PDF dépasse max_bytes.
+    """
+
+    def __init__(self, client, max_bytes=None):
+        self.client = client
+        self.max_bytes = PDF_SPOOL_MAX_BYTES if max_bytes is None else max_bytes
+        self.buffer = io.BytesIO()
+        self.spool_path = None
+
+    def write(self, chunk):
+        if not chunk:
+            return
+        self.buffer.write(chunk)
+        if self.spool_path is None and self.buffer.tell() > self.max_bytes:
+            # PDF volumineux : bascule vers un fichier temporaire
+            fd, self.spool_path = tempfile.mkstemp(suffix=".pdf")
+            spool = os.fdopen(fd, 'wb')
+            spool.write(self.buffer.getvalue())
+            self.buffer = spool
+
+    def result(self):
+        """Vérifie la taille du PDF reçu ; retourne l'io.BytesIO rembobiné ou le chemin du fichier temporaire."""
+        size = self.buffer.tell()
+        if size < MIN_PDF_BYTES:
+            raise Exception(f"PDF de {self.client['nom']} trop petit ({size} bytes)")
+        if self.spool_path:
+            self.buffer.close()
+            logger.info(f"PDF détaillé téléchargé pour {self.client['nom']} : {self.spool_path} ({size} bytes)")
+            return self.spool_path
+        self.buffer.seek(0)
+        logger.info(f"PDF détaillé téléchargé en mémoire pour {self.client['nom']} ({size} bytes)")
+        return self.buffer
+
+    def discard(self):
+        """Après un échec : supprime le fichier temporaire éventuel."""
+        if self.spool_path:
+            self.buffer.close()
+            if os.path.exists(self.spool_path):
+                os.remove(self.spool_path)
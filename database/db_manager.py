@@ -1,62 +1,86 @@
 import sqlite3
 import os
+import json
+from concurrent.futures import Future
+from database.db_writer import DBWriter, BUSY_TIMEOUT
+from database.migrations import migrate
+from core.reconciliation import TYPE_VENTE, TYPE_PAIEMENT, TYPE_RETOUR, TYPE_AVOIR
+
+
+def with_identity(data):
+    """
+    Ajoute à chaque ligne, dans l'ordre du relevé, son rang dans la journée (ordre)
+    et son rang parmi les lignes identiques du jour (occurrence).
+    """
+    orders, occurrences = {}, {}
+    for row in data:
+        ordre = orders.get(row['date'], 0)
+        orders[row['date']] = ordre + 1
+        key = transaction_key(row)
+        occurrence = occurrences.get(key, 0)
+        occurrences[key] = occurrence + 1
+        yield dict(row, ordre=ordre, occurrence=occurrence)
+
+
+def transaction_key(row):
+    """(date, référence, libellé, montant) : identité d'une ligne, au rang d'occurrence près."""
+    return row['date'], row['reference'] or "", row['libelle'], row['total']
+
+
+SUMMARY_COLUMNS = ("nom", "total_ventes", "total_paiements", "total_avoirs", "total_retours",
+                   "solde_initial", "solde_final", "last_date", "nb_lignes")
+# Agrégats de client_summary calculés depuis simple_transactions, par type de ligne
+SUMMARY_SELECT = f"""
+    SELECT nom,
+           SUM(CASE WHEN type = {TYPE_VENTE} THEN total ELSE 0 END),
+           SUM(CASE WHEN type = {TYPE_PAIEMENT} THEN total ELSE 0 END),
+           SUM(CASE WHEN type = {TYPE_AVOIR} THEN total ELSE 0 END),
+           SUM(CASE WHEN type = {TYPE_RETOUR} THEN total ELSE 0 END),
+           (SELECT solde - total FROM simple_transactions AS f WHERE f.nom = t.nom ORDER BY date, ordre LIMIT 1),
+           (SELECT solde FROM simple_transactions AS l WHERE l.nom = t.nom ORDER BY date DESC, ordre DESC LIMIT 1),
+           MAX(date), COUNT(*)
+    FROM simple_transactions AS t
+"""
+
+
+def _row_dict(row):
+    rowid, date, reference, libelle, total, occurrence, solde, ordre, type_ = row
+    return {"rowid": rowid, "date": date, "reference": reference, "libelle": libelle, "total": total,
+            "occurrence": occurrence, "solde": solde, "ordre": ordre, "type": type_}
+
 
 class DBManager:
     def __init__(self, db_path):
         self.db_path = db_path
+        self.writer = None
         self.init_db()
 
     def connect(self):
-        return sqlite3.connect(self.db_path)
+        # busy_timeout : attente du verrou d'écriture au lieu d'un "database is locked" immédiat
+        return sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT)
+
+    def start_writer(self):
+        """Démarre l'écrivain unique (DBWriter) : les sauvegardes sont alors regroupées par lots."""
+        if self.writer is None:
+            self.writer = DBWriter(self.db_path)
+
+    def stop_writer(self):
+        """Valide les écritures en attente et fusionne le WAL dans le fichier de la base."""
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def checkpoint(self):
+        """Fusionne le WAL dans le fichier de la base (à appeler avant un upload S3)."""
+        with self.connect() as conn:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
 
     def init_db(self):
         with self.connect() as conn:
-            # Table des clés clients
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS client_keys (
-                    nom TEXT PRIMARY KEY,
-                    client_key TEXT
-                )
-            """)
-            # Table originale détaillée
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS detailed_transactions (
-                    nom TEXT,
-                    date TEXT,
-                    reference TEXT,
-                    produit TEXT,
-                    quantite REAL,
-                    prix_unitaire REAL,
-                    remise REAL,
-                    prix_unitaire_remise REAL,
-                    total REAL,
-                    solde REAL
-                )
-            """)
-            # Ajout colonne manquante si nécessaire
-            cursor = conn.execute("PRAGMA table_info(detailed_transactions)")
-            columns = [col[1] for col in cursor.fetchall()]
-            if 'reference' not in columns:
-                conn.execute("ALTER TABLE detailed_transactions ADD COLUMN reference TEXT")
-            # Table des soldes finaux
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS solde_final (
-                    nom TEXT PRIMARY KEY,
-                    solde REAL
-                )
-            """)
-            # Nouvelle table simplifiée
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS simple_transactions (
-                    nom TEXT,
-                    date TEXT,
-                    reference TEXT,
-                    libelle TEXT,
-                    total REAL,
-                    solde REAL
-                )
-            """)
-            conn.commit()
+            # WAL : lectures concurrentes pendant les écritures (réglage persistant dans le fichier)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Tables et index : database/migrations.py, version dans schema_version
+            migrate(conn)
 
     def init_detailed_transactions(self, client_name):
         with self.connect() as conn:
@@ -81,14 +105,134 @@ class DBManager:
                 conn.execute("INSERT OR REPLACE INTO solde_final (nom, solde) VALUES (?, ?)", (client['nom'], solde_final))
             conn.commit()
 
-    def save_simple_transactions(self, data, solde_final, client):
+    def save_simple_transactions(self, data, solde_final, client, since=None):
+        """
+        Aligne les lignes du client sur data : lignes nouvelles ou modifiées écrites par
+        upsert, lignes disparues supprimées, lignes inchangées non réécrites. Avec since
+        (synchronisation incrémentale), seules les lignes datées de since ou après sont concernées.
+        """
+        if self.writer is not None:
+            return self.writer.submit(self._save_simple_transactions, data, solde_final, client, since).result()
         with self.connect() as conn:
-            conn.execute("DELETE FROM simple_transactions WHERE nom = ?", (client['nom'],))
-            conn.executemany("""
-                INSERT INTO simple_transactions (nom, date, reference, libelle, total, solde)
-                VALUES (:nom, :date, :reference, :libelle, :total, :solde)
-            """, data)
-            if solde_final is not None:
-                conn.execute("INSERT OR REPLACE INTO solde_final (nom, solde) VALUES (?, ?)",
-                             (client['nom'], solde_final))
+            self._save_simple_transactions(conn, data, solde_final, client, since)
+            conn.commit()
+
+    def submit_simple_transactions(self, data, solde_final, client, since=None):
+        """
+        Version non bloquante de save_simple_transactions : retourne un Future résolu
+        après la validation du lot par l'écrivain (écriture immédiate sans écrivain).
+        """
+        if self.writer is not None:
+            return self.writer.submit(self._save_simple_transactions, data, solde_final, client, since)
+        future = Future()
+        try:
+            future.set_result(self.save_simple_transactions(data, solde_final, client, since))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def _save_simple_transactions(self, conn, data, solde_final, client, since):
+        query = ("SELECT rowid, date, reference, libelle, total, occurrence, solde, ordre, type "
+                 "FROM simple_transactions WHERE nom = ?")
+        params = (client['nom'],)
+        if since:
+            query += " AND date >= ?"
+            params += (since,)
+        existing = {(*transaction_key(row), row['occurrence']): row
+                    for row in map(_row_dict, conn.execute(query, params))}
+        changed = []
+        for row in with_identity(data):
+            stored = existing.pop((*transaction_key(row), row['occurrence']), None)
+            if stored is None or any(stored[col] != row[col] for col in ("solde", "ordre", "type")):
+                changed.append(row)
+        # Lignes disparues du relevé ; les lignes inchangées ne sont pas réécrites
+        conn.executemany("DELETE FROM simple_transactions WHERE rowid = ?",
+                         [(row['rowid'],) for row in existing.values()])
+        conn.executemany("""
+            INSERT INTO simple_transactions (nom, date, reference, libelle, total, solde, ordre, occurrence, type)
+            VALUES (:nom, :date, :reference, :libelle, :total, :solde, :ordre, :occurrence, :type)
+            ON CONFLICT (nom, date, IFNULL(reference, ''), libelle, total, occurrence)
+            DO UPDATE SET solde = excluded.solde, ordre = excluded.ordre, type = excluded.type
+            WHERE (solde, ordre, type) IS NOT (excluded.solde, excluded.ordre, excluded.type)
+        """, changed)
+        if solde_final is not None:
+            conn.execute("""
+                INSERT INTO solde_final (nom, solde) VALUES (?, ?)
+                ON CONFLICT (nom) DO UPDATE SET solde = excluded.solde WHERE solde IS NOT excluded.solde
+            """, (client['nom'], solde_final))
+        self._update_sync_state(conn, client['nom'], solde_final)
+        self._update_client_summary(conn, client['nom'])
+
+    def save_client_keys(self, rows):
+        """rows : itérable de (nom, client_key), écrits en une seule transaction."""
+        with self.connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO client_keys (nom, client_key) VALUES (?, ?)", rows)
+            conn.commit()
+
+    def _update_sync_state(self, conn, client_name, solde_final):
+        """Recalcule le point de reprise du client dans la transaction de sauvegarde."""
+        last_date = conn.execute("SELECT MAX(date) FROM simple_transactions WHERE nom = ?",
+                                 (client_name,)).fetchone()[0]
+        previous = None
+        if last_date is not None:
+            previous = conn.execute("""
+                SELECT solde FROM simple_transactions WHERE nom = ? AND date < ?
+                ORDER BY date DESC, ordre DESC LIMIT 1
+            """, (client_name, last_date)).fetchone()
+        if previous is None:
+            # Historique vide ou sur un seul jour : la prochaine synchronisation sera complète
+            conn.execute("DELETE FROM sync_state WHERE nom = ?", (client_name,))
+        else:
+            conn.execute("""
+                INSERT INTO sync_state (nom, last_date, solde_ouverture, solde_final) VALUES (?, ?, ?, ?)
+                ON CONFLICT (nom) DO UPDATE SET last_date = excluded.last_date,
+                    solde_ouverture = excluded.solde_ouverture, solde_final = excluded.solde_final
+                WHERE (last_date, solde_ouverture, solde_final) IS NOT
+                      (excluded.last_date, excluded.solde_ouverture, excluded.solde_final)
+            """, (client_name, last_date, previous[0], solde_final))
+
+    def _update_client_summary(self, conn, client_name):
+        """Recalcule les agrégats du client dans la transaction de sauvegarde (lecture indexée de ses lignes)."""
+        conn.execute(f"""
+            INSERT INTO client_summary ({", ".join(SUMMARY_COLUMNS)})
+            {SUMMARY_SELECT} WHERE nom = ? GROUP BY nom
+            ON CONFLICT (nom) DO UPDATE SET {", ".join(f"{col} = excluded.{col}" for col in SUMMARY_COLUMNS[1:])}
+            WHERE ({", ".join(SUMMARY_COLUMNS[1:])}) IS NOT ({", ".join(f"excluded.{col}" for col in SUMMARY_COLUMNS[1:])})
+        """, (client_name,))
+        conn.execute("""
+            DELETE FROM client_summary WHERE nom = ?
+            AND NOT EXISTS (SELECT 1 FROM simple_transactions WHERE nom = ?)
+        """, (client_name, client_name))
+
+    def get_client_summary(self, client_name):
+        """Agrégats du client (dict de SUMMARY_COLUMNS), ou None s'il n'a aucune ligne."""
+        with self.connect() as conn:
+            row = conn.execute(f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM client_summary WHERE nom = ?",
+                               (client_name,)).fetchone()
+            return dict(zip(SUMMARY_COLUMNS, row)) if row else None
+
+    def get_sync_states(self):
+        """Retourne {nom: (last_date, solde_ouverture)} pour les clients déjà synchronisés."""
+        with self.connect() as conn:
+            cursor = conn.execute("SELECT nom, last_date, solde_ouverture FROM sync_state")
+            return {nom: (last_date, solde_ouverture) for nom, last_date, solde_ouverture in cursor.fetchall()}
+
+    def update_simple_balances(self, rows):
+        """
+        rows : itérable de (total, solde, rowid) recalculés par le moteur de rapprochement.
+        Le point de reprise (sync_state) et les agrégats (client_summary) des seuls clients
+        concernés sont recalculés dans la même transaction : la synchronisation
+        incrémentale suivante repart des soldes réécrits.
+        """
+        rows = list(rows)
+        with self.connect() as conn:
+            conn.executemany("UPDATE simple_transactions SET total = ?, solde = ? WHERE rowid = ?", rows)
+            names = [name for (name,) in conn.execute("""
+                SELECT DISTINCT nom FROM simple_transactions WHERE rowid IN (SELECT value FROM json_each(?))
+            """, (json.dumps([rowid for _, _, rowid in rows]),))]
+            for client_name in names:
+                # Solde final du dernier relevé conservé : seul le solde d'ouverture change
+                state = conn.execute("SELECT solde_final FROM sync_state WHERE nom = ?", (client_name,)).fetchone()
+                self._update_sync_state(conn, client_name, state[0] if state else None)
+                self._update_client_summary(conn, client_name)
             conn.commit()
@@ -0,0 +1,116 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+BUSY_TIMEOUT = 30  # Secondes d'attente d'un verrou SQLite avant "database is locked"
+WRITE_BATCH_SIZE = 64  # Écritures regroupées au plus dans une transaction
+WRITE_BATCH_DELAY = 0.05  # Secondes d'attente d'autres écritures avant de valider un lot
+
+
+class DBWriter:
+    """
+    Écrivain unique d'une base SQLite : un thread propriétaire d'une connexion
+    (WAL, busy_timeout, synchronous=FULL) qui reçoit les écritures par une file
+    et les regroupe en une transaction par lot.
+
+    submit(fn, *args) planifie fn(conn, *args) dans le thread écrivain et retourne
+    un concurrent.futures.Future résolu une fois le lot validé (COMMIT) : une
+    écriture confirmée est durable. Chaque écriture est isolée par un SAVEPOINT,
+    l'échec de l'une n'annule pas les autres écritures du lot.
+    """
+
+    def __init__(self, db_path, batch_size=WRITE_BATCH_SIZE, batch_delay=WRITE_BATCH_DELAY):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.queue = queue.Queue()
+        self.started = time.monotonic()
+        self.busy = 0.0
+        self.batches = 0
+        self.writes = 0
+        self.thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.queue.put((fn, args, future))
+        return future
+
+    def close(self):
+        """Valide les écritures en attente, fusionne le WAL dans la base et arrête le thread."""
+        self.queue.put(None)
+        self.thread.join()
+
+    def _run(self):
+        # isolation_level=None : transactions ouvertes explicitement par lot
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")
+        try:
+            stop = False
+            while not stop:
+                item = self.queue.get()
+                if item is None:
+                    break
+                batch = [item]
+                deadline = time.monotonic() + self.batch_delay
+                while len(batch) < self.batch_size:
+                    try:
+                        item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stop = True
+                        break
+                    batch.append(item)
+                self._write_batch(conn, batch)
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finally:
+            conn.close()
+            logger.info(f"Écrivain SQLite arrêté : {self.summary()}")
+
+    def _write_batch(self, conn, batch):
+        started = time.monotonic()
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, args, future in batch:
+                conn.execute("SAVEPOINT ecriture")
+                try:
+                    results.append((future, fn(conn, *args), None))
+                    conn.execute("RELEASE ecriture")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO ecriture")
+                    conn.execute("RELEASE ecriture")
+                    results.append((future, None, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            logger.error(f"Échec du lot de {len(batch)} écriture(s) : {e}")
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        finally:
+            self.busy += time.monotonic() - started
+            self.batches += 1
+            self.writes += len(batch)
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def utilization(self):
+        elapsed = time.monotonic() - self.started
+        return self.busy / elapsed if elapsed > 0 else 0.0
+
+    def summary(self):
+        average = self.writes / self.batches if self.batches else 0.0
+        return (f"{self.writes} écriture(s) en {self.batches} transaction(s) ({average:.1f} par lot), "
+                f"{self.queue.qsize()} en file, occupation {self.utilization():.0%}")
@@ -0,0 +1,208 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _initial_schema(conn):
+    # Table des clés clients
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS client_keys (
+            nom TEXT PRIMARY KEY,
+            client_key TEXT
+        )
+    """)
+    # Table originale détaillée
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS detailed_transactions (
+            nom TEXT,
+            date TEXT,
+            reference TEXT,
+            produit TEXT,
+            quantite REAL,
+            prix_unitaire REAL,
+            remise REAL,
+            prix_unitaire_remise REAL,
+            total REAL,
+            solde REAL
+        )
+    """)
+    # Ajout colonne manquante si nécessaire (bases antérieures à la colonne reference)
+    if 'reference' not in _columns(conn, "detailed_transactions"):
+        conn.execute("ALTER TABLE detailed_transactions ADD COLUMN reference TEXT")
+    # Table des soldes finaux
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS solde_final (
+            nom TEXT PRIMARY KEY,
+            solde REAL
+        )
+    """)
+    # Nouvelle table simplifiée
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS simple_transactions (
+            nom TEXT,
+            date TEXT,
+            reference TEXT,
+            libelle TEXT,
+            total REAL,
+            solde REAL
+        )
+    """)
+    # Point de reprise de la synchronisation incrémentale : dernier jour stocké
+    # et solde avant ce jour (le relevé suivant repart de ce jour inclus)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sync_state (
+            nom TEXT PRIMARY KEY,
+            last_date TEXT,
+            solde_ouverture REAL,
+            solde_final REAL
+        )
+    """)
+
+
+def _transaction_keys(conn):
+    # Clé naturelle d'une ligne : client, jour et rang de la ligne dans la journée du relevé
+    if 'ordre' not in _columns(conn, "simple_transactions"):
+        conn.execute("ALTER TABLE simple_transactions ADD COLUMN ordre INTEGER")
+    conn.execute("""
+        UPDATE simple_transactions SET ordre = numbered.ordre
+        FROM (SELECT rowid AS id, ROW_NUMBER() OVER (PARTITION BY nom, date ORDER BY rowid) - 1 AS ordre
+              FROM simple_transactions) AS numbered
+        WHERE simple_transactions.rowid = numbered.id
+    """)
+    # L'index unique sert aussi aux recherches par nom et par (nom, date)
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_simple_transactions_cle "
+                 "ON simple_transactions (nom, date, ordre)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_detailed_transactions_nom_date "
+                 "ON detailed_transactions (nom, date)")
+
+
+def _transaction_identity(conn):
+    # Identité stable d'une ligne : jour, référence, libellé, montant et rang parmi les
+    # lignes identiques du jour ; le rang dans la journée (ordre) ne sert plus qu'au tri
+    if 'occurrence' not in _columns(conn, "simple_transactions"):
+        conn.execute("ALTER TABLE simple_transactions ADD COLUMN occurrence INTEGER")
+    conn.execute("""
+        UPDATE simple_transactions SET occurrence = numbered.occurrence
+        FROM (SELECT rowid AS id, ROW_NUMBER() OVER (
+                  PARTITION BY nom, date, IFNULL(reference, ''), libelle, total ORDER BY ordre) - 1 AS occurrence
+              FROM simple_transactions) AS numbered
+        WHERE simple_transactions.rowid = numbered.id
+    """)
+    conn.execute("DROP INDEX IF EXISTS idx_simple_transactions_cle")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_simple_transactions_ordre "
+                 "ON simple_transactions (nom, date, ordre)")
+    # Cible des INSERT ... ON CONFLICT de DBManager (référence absente : chaîne vide)
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_simple_transactions_identite "
+                 "ON simple_transactions (nom, date, IFNULL(reference, ''), libelle, total, occurrence)")
+
+
+def _client_summary(conn):
+    # Agrégats par client tenus à jour à chaque sauvegarde (DBManager._update_client_summary)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS client_summary (
+            nom TEXT PRIMARY KEY,
+            total_ventes REAL,
+            total_paiements REAL,
+            total_avoirs REAL,
+            total_retours REAL,
+            solde_initial REAL,
+            solde_final REAL,
+            last_date TEXT,
+            nb_lignes INTEGER
+        )
+    """)
+    conn.execute("""
+        INSERT OR REPLACE INTO client_summary
+        SELECT nom,
+               SUM(CASE WHEN libelle LIKE '%vente%' AND libelle NOT LIKE '%paiement%'
+                         AND libelle NOT LIKE '%retour%' THEN total ELSE 0 END),
+               SUM(CASE WHEN libelle LIKE '%paiement%' THEN total ELSE 0 END),
+               SUM(CASE WHEN libelle LIKE '%avoir%' THEN total ELSE 0 END),
+               SUM(CASE WHEN libelle LIKE '%retour%' THEN total ELSE 0 END),
+               (SELECT solde - total FROM simple_transactions AS f WHERE f.nom = t.nom
+                ORDER BY date, ordre LIMIT 1),
+               (SELECT solde FROM simple_transactions AS l WHERE l.nom = t.nom
+                ORDER BY date DESC, ordre DESC LIMIT 1),
+               MAX(date), COUNT(*)
+        FROM simple_transactions AS t GROUP BY nom
+    """)
+
+
+def _transaction_type(conn):
+    # Type de ligne (core.reconciliation.TYPE_*) : 0 vente, 1 paiement, 2 retour, 3 avoir,
+    # avec la même priorité que reconciliation.classify
+    if 'type' not in _columns(conn, "simple_transactions"):
+        conn.execute("ALTER TABLE simple_transactions ADD COLUMN type INTEGER")
+    conn.execute("""
+        UPDATE simple_transactions SET type = CASE
+            WHEN libelle LIKE '%paiement%' THEN 1
+            WHEN libelle LIKE '%retour%' THEN 2
+            WHEN libelle LIKE '%avoir%' THEN 3
+            ELSE 0 END
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_simple_transactions_type ON simple_transactions (nom, type)")
+    # Agrégats recalculés selon le type stocké
+    conn.execute("""
+        UPDATE client_summary SET
+            total_ventes = totals.ventes, total_paiements = totals.paiements,
+            total_avoirs = totals.avoirs, total_retours = totals.retours
+        FROM (SELECT nom,
+                     SUM(CASE WHEN type = 0 THEN total ELSE 0 END) AS ventes,
+                     SUM(CASE WHEN type = 1 THEN total ELSE 0 END) AS paiements,
+                     SUM(CASE WHEN type = 3 THEN total ELSE 0 END) AS avoirs,
+                     SUM(CASE WHEN type = 2 THEN total ELSE 0 END) AS retours
+              FROM simple_transactions GROUP BY nom) AS totals
+        WHERE client_summary.nom = totals.nom
+    """)
+
+
+# (version, description, fonction) ; une migration publiée ne doit plus être modifiée
+MIGRATIONS = [
+    (1, "Schéma initial", _initial_schema),
+    (2, "Index (nom, date) et clé naturelle des transactions", _transaction_keys),
+    (3, "Identité stable des transactions pour les sauvegardes par upsert", _transaction_identity),
+    (4, "Table client_summary des agrégats par client", _client_summary),
+    (5, "Colonne type (entier indexé) des transactions", _transaction_type),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def _columns(conn, table):
+    return [col[1] for col in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+
+
+def current_version(conn):
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def migrate(conn):
+    """
+    Applique les migrations manquantes, chacune dans sa propre transaction avec
+    sa ligne dans schema_version. BEGIN IMMEDIATE prend le verrou d'écriture avant
+    de relire la version : plusieurs processus peuvent ouvrir la base en même temps.
+    Retourne la version du schéma.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.commit()
+    for version, description, apply in MIGRATIONS:
+        if version <= current_version(conn):
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if version > current_version(conn):
+                logger.info(f"Migration du schéma vers la version {version} : {description}")
+                apply(conn)
+                conn.execute("INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                             (version, description))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return current_version(conn)
@@ -18,6 +18,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from config.config import START_DATE, END_DATE
 from runners.client_keys import run as run_client_keys
 from runners.detailed_pdf import run as run_detailed_pdf
+from runners.rereconcile import run as run_rereconcile
 from core.scraper import PharmaScraper
 
 def timeout_handler(timeout_event):
@@ -81,8 +82,22 @@ if __name__ == "__main__":
                 logger.info("Fin de run_detailed_pdf")
             finally:
                 timer.cancel()
+        elif choice == "6":
+            logger.info("Lancement de run_detailed_pdf (incrémental)")
+            timer = threading.Timer(900, timeout_handler, args=(timeout_event,))
+            timer.start()
+            try:
+                run_detailed_pdf(login, password, db_path, start_date, end_date, client_name, scraper=scraper,
+                                 incremental=True)
+                logger.info("Fin de run_detailed_pdf (incrémental)")
+            finally:
+                timer.cancel()
+        elif choice == "5":
+            logger.info("Lancement de run_rereconcile")
+            run_rereconcile(login, password, db_path, start_date, end_date, client_name)
+            logger.info("Fin de run_rereconcile")
         else:
-            logger.error("Option invalide: 1 ou 4")
+            logger.error("Option invalide: 1, 4, 5 ou 6")
             sys.exit(1)
     except TimeoutError as e:
         logger.error("Arrêt forcé: %s", str(e))
@@ -32,6 +32,72 @@ logger = logging.getLogger(__name__)
 # Configuration
 NUM_WORKERS = 3  # Nombre de workers (modifiable ici)
 BASE_PORT = 9222  # Port de départ pour les instances Chrome
+APP_URL = "https://app.pharma.sobrus.com/"
+HARVEST_IDS = True  # Clés lues sur la page (attributs du tableau ou réponse XHR) ; clic sur la fiche en secours
+MAX_AUTH_RETRIES = 3
+
+
+class SessionBroker:
+    """
+    Session partagée par tous les workers : une seule authentification par traitement
+    (login_once, dans le processus principal), cookies distribués par un dict du Manager
+    et injectés dans chaque navigateur (attach). Un worker qui constate l'expiration
+    appelle refresh : le premier réauthentifie avec son navigateur et publie les nouveaux
+    cookies, les autres attendent le verrou puis reprennent ces cookies sans se reconnecter.
+    Chaque processus reçoit sa copie de l'objet : generation est la génération de cookies
+    utilisée par ce processus.
+    """
+
+    def __init__(self, manager, login, password):
+        self.login = login
+        self.password = password
+        self.state = manager.dict(generation=0, cookies={})
+        self.lock = manager.Lock()
+        self.generation = 0
+
+    def login_once(self):
+        """Authentification unique (cookies en cache réutilisés s'ils sont valides, sans Chrome)."""
+        scraper = PharmaScraper(login=self.login, password=self.password, download_dir=tempfile.mkdtemp())
+        try:
+            for attempt in range(1, MAX_AUTH_RETRIES + 1):
+                try:
+                    scraper.access_site(APP_URL, self.login, self.password)
+                    break
+                except Exception as e:
+                    logger.warning(f"Échec authentification (tentative {attempt}/{MAX_AUTH_RETRIES}) : {str(e)}")
+                    if attempt == MAX_AUTH_RETRIES:
+                        raise
+                    time.sleep(2)
+            self._publish(scraper.session.cookies.get_dict())
+        finally:
+            scraper.cleanup()
+
+    def _publish(self, cookies):
+        self.state.update(generation=self.state["generation"] + 1, cookies=cookies)
+        self.generation = self.state["generation"]
+        logger.info(f"Session partagée publiée (génération {self.generation}, {len(cookies)} cookies)")
+
+    def attach(self, scraper):
+        """Injecte les cookies partagés courants dans le scraper (requests et navigateur)."""
+        with self.lock:
+            self.generation, cookies = self.state["generation"], self.state["cookies"]
+        scraper.use_cookies(cookies)
+
+    def refresh(self, scraper):
+        """Session expirée : une seule réauthentification pour tous les workers."""
+        process_name = multiprocessing.current_process().name
+        with self.lock:
+            if self.state["generation"] == self.generation:
+                logger.warning(f"[{process_name}] Session expirée, réauthentification pour tous les workers")
+                scraper.access_site(APP_URL, self.login, self.password, force_auth=True)
+                self._publish(scraper.session.cookies.get_dict())
+                return
+        logger.info(f"[{process_name}] Session déjà renouvelée par un autre worker")
+        self.attach(scraper)
+
+    def ensure_session(self, scraper):
+        if not scraper.is_session_active():
+            self.refresh(scraper)
 
 def create_scraper(login, password, port, download_dir):
     """Crée une instance PharmaScraper avec un port et un profil uniques."""
@@ -45,7 +111,8 @@ def create_scraper(login, password, port, download_dir):
             "--no-sandbox",
             "--disable-dev-shm-usage",
         ]
-        scraper = PharmaScraper(login=login, password=password, download_dir=download_dir)
+        scraper = PharmaScraper(login=login, password=password, download_dir=download_dir,
+                                capture_network=HARVEST_IDS)
         for opt in options:
             scraper.driver.command_executor._commands["send_command"] = (
                 "POST",
@@ -193,12 +260,13 @@ def navigate_to_page(scraper, target_page, current_page=1, max_retries=3):
     logger.error(f"[{process_name}] Échec navigation après toutes les tentatives")
     return False
 
-def process_page(page_number, login, password, db_path, scraper, port, download_dir, lock, processed_client_keys):
+def process_page(page_number, login, password, db_path, scraper, port, download_dir, lock, processed_client_keys,
+                 broker):
     """Traite une page spécifique avec un navigateur existant."""
     process_name = multiprocessing.current_process().name
     logger.info(f"[{process_name}] Début traitement page {page_number}")
     try:
-        scraper.ensure_session()
+        broker.ensure_session(scraper)
 
         for attempt in range(3):
             if navigate_to_page(scraper, page_number):
@@ -215,40 +283,49 @@ def process_page(page_number, login, password, db_path, scraper, port, download_
         )
         clients = scraper.get_clients_from_page()
         logger.info(f"[{process_name}] {len(clients)} clients extraits de la page {page_number}")
+        if HARVEST_IDS:
+            missing = scraper.harvest_client_ids(clients)
+            if missing:
+                logger.warning(f"[{process_name}] {missing} clé(s) absente(s) de la page {page_number}, "
+                               f"ouverture des fiches clients")
 
         db = DBManager(db_path)
         seen_client_keys = set()
-        for client in clients:
-            client_name = client["nom"]
-            client_key = None
-            for retry in range(3):
-                try:
-                    client_key = extract_client_key(scraper, client_name, page_number)
-                    break
-                except Exception as e:
-                    logger.warning(f"[{process_name}] Échec tentative {retry + 1} pour {client_name}: {str(e)}")
-                    if retry == 2:
-                        logger.error(f"[{process_name}] Échec définitif pour {client_name}")
-                        continue
-                    time.sleep(2)
-            if not client_key:
-                continue
+        page_keys = []  # Écrites en une seule transaction par page
+        try:
+            for client in clients:
+                client_name = client["nom"]
+                client_key = client.get("client_id") if HARVEST_IDS else None
+                for retry in range(0 if client_key else 3):
+                    try:
+                        client_key = extract_client_key(scraper, client_name, page_number)
+                        break
+                    except Exception as e:
+                        logger.warning(f"[{process_name}] Échec tentative {retry + 1} pour {client_name}: {str(e)}")
+                        if retry == 2:
+                            logger.error(f"[{process_name}] Échec définitif pour {client_name}")
+                            continue
+                        time.sleep(2)
+                if not client_key:
+                    continue
 
-            with lock:
-                if client_key in processed_client_keys:
-                    logger.warning(f"[{process_name}] Clé {client_key} pour {client_name} déjà traitée globalement, ignoré")
+                with lock:
+                    if client_key in processed_client_keys:
+                        logger.warning(f"[{process_name}] Clé {client_key} pour {client_name} déjà traitée globalement, ignoré")
+                        continue
+                    processed_client_keys.append(client_key)
+                if client_key in seen_client_keys:
+                    logger.warning(f"[{process_name}] Clé {client_key} pour {client_name} déjà traitée sur page {page_number}, ignoré")
                     continue
-                processed_client_keys.append(client_key)
-            if client_key in seen_client_keys:
-                logger.warning(f"[{process_name}] Clé {client_key} pour {client_name} déjà traitée sur page {page_number}, ignoré")
-                continue
-            seen_client_keys.add(client_key)
-
-            with db.connect() as conn:
-                conn.execute("INSERT OR REPLACE INTO client_keys (nom, client_key) VALUES (?, ?)",
-                             (client_name, client_key))
-                conn.commit()
-            logger.info(f"[{process_name}] Clé sauvegardée pour {client_name}: {client_key} (page {page_number})")
+                seen_client_keys.add(client_key)
+
+                page_keys.append((client_name, client_key))
+                logger.info(f"[{process_name}] Clé récupérée pour {client_name}: {client_key} (page {page_number})")
+        finally:
+            # Les clés déjà récupérées sont gardées même si la page échoue en cours de route
+            if page_keys:
+                db.save_client_keys(page_keys)
+                logger.info(f"[{process_name}] {len(page_keys)} clé(s) sauvegardée(s) pour la page {page_number}")
 
         # Vérifier si c'est la dernière page
         is_last_page = not scraper.go_to_next_page()
@@ -323,7 +400,8 @@ def extract_client_key(scraper, client_name, expected_page, max_retries=3):
             logger.error(f"[{process_name}] Erreur inattendue pour {client_name}: {str(e)}")
             return None
 
-def worker(port, login, password, db_path, lock, total_clients, download_dir, processed_client_keys, page_counter):
+def worker(port, login, password, db_path, lock, total_clients, download_dir, processed_client_keys, page_counter,
+           broker):
     """Travaille sur les pages assignées avec un seul scraper."""
     process_name = multiprocessing.current_process().name
     logger.info(f"[{process_name}] Démarrage du travailleur avec port {port}")
@@ -332,22 +410,17 @@ def worker(port, login, password, db_path, lock, total_clients, download_dir, pr
     try:
         scraper, user_data_dir = create_scraper(login, password, port, download_dir)
 
-        max_auth_retries = 3
-        for attempt in range(1, max_auth_retries + 1):
+        # Session ouverte une seule fois par run_parallel : cookies injectés, pas de connexion
+        for attempt in range(1, MAX_AUTH_RETRIES + 1):
             try:
-                logger.info(f"[{process_name}] Authentification complète (tentative {attempt})")
-                scraper.access_site("https://app.pharma.sobrus.com/", login, password, force_auth=True)
-                scraper.get_cookies_for_requests()
-                if scraper.is_session_active():
-                    logger.info(f"[{process_name}] Authentification réussie")
-                    break
-                else:
-                    logger.warning(f"[{process_name}] Session inactive, tentative {attempt}/{max_auth_retries}")
-                    time.sleep(2)
+                broker.attach(scraper)
+                broker.ensure_session(scraper)
+                logger.info(f"[{process_name}] Session partagée reprise (génération {broker.generation})")
+                break
             except Exception as e:
                 logger.warning(
-                    f"[{process_name}] Échec authentification (tentative {attempt}/{max_auth_retries}) : {str(e)}")
-                if attempt == max_auth_retries:
+                    f"[{process_name}] Échec reprise de session (tentative {attempt}/{MAX_AUTH_RETRIES}) : {str(e)}")
+                if attempt == MAX_AUTH_RETRIES:
                     logger.error(f"[{process_name}] Échec définitif de l'authentification")
                     return
                 time.sleep(2)
@@ -360,7 +433,8 @@ def worker(port, login, password, db_path, lock, total_clients, download_dir, pr
             logger.info(f"[{process_name}] Tentative de traitement de la page {page_number}")
 
             num_clients, is_last_page = process_page(
-                page_number, login, password, db_path, scraper, port, download_dir, lock, processed_client_keys
+                page_number, login, password, db_path, scraper, port, download_dir, lock, processed_client_keys,
+                broker
             )
             with lock:
                 total_clients.value += num_clients
@@ -397,18 +471,21 @@ def run_parallel(login, password, db_path, num_browsers=NUM_WORKERS):
         total_clients = manager.Value('i', 0)
         processed_client_keys = manager.list()
         page_counter = manager.Value('i', 1)  # Compteur pour attribuer les pages
+        broker = SessionBroker(manager, login, password)
     except Exception as e:
         logger.error(f"Échec de l'initialisation du Manager: {str(e)}")
         raise
 
+    # Une seule authentification pour tous les workers
+    broker.login_once()
+
     ports = list(range(BASE_PORT, BASE_PORT + num_browsers))
     with ProcessPoolExecutor(max_workers=num_browsers) as executor:
         futures = []
         for port in ports:
-            time.sleep(2)
             futures.append(executor.submit(
                 worker, port, login, password, db_path, lock,
-                total_clients, download_dir, processed_client_keys, page_counter
+                total_clients, download_dir, processed_client_keys, page_counter, broker
             ))
         for future in futures:
             try:
@@ -416,6 +493,7 @@ def run_parallel(login, password, db_path, num_browsers=NUM_WORKERS):
             except Exception as e:
                 logger.error(f"Erreur dans un processus parallèle: {str(e)}")
 
+    db.checkpoint()
     upload_to_s3(db_path)
     verify_s3_upload(s3_file=os.path.basename(db_path))
     logger.info(f"Processus terminé avec {total_clients.value} clients extraits")
@@ -4,10 +4,16 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 import logging
 import time
+import heapq
 import queue
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from core.scraper import PharmaScraper
-from core.pdf_processor import PDFProcessor
+from core.pdf_processor import parse_pdf_file, parse_pdf_shards, count_pages, PARALLEL_PAGES_THRESHOLD
+from core.parse_cache import ParseCache
+from core.async_downloader import AsyncStatementDownloader, MAX_PER_HOST
+from core.download_control import AdaptiveLimiter, CircuitBreaker, backoff_delay
+from config.config import PARSE_CACHE_PATH, PARSE_CACHE_MAX_BYTES
 from database.db_manager import DBManager
 from core.s3_utils import upload_to_s3
 
@@ -18,139 +24,395 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def download_pdf(scraper, client, start_date, end_date):
+# Configuration
+DOWNLOAD_WORKERS = 6  # Threads de téléchargement (étape I/O)
+PARSE_WORKERS = os.cpu_count() or 1  # Processus d'analyse des PDFs (étape CPU)
+IN_MEMORY_DOWNLOADS = True  # PDFs gardés en mémoire (io.BytesIO) au lieu de downloads/
+INCREMENTAL_SYNC = False  # Relevés demandés à partir du dernier jour stocké (table sync_state)
+SHARD_PERIOD = None  # "year" ou "quarter" : synchronisations complètes téléchargées par tranches
+DOWNLOAD_ENGINE = "threads"  # "threads" (requests, DOWNLOAD_WORKERS) ou "async" (httpx, ASYNC_MAX_PER_HOST)
+ASYNC_MAX_PER_HOST = MAX_PER_HOST  # Requêtes simultanées vers api.pharma.sobrus.com en mode "async"
+ADAPTIVE_CONCURRENCY = True  # Concurrence des téléchargements ajustée en AIMD, à partir de DOWNLOAD_WORKERS
+ADAPTIVE_MAX_WORKERS = 32  # Plafond de la concurrence adaptative
+MAX_RETRIES = 3  # Réessais par client, chacun après un délai exponentiel avec gigue
+PARSE_QUEUE_SIZE = 2 * PARSE_WORKERS  # PDFs téléchargés en attente d'analyse ; au-delà, les téléchargements attendent
+WRITE_QUEUE_SIZE = 32  # Relevés analysés en attente d'écriture ; au-delà, l'analyse attend
+STATS_INTERVAL = 30  # Secondes entre deux rapports d'occupation du pipeline
+
+def download_pdf(scraper, client, start_date, end_date, in_memory=False, shard_period=None, limiter=None):
     try:
-        pdf_file = scraper.download_detailed_pdf_api_with_requests(client, start_date, end_date)
+        if shard_period and "start_date" not in client:
+            # Synchronisation complète : liste de tranches [(début, fin, pdf)], un créneau du limiteur par requête
+            pdf_file = scraper.download_detailed_pdf_shards(client, start_date, end_date, shard_period,
+                                                            in_memory=in_memory, limiter=limiter)
+            return client, pdf_file, None
+        # En synchronisation incrémentale, le client porte son propre point de reprise
+        start_date = client.get("start_date", start_date)
+        if limiter is not None:
+            # Latence et erreur transmises au limiteur AIMD
+            pdf_file = limiter.call(scraper.download_detailed_pdf_api_with_requests, client, start_date, end_date,
+                                    in_memory=in_memory)
+        else:
+            pdf_file = scraper.download_detailed_pdf_api_with_requests(client, start_date, end_date,
+                                                                       in_memory=in_memory)
         return client, pdf_file, None
     except Exception as e:
-        return client, None, str(e)
+        # L'exception est transmise telle quelle : son code HTTP sert au limiteur et au disjoncteur
+        return client, None, e
 
-def process_pdf(client, pdf_file, processor, db):
-    try:
-        if not os.path.exists(pdf_file):
-            raise Exception("Fichier PDF non trouvé")
-        data, solde_final = processor.extract_detailed_data(pdf_file, client)
-        print(f"Client {client['nom']} - Données extraites : {len(data)} lignes")
-        if data:
-            print(f"Client {client['nom']} - Exemple première ligne : {data[0]}")
+def discard_pdf(pdf_file):
+    """Supprime le PDF s'il a été écrit sur disque (rien à faire pour un io.BytesIO)."""
+    if isinstance(pdf_file, list):
+        for _, _, shard_file in pdf_file:
+            discard_pdf(shard_file)
+        return
+    if isinstance(pdf_file, str) and os.path.exists(pdf_file):
+        os.remove(pdf_file)
+        print(f"PDF supprimé: {pdf_file}")
+
+def cache_key_for(pdf_file, client):
+    """Clé de parse_cache d'un relevé téléchargé (SHA-256 du PDF ou de chaque tranche)."""
+    if isinstance(pdf_file, list):
+        cache_key = "|".join(ParseCache.key_for_file(shard[2]) for shard in pdf_file)
+    else:
+        cache_key = ParseCache.key_for_file(pdf_file)
+    if client.get("solde_initial") is not None:
+        # Le solde repris de la base change le résultat : il fait partie de la clé
+        cache_key += f":{client['solde_initial']:.2f}"
+    return cache_key
+
+def prepare_statement(pdf_file, client, with_cache_key):
+    """
+    Exécuté dans un thread d'E/S après le téléchargement : clé de parse_cache (ou None)
+    et nombre de pages du relevé (de la plus grande tranche pour un relevé par tranches).
+    """
+    cache_key = cache_key_for(pdf_file, client) if with_cache_key else None
+    if isinstance(pdf_file, list):
+        return cache_key, max((count_pages(shard[2]) for shard in pdf_file), default=0)
+    return cache_key, count_pages(pdf_file)
+
+def page_workers_for(nb_pages, reserved_cores, cpu_count):
+    """
+    Processus d'extraction des pages d'un relevé : 1 en dessous de PARALLEL_PAGES_THRESHOLD
+    pages, sinon les cœurs laissés libres par les analyses en cours (reserved_cores).
+    """
+    if nb_pages is None or nb_pages <= PARALLEL_PAGES_THRESHOLD:
+        return 1
+    return max(1, cpu_count - reserved_cores)
+
+def save_client_data(client, data, solde_final, db):
+    """
+    Transmet les lignes analysées d'un client à l'écrivain de la base (db.writer) ;
+    retourne un Future résolu une fois la transaction du lot validée.
+    """
+    print(f"Client {client['nom']} - Données extraites : {len(data)} lignes")
+    if data:
+        print(f"Client {client['nom']} - Exemple première ligne : {data[0]}")
+    else:
+        print(f"Client {client['nom']} - Aucune donnée extraite !")
+    return db.submit_simple_transactions(data, solde_final, client, since=client.get("start_date"))
+
+
+def apply_sync_states(clients, sync_states):
+    """Ajoute start_date et solde_initial aux clients déjà synchronisés ; retourne leur nombre."""
+    count = 0
+    for client in clients:
+        state = sync_states.get(client["nom"])
+        if state:
+            client["start_date"], client["solde_initial"] = state
+            count += 1
+    return count
+
+
+class StageStats:
+    """Suivi d'une étape du pipeline : file d'attente, tâches en cours et taux d'occupation des workers."""
+
+    def __init__(self, name, workers, busy_source=None):
+        self.name = name
+        self.workers = workers
+        # busy_source : temps d'occupation mesuré par le worker lui-même (écrivain SQLite)
+        self.busy_source = busy_source
+        self.started = time.monotonic()
+        self.starts = {}
+        self.busy = 0.0
+        self.done = 0
+        self.max_waiting = 0
+
+    def start(self, future):
+        self.starts[future] = time.monotonic()
+
+    def finish(self, future):
+        self.busy += time.monotonic() - self.starts.pop(future)
+        self.done += 1
+
+    def observe(self, waiting):
+        self.max_waiting = max(self.max_waiting, waiting)
+
+    def utilization(self):
+        elapsed = time.monotonic() - self.started
+        if self.busy_source is not None:
+            busy = self.busy_source()
         else:
-            print(f"Client {client['nom']} - Aucune donnée extraite !")
-        db.save_simple_transactions(data, solde_final, client)
-        print(f"Client {client['nom']} - Sauvegarde terminée, lignes insérées : {len(data)}")
-    finally:
-        if os.path.exists(pdf_file):
-            os.remove(pdf_file)
-            print(f"PDF supprimé: {pdf_file}")
+            busy = self.busy + sum(time.monotonic() - started for started in self.starts.values())
+        return busy / (elapsed * self.workers) if elapsed > 0 else 0.0
+
+    def summary(self, waiting):
+        return (f"{self.name} : {waiting} en file (max {self.max_waiting}), {len(self.starts)} en cours, "
+                f"{self.done} terminé(s), occupation {self.utilization():.0%}")
+
+
+def run_pipeline(clients, scraper, db, start_date, end_date, download_workers, parse_workers, on_result,
+                 parse_cache=None, in_memory=False, shard_period=None, downloader=None, limiter=None,
+                 max_retries=MAX_RETRIES, breaker=None):
+    """
+    Pipeline en trois étapes reliées par des files bornées : téléchargement (threads,
+    ou boucle asyncio avec downloader), analyse (processus) et écriture en base (un seul
+    thread, database.db_writer.DBWriter, qui regroupe les clients par transaction).
+    Une étape n'accepte de nouveau travail que si la file de l'étape suivante a de
+    la place (PARSE_QUEUE_SIZE, WRITE_QUEUE_SIZE) : la mémoire reste bornée quel que
+    soit le nombre de clients et la durée totale tend vers celle de l'étape la plus
+    lente. Profondeur des files et occupation de chaque étape sont journalisées toutes
+    les STATS_INTERVAL secondes et en fin de traitement.
+    Avec shard_period, les synchronisations complètes sont téléchargées par tranches
+    et fusionnées par parse_pdf_shards ; un PDF déjà présent dans parse_cache passe
+    directement à l'écriture (empreinte et nombre de pages calculés dans les threads
+    d'E/S, hors de la boucle de planification). Un relevé de plus de
+    PARALLEL_PAGES_THRESHOLD pages reçoit, pour l'extraction de ses pages, les cœurs
+    que les analyses en cours laissent libres. Avec limiter (AdaptiveLimiter), la concurrence des
+    téléchargements est ajustée en cours de route entre 1 et limiter.max_limit.
+    Un client en échec est replanifié seul après backoff_delay (exponentiel avec gigue),
+    jusqu'à max_retries réessais, pendant que les autres continuent ; avec breaker
+    (CircuitBreaker), aucun téléchargement n'est lancé tant que le circuit est ouvert.
+    on_result(client, error) est appelé une fois par client : succès ou échec définitif.
+    Retourne la liste des clients en échec définitif.
+    """
+    failed = []
+    attempts = {}
+    # Tas des téléchargements à lancer : (heure de lancement, ordre, client)
+    scheduled = [(0.0, order, client) for order, client in enumerate(clients)]
+    heapq.heapify(scheduled)
+    order = len(clients)
+    io_workers = limiter.max_limit if limiter is not None else download_workers
+    download_capacity = downloader.max_per_host if downloader is not None else io_workers
+    # Extraction parallèle des pages d'un relevé volumineux : cœurs réservés par analyse en cours
+    # (1 pour un relevé ordinaire), pour ne pas dépasser cpu_count processus d'extraction
+    cpu_count = os.cpu_count() or 1
+    reserved_cores = {}
+    own_writer = db.writer is None
+    db.start_writer()
+    writer = db.writer
+    parse_queue = deque()  # (client, pdf, clé du cache, nombre de pages) téléchargés, en attente d'analyse
+    write_queue = deque()  # (client, données, solde final) analysés, en attente d'écriture
+    downloading, parsing, writing = {}, {}, {}
+    preparing = {}  # Clé de parse_cache et nombre de pages en cours de calcul : future -> (client, pdf)
+    epochs = {}  # Époque du disjoncteur au lancement de chaque téléchargement
+    stats = {
+        "download": StageStats("Téléchargement", download_capacity),
+        "parse": StageStats("Analyse", parse_workers),
+        "write": StageStats("Écriture", 1, busy_source=lambda: writer.busy),
+    }
+    next_report = time.monotonic() + STATS_INTERVAL
 
+    def report_stats(prefix):
+        logger.info(f"{prefix} - {stats['download'].summary(len(scheduled))} | "
+                    f"{stats['parse'].summary(len(parse_queue))} | {stats['write'].summary(len(write_queue))}")
+
+    def handle_failure(client, error):
+        nonlocal order
+        attempt = attempts.get(client['nom'], 0) + 1
+        attempts[client['nom']] = attempt
+        if attempt > max_retries or (breaker is not None and breaker.is_failed()):
+            failed.append(client)
+            on_result(client, error)
+            return
+        delay = backoff_delay(attempt)
+        logger.warning(f"Réessai {attempt}/{max_retries} pour {client['nom']} dans {delay:.1f}s : {error}")
+        print(f"Réessai {attempt}/{max_retries} pour {client['nom']} dans {delay:.1f}s")
+        heapq.heappush(scheduled, (time.monotonic() + delay, order, client))
+        order += 1
 
-def process_client(client, scraper, processor, db, start_date, end_date):
-    """Télécharge et traite le PDF pour un client."""
     try:
-        # Téléchargement
-        logger.info(f"Téléchargement pour {client['nom']}")
-        print(f"Téléchargement pour {client['nom']}")
-        pdf_file = scraper.download_detailed_pdf_api_with_requests(client, start_date, end_date)
-
-        if not os.path.exists(pdf_file):
-            raise Exception("Fichier PDF non trouvé")
-
-        # Traitement immédiat
-        logger.info(f"Traitement pour {client['nom']}")
-        print(f"Traitement pour {client['nom']}")
-        data, solde_final = processor.extract_detailed_data(pdf_file, client)
-        print(f"Client {client['nom']} - Données extraites : {len(data)} lignes")
-        if data:
-            print(f"Client {client['nom']} - Exemple première ligne : {data[0]}")
-        else:
-            print(f"Client {client['nom']} - Aucune donnée extraite !")
-        db.save_simple_transactions(data, solde_final, client)
-        print(f"Client {client['nom']} - Sauvegarde terminée, lignes insérées : {len(data)}")
+        with ThreadPoolExecutor(max_workers=io_workers) as io_executor, \
+                ProcessPoolExecutor(max_workers=parse_workers) as cpu_executor:
+            while scheduled or downloading or preparing or parsing or writing or parse_queue or write_queue:
+                if breaker is not None and breaker.is_failed():
+                    # Session définitivement refusée : les clients restants échouent sans requête
+                    while scheduled:
+                        _, _, client = heapq.heappop(scheduled)
+                        failed.append(client)
+                        on_result(client, "Téléchargements abandonnés (session refusée)")
 
-        return client, pdf_file, None
+                # Étape 3 : un seul écrivain, plusieurs clients par transaction
+                while write_queue and len(writing) < WRITE_QUEUE_SIZE:
+                    client, data, solde_final = write_queue.popleft()
+                    future = save_client_data(client, data, solde_final, db)
+                    writing[future] = (client, len(data))
+                    stats["write"].start(future)
 
-    except Exception as e:
-        return client, None, str(e)
+                # Étape 2 : analyse, tant que la file d'écriture a de la place
+                while parse_queue and len(parsing) < parse_workers and len(write_queue) < WRITE_QUEUE_SIZE:
+                    client, pdf_file, cache_key, nb_pages = parse_queue.popleft()
+                    cached = parse_cache.get(cache_key, client) if cache_key is not None else None
+                    if cached is not None:
+                        logger.info(f"PDF inchangé pour {client['nom']}, résultat repris du cache")
+                        write_queue.append((client, *cached))
+                        discard_pdf(pdf_file)
+                        continue
+                    logger.info(f"Traitement pour {client['nom']}")
+                    parse = parse_pdf_shards if isinstance(pdf_file, list) else parse_pdf_file
+                    page_workers = page_workers_for(nb_pages, sum(reserved_cores.values()), cpu_count)
+                    if page_workers > 1:
+                        logger.info(f"{client['nom']} : {nb_pages} pages, extraction sur {page_workers} processus")
+                    future = cpu_executor.submit(parse, pdf_file, client, page_workers=page_workers)
+                    parsing[future] = (client, pdf_file, cache_key)
+                    reserved_cores[future] = page_workers
+                    stats["parse"].start(future)
 
+                # Étape 1 : téléchargements arrivés à échéance, tant que la file d'analyse a de la place
+                while (scheduled and scheduled[0][0] <= time.monotonic() and len(downloading) < download_capacity
+                       and len(parse_queue) + len(preparing) < PARSE_QUEUE_SIZE
+                       and (breaker is None or breaker.allow_request())):
+                    _, _, client = heapq.heappop(scheduled)
+                    if downloader is not None and not (shard_period and "start_date" not in client):
+                        future = downloader.submit(client, start_date, end_date)
+                    else:
+                        future = io_executor.submit(download_pdf, scraper, client, start_date, end_date, in_memory,
+                                                    shard_period, limiter)
+                    downloading[future] = client
+                    stats["download"].start(future)
+                    if breaker is not None:
+                        epochs[future] = breaker.epoch
+
+                stats["download"].observe(len(scheduled))
+                stats["parse"].observe(len(parse_queue))
+                stats["write"].observe(len(write_queue))
+                if time.monotonic() >= next_report:
+                    report_stats("Pipeline")
+                    next_report = time.monotonic() + STATS_INTERVAL
+
+                timeout = max(0.05, next_report - time.monotonic())
+                if scheduled:
+                    timeout = min(timeout, max(0.05, scheduled[0][0] - time.monotonic()))
+                    if breaker is not None and breaker.retry_in() is not None:
+                        timeout = max(timeout, breaker.retry_in())
+                in_flight = list(downloading) + list(preparing) + list(parsing) + list(writing)
+                if not in_flight:
+                    time.sleep(timeout)
+                    continue
+                done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in downloading:
+                        stats["download"].finish(future)
+                        client, pdf_file, error = future.result()
+                        downloading.pop(future)
+                        if breaker is not None:
+                            breaker.record(error, epochs.pop(future))
+                        if error:
+                            handle_failure(client, error)
+                        else:
+                            # SHA-256 et nombre de pages du PDF (éventuellement sur disque) dans un thread d'E/S
+                            future = io_executor.submit(prepare_statement, pdf_file, client, parse_cache is not None)
+                            preparing[future] = (client, pdf_file)
+                    elif future in preparing:
+                        client, pdf_file = preparing.pop(future)
+                        try:
+                            cache_key, nb_pages = future.result()
+                        except Exception as e:
+                            # PDF illisible : l'analyse signalera l'erreur
+                            logger.warning(f"Préparation du PDF de {client['nom']} impossible : {e}")
+                            cache_key, nb_pages = None, None
+                        parse_queue.append((client, pdf_file, cache_key, nb_pages))
+                    elif future in parsing:
+                        stats["parse"].finish(future)
+                        client, pdf_file, cache_key = parsing.pop(future)
+                        reserved_cores.pop(future)
+                        try:
+                            data, solde_final = future.result()
+                            if cache_key is not None:
+                                parse_cache.put(cache_key, data, solde_final)
+                            write_queue.append((client, data, solde_final))
+                        except Exception as e:
+                            handle_failure(client, e)
+                        finally:
+                            discard_pdf(pdf_file)
+                    else:
+                        stats["write"].finish(future)
+                        client, nb_lines = writing.pop(future)
+                        try:
+                            future.result()
+                            print(f"Client {client['nom']} - Sauvegarde terminée, lignes insérées : {nb_lines}")
+                            on_result(client, None)
+                        except Exception as e:
+                            handle_failure(client, e)
+                    sys.stdout.flush()
     finally:
-        if pdf_file and os.path.exists(pdf_file):
-            os.remove(pdf_file)
-            print(f"PDF supprimé: {pdf_file}")
+        if own_writer:
+            # Valide les dernières écritures et fusionne le WAL
+            db.stop_writer()
+    report_stats("Pipeline terminé")
+    if limiter is not None:
+        logger.info(f"Concurrence des téléchargements en fin de traitement : {limiter.summary()}")
+    return failed
 
 
-def run(login, password, db_path, start_date, end_date, client_name=None, scraper=None):
+def run(login, password, db_path, start_date, end_date, client_name=None, scraper=None,
+        download_workers=DOWNLOAD_WORKERS, parse_workers=PARSE_WORKERS, parse_cache=None,
+        in_memory=IN_MEMORY_DOWNLOADS, incremental=INCREMENTAL_SYNC, shard_period=SHARD_PERIOD,
+        download_engine=DOWNLOAD_ENGINE, adaptive=ADAPTIVE_CONCURRENCY):
+    downloader = None
     try:
         if scraper is None:
             scraper = PharmaScraper()
-        processor = PDFProcessor()
         db = DBManager(db_path)
+        if parse_cache is None:
+            parse_cache = ParseCache(PARSE_CACHE_PATH, PARSE_CACHE_MAX_BYTES)
 
         logger.info(f"Début - login: {login}, db_path: {db_path}, client_name: {client_name}")
         print(f"Début - login: {login}, db_path: {db_path}, client_name: {client_name}")
         sys.stdout.flush()
 
         scraper.access_site("https://app.pharma.sobrus.com/", login, password)
+        limiter = None
+        if adaptive:
+            max_limit = ASYNC_MAX_PER_HOST if download_engine == "async" else ADAPTIVE_MAX_WORKERS
+            limiter = AdaptiveLimiter(initial=download_workers, max_limit=max_limit)
+        if download_engine == "async":
+            downloader = AsyncStatementDownloader.from_scraper(scraper, max_per_host=ASYNC_MAX_PER_HOST,
+                                                               limiter=limiter)
+            downloader.start()
 
         client_keys = db.get_client_keys(client_name) if client_name else db.get_client_keys()
         logger.info(f"Nombre total de clients : {len(client_keys)}")
         print(f"Nombre total de clients : {len(client_keys)}")
+        logger.info(f"Workers : {download_workers} téléchargement(s), {parse_workers} analyse(s)")
         sys.stdout.flush()
 
-        max_workers = 6
-        failed_downloads = []
         processed_count = 0
 
-        # Téléchargement et traitement parallèles
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_client = {
-                executor.submit(process_client, {"nom": name, "client_id": key}, scraper, processor, db, start_date,
-                                end_date): name
-                for name, key in client_keys
-            }
-
-            for future in as_completed(future_to_client):
-                client, pdf_file, error = future.result()
-                if error:
-                    logger.error(f"Erreur pour {client['nom']} : {error}")
-                    print(f"Erreur pour {client['nom']} : {error}")
-                    failed_downloads.append(client)
-                else:
-                    processed_count += 1
-                    logger.info(f"[{processed_count}] Traitement terminé: {client['nom']}")
-                    print(f"[{processed_count}] Traitement terminé: {client['nom']}")
-                sys.stdout.flush()
-
-        # Retries pour les échecs
-        max_retries = 3
-        retry_count = 0
-        while failed_downloads and retry_count < max_retries:
-            retry_count += 1
-            print(f"\n--- Réessai {retry_count}/{max_retries} pour {len(failed_downloads)} clients échoués ---")
-            logger.info(f"Réessai {retry_count}/{max_retries}")
-            current_failed = failed_downloads
-            failed_downloads = []
-
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                future_to_client = {
-                    executor.submit(process_client, client, scraper, processor, db, start_date, end_date): client["nom"]
-                    for client in current_failed
-                }
-
-                for future in as_completed(future_to_client):
-                    client, pdf_file, error = future.result()
-                    if error:
-                        logger.error(f"Échec réessai {retry_count} : {client['nom']} : {error}")
-                        print(f"Échec réessai {retry_count} : {client['nom']} : {error}")
-                        failed_downloads.append(client)
-                    else:
-                        processed_count += 1
-                        logger.info(f"[{processed_count}] Réussite réessai {retry_count} : {client['nom']}")
-                        print(f"[{processed_count}] Réussite réessai {retry_count} : {client['nom']}")
-                    sys.stdout.flush()
+        def report(client, error):
+            nonlocal processed_count
+            if error:
+                logger.error(f"Échec définitif pour {client['nom']} : {error}")
+                print(f"Échec définitif pour {client['nom']} : {error}")
+            else:
+                processed_count += 1
+                logger.info(f"[{processed_count}] Traitement terminé: {client['nom']}")
+                print(f"[{processed_count}] Traitement terminé: {client['nom']}")
+
+        def reauthenticate():
+            scraper.access_site("https://app.pharma.sobrus.com/", login, password, force_auth=True)
+            if downloader is not None:
+                downloader.set_cookies(scraper.session.cookies.get_dict())
 
-            if failed_downloads and retry_count < max_retries:
-                delay = 5 * (2 ** (retry_count - 1))
-                print(f"Attente de {delay}s avant prochain essai...")
-                time.sleep(delay)
+        # Téléchargement (threads) et traitement (processus) parallèles, réessais par client
+        clients = [{"nom": name, "client_id": key} for name, key in client_keys]
+        if incremental:
+            nb_incremental = apply_sync_states(clients, db.get_sync_states())
+            logger.info(f"Synchronisation incrémentale : {nb_incremental} client(s) repris, "
+                        f"{len(clients) - nb_incremental} complet(s) depuis {start_date}")
+        failed_downloads = run_pipeline(clients, scraper, db, start_date, end_date,
+                                        download_workers, parse_workers, report, parse_cache, in_memory,
+                                        shard_period, downloader, limiter, breaker=CircuitBreaker(reauthenticate))
 
         if failed_downloads:
             print(f"\n--- {len(failed_downloads)} échecs définitifs ---")
@@ -163,6 +425,8 @@ def run(login, password, db_path, start_date, end_date, client_name=None, scrape
         sys.stdout.flush()
 
     finally:
+        if downloader:
+            downloader.close()
         if scraper:
             scraper.cleanup()
         logger.info("Fin du traitement")
@@ -0,0 +1,51 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import logging
+import pandas as pd
+from core.reconciliation import rereconcile
+from database.db_manager import DBManager
+from core.s3_utils import upload_to_s3
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler()]
+)
+logger = logging.getLogger(__name__)
+
+
+def run(login, password, db_path, start_date=None, end_date=None, client_name=None, scraper=None):
+    """Recalcule total et solde de simple_transactions depuis les lignes stockées, sans télécharger de PDF."""
+    logger.info(f"Début du recalcul des soldes - db_path: {db_path}, client_name: {client_name}")
+    db = DBManager(db_path)
+    query = "SELECT rowid, nom, date, libelle, total, solde FROM simple_transactions"
+    params = ()
+    if client_name:
+        query += " WHERE nom = ?"
+        params = (client_name,)
+    with db.connect() as conn:
+        frame = pd.read_sql_query(query + " ORDER BY nom, date, ordre", conn, params=params)
+    if frame.empty:
+        logger.info("Aucune transaction à recalculer")
+        return
+
+    totals, soldes = rereconcile(frame)
+    changed = (frame["total"].to_numpy() != totals) | (frame["solde"].to_numpy() != soldes)
+    db.update_simple_balances(zip(totals[changed].tolist(), soldes[changed].tolist(),
+                                  frame["rowid"][changed].tolist()))
+    logger.info(f"{frame['nom'].nunique()} clients recalculés, {int(changed.sum())}/{len(frame)} lignes modifiées")
+
+    db.checkpoint()
+    logger.info(f"Upload: {db_path} -> S3://jujul/{os.path.basename(db_path)}")
+    upload_to_s3(db_path, "jujul", os.path.basename(db_path))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python rereconcile.py <db_path> [<client_name>]")
+        sys.exit(1)
+    db_path = sys.argv[1]
+    client_name = sys.argv[2] if len(sys.argv) > 2 else None
+    run(None, None, db_path, client_name=client_name)
@@ -0,0 +1,58 @@
+"""AsyncStatementDownloader face au serveur local benchmarks/statement_server.py."""
+import io
+import pytest
+from core.async_downloader import AsyncStatementDownloader
+from core.download_control import AdaptiveLimiter, DownloadError
+from core.statement_download import MIN_PDF_BYTES
+from benchmarks.statement_server import StatementServer, synthetic_fixtures
+
+START_DATE, END_DATE = "2017-01-01", "2025-04-10"
+SHORT_BODY = b"%PDF-1.4 " + b"x" * (MIN_PDF_BYTES - 100)
+
+
+@pytest.fixture(scope="module")
+def fixtures():
+    return synthetic_fixtures(count=2, n_pages=1) + [SHORT_BODY]
+
+
+@pytest.fixture
+def server(fixtures):
+    # Port éphémère ; customer_id 10 et 11 : erreurs HTTP fixes
+    with StatementServer(fixtures, errors={10: (503, 7), 11: (404, None)}) as server:
+        yield server
+
+
+def download_all(server, clients, **kwargs):
+    with AsyncStatementDownloader({"session": "test"}, max_per_host=4, api_url=server.url, **kwargs) as downloader:
+        return downloader.download_all(clients, START_DATE, END_DATE)
+
+
+def test_returns_client_pdf_and_no_error(server, fixtures):
+    clients = [{"nom": f"Client {i}", "client_id": i} for i in range(2)]
+    results = download_all(server, clients)
+    for (client, pdf_file, error), expected_client, expected in zip(results, clients, fixtures):
+        assert client is expected_client and error is None
+        assert isinstance(pdf_file, io.BytesIO) and pdf_file.read() == expected
+
+
+def test_http_errors_carry_status_and_retry_after(server):
+    results = download_all(server, [{"nom": "Indisponible", "client_id": 10}, {"nom": "Inconnu", "client_id": 11}])
+    (_, unavailable_pdf, unavailable), (_, missing_pdf, missing) = results
+    assert unavailable_pdf is None and isinstance(unavailable, DownloadError)
+    assert unavailable.status == 503 and unavailable.retry_after == 7.0
+    assert missing_pdf is None and isinstance(missing, DownloadError)
+    assert missing.status == 404 and missing.retry_after is None
+
+
+def test_short_body_is_rejected(server):
+    [(client, pdf_file, error)] = download_all(server, [{"nom": "Client court", "client_id": 2}])
+    assert pdf_file is None and "trop petit" in str(error)
+
+
+def test_limiter_slot_released_with_outcome(server):
+    limiter = AdaptiveLimiter(initial=4)
+    results = download_all(server, [{"nom": "Client 0", "client_id": 0}, {"nom": "Indisponible", "client_id": 10}],
+                           limiter=limiter)
+    assert [error is None for _, _, error in results] == [True, False]
+    # 503 avec Retry-After : congestion transmise au limiteur
+    assert limiter.in_flight == 0 and limiter.limit == 2 and limiter.blocked_until > 0
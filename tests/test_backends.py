@@ -0,0 +1,18 @@
+"""Conformité des backends de texte : mêmes lignes et même solde final que pdfplumber."""
+import pytest
+from core.pdf_processor import PDFProcessor, TEXT_BACKENDS
+from benchmarks.conformance_backends import SYNTHETIC_CORPUS
+from benchmarks.synthetic_statement import generate_statement
+
+
+@pytest.mark.parametrize("n_pages, seed", SYNTHETIC_CORPUS)
+def test_backends_match_pdfplumber(tmp_path, n_pages, seed):
+    pdf_path = str(tmp_path / "statement.pdf")
+    n_lines = generate_statement(pdf_path, n_pages=n_pages, trailing_pages=1, seed=seed)
+    client = {"nom": "Client Conformité"}
+    results = {name: PDFProcessor(backend=name).extract_detailed_data(pdf_path, client) for name in TEXT_BACKENDS}
+    reference = results["pdfplumber"]
+    assert len(reference[0]) == n_lines
+    assert reference[1] is not None
+    for name, result in results.items():
+        assert result == reference, f"{name} diffère de pdfplumber"
@@ -0,0 +1,129 @@
+"""Sauvegardes de DBManager sur une base SQLite temporaire."""
+import pytest
+from core.reconciliation import reconcile
+from database.db_manager import DBManager
+from benchmarks.synthetic_statement import generate_rows
+
+CLIENT = {"nom": "Client Test"}
+SOLDE_INITIAL = 1500.0
+
+
+@pytest.fixture
+def raw_rows():
+    """300 lignes de relevé (format de PDFProcessor) sur plusieurs mois."""
+    return [{"nom": CLIENT["nom"], "date": date.isoformat(), "reference": transaction,
+             "libelle": libelle.removeprefix("- "), "total_brut": montant, "solde_lu": solde}
+            for date, transaction, libelle, montant, solde in generate_rows(300, SOLDE_INITIAL, seed=3)]
+
+
+def stored_rows(db, client_name=CLIENT["nom"]):
+    with db.connect() as conn:
+        return conn.execute("""
+            SELECT date, reference, libelle, total, solde, ordre, occurrence, type
+            FROM simple_transactions WHERE nom = ? ORDER BY date, ordre
+        """, (client_name,)).fetchall()
+
+
+def test_incremental_save_matches_full_resync(tmp_path, raw_rows):
+    records = reconcile(raw_rows, SOLDE_INITIAL)
+    full = DBManager(str(tmp_path / "full.db"))
+    full.save_simple_transactions(records, records[-1]["solde"], CLIENT)
+
+    incremental = DBManager(str(tmp_path / "incremental.db"))
+    cut = raw_rows[150]["date"]
+    first = [row for row in raw_rows if row["date"] <= cut]
+    first_records = reconcile(first, SOLDE_INITIAL)
+    incremental.save_simple_transactions(first_records, first_records[-1]["solde"], CLIENT)
+
+    # Relevé suivant : à partir du dernier jour stocké inclus, solde repris de sync_state
+    last_date, solde_ouverture = incremental.get_sync_states()[CLIENT["nom"]]
+    assert last_date == cut
+    second = reconcile([row for row in raw_rows if row["date"] >= last_date], solde_ouverture)
+    incremental.save_simple_transactions(second, second[-1]["solde"], CLIENT, since=last_date)
+
+    assert stored_rows(incremental) == stored_rows(full)
+    assert incremental.get_sync_states() == full.get_sync_states()
+    assert incremental.get_client_summary(CLIENT["nom"]) == full.get_client_summary(CLIENT["nom"])
+
+
+def test_update_simple_balances_refreshes_sync_state(tmp_path, raw_rows):
+    db = DBManager(str(tmp_path / "test.db"))
+    records = reconcile(raw_rows, SOLDE_INITIAL)
+    db.save_simple_transactions(records, records[-1]["solde"], CLIENT)
+    other = [dict(row, nom="Autre client") for row in raw_rows[:10]]
+    db.save_simple_transactions(reconcile(other, 0.0), None, {"nom": "Autre client"})
+    last_date, solde_ouverture = db.get_sync_states()[CLIENT["nom"]]
+    other_state = db.get_sync_states()["Autre client"]
+
+    # Rapprochement refait : tous les soldes du client décalés de 100
+    with db.connect() as conn:
+        rows = conn.execute("SELECT total, solde + 100, rowid FROM simple_transactions WHERE nom = ?",
+                            (CLIENT["nom"],)).fetchall()
+    db.update_simple_balances(rows)
+
+    assert db.get_sync_states()[CLIENT["nom"]] == (last_date, pytest.approx(solde_ouverture + 100))
+    assert db.get_sync_states()["Autre client"] == other_state
+    with db.connect() as conn:
+        solde_final = conn.execute("SELECT solde_final FROM sync_state WHERE nom = ?", (CLIENT["nom"],)).fetchone()[0]
+    assert solde_final == records[-1]["solde"]
+
+
+def count_writes(db):
+    """Déclencheurs qui comptent les écritures (insertion, mise à jour, suppression) par table."""
+    with db.connect() as conn:
+        conn.execute("CREATE TABLE writes (tbl TEXT, operation TEXT)")
+        for table in ("simple_transactions", "solde_final", "sync_state", "client_summary"):
+            for operation in ("INSERT", "UPDATE", "DELETE"):
+                conn.execute(f"""
+                    CREATE TRIGGER count_{table}_{operation.lower()} AFTER {operation} ON {table}
+                    BEGIN INSERT INTO writes VALUES ('{table}', '{operation}'); END
+                """)
+
+
+def writes(db):
+    with db.connect() as conn:
+        rows = conn.execute("SELECT tbl, operation FROM writes").fetchall()
+        conn.execute("DELETE FROM writes")
+        return rows
+
+
+def test_saving_identical_statement_writes_nothing(tmp_path, raw_rows):
+    db = DBManager(str(tmp_path / "test.db"))
+    records = reconcile(raw_rows, SOLDE_INITIAL)
+    db.save_simple_transactions(records, records[-1]["solde"], CLIENT)
+    rowids = [row[0] for row in db.connect().execute("SELECT rowid FROM simple_transactions ORDER BY rowid")]
+    count_writes(db)
+
+    db.save_simple_transactions(reconcile(raw_rows, SOLDE_INITIAL), records[-1]["solde"], CLIENT)
+    assert writes(db) == []
+    assert [row[0] for row in db.connect().execute("SELECT rowid FROM simple_transactions ORDER BY rowid")] == rowids
+
+    # Une ligne modifiée : une seule ligne réécrite, puis les agrégats et le point de reprise
+    changed = [dict(record) for record in records]
+    changed[-1]["solde"] += 1
+    db.save_simple_transactions(changed, changed[-1]["solde"], CLIENT)
+    assert sorted(writes(db)) == [("client_summary", "UPDATE"), ("simple_transactions", "UPDATE"),
+                                  ("solde_final", "UPDATE"), ("sync_state", "UPDATE")]
+
+
+def test_update_simple_balances_refreshes_only_affected_summaries(tmp_path, raw_rows, monkeypatch):
+    db = DBManager(str(tmp_path / "test.db"))
+    records = reconcile(raw_rows, SOLDE_INITIAL)
+    db.save_simple_transactions(records, records[-1]["solde"], CLIENT)
+    other = [dict(row, nom="Autre client") for row in raw_rows[:10]]
+    db.save_simple_transactions(reconcile(other, 0.0), None, {"nom": "Autre client"})
+    summary = db.get_client_summary(CLIENT["nom"])
+    refreshed = []
+    update_client_summary = DBManager._update_client_summary
+    monkeypatch.setattr(DBManager, "_update_client_summary",
+                        lambda self, conn, name: refreshed.append(name) or update_client_summary(self, conn, name))
+
+    with db.connect() as conn:
+        rows = conn.execute("SELECT total, solde + 100, rowid FROM simple_transactions WHERE nom = ?",
+                            (CLIENT["nom"],)).fetchall()
+    db.update_simple_balances(rows)
+
+    assert db.get_client_summary(CLIENT["nom"])["solde_final"] == pytest.approx(summary["solde_final"] + 100)
+    assert db.get_client_summary(CLIENT["nom"])["solde_initial"] == pytest.approx(summary["solde_initial"] + 100)
+    # Agrégats de l'autre client non recalculés
+    assert refreshed == [CLIENT["nom"]]
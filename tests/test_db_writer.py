@@ -0,0 +1,113 @@
+"""Écrivain unique DBWriter : lots de transactions, isolation par SAVEPOINT et validation avant résolution."""
+import sqlite3
+import threading
+from collections import Counter
+import pytest
+from database.db_manager import DBManager
+from database.db_writer import DBWriter
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "writer.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE lignes (nom TEXT, valeur INTEGER)")
+    return path
+
+
+def insert(conn, nom, valeur):
+    conn.execute("INSERT INTO lignes (nom, valeur) VALUES (?, ?)", (nom, valeur))
+    return nom
+
+
+def fail(conn, nom):
+    conn.execute("INSERT INTO lignes (nom, valeur) VALUES (?, ?)", (nom, -1))
+    raise ValueError(f"Sauvegarde impossible pour {nom}")
+
+
+def committed(db_path):
+    """Lignes visibles depuis une autre connexion, donc validées."""
+    with sqlite3.connect(db_path) as conn:
+        return sorted(conn.execute("SELECT nom, valeur FROM lignes").fetchall())
+
+
+def blocking_write(writer):
+    """Écriture qui occupe l'écrivain jusqu'à release.set() : les écritures suivantes s'accumulent en file."""
+    started, release = threading.Event(), threading.Event()
+
+    def block(conn):
+        started.set()
+        release.wait(5)
+
+    future = writer.submit(block)
+    started.wait(5)
+    return future, release
+
+
+def test_batches_hold_at_most_batch_size_writes(db_path):
+    writer = DBWriter(db_path, batch_size=3)
+    _, release = blocking_write(writer)
+    # Numéro du lot de chaque écriture : lots déjà validés au moment de l'écriture
+    batch_of = []
+    futures = [writer.submit(lambda conn: batch_of.append(writer.batches)) for _ in range(7)]
+    release.set()
+    for future in futures:
+        future.result(5)
+    writer.close()
+    assert sorted(Counter(batch_of).values()) == [1, 3, 3]
+    assert writer.batches == 4 and writer.writes == 8
+
+
+def test_failing_write_does_not_roll_back_batch(db_path):
+    writer = DBWriter(db_path)
+    _, release = blocking_write(writer)
+    futures = {nom: writer.submit(insert, nom, valeur) for nom, valeur in (("Client 1", 1), ("Client 2", 2))}
+    futures["En échec"] = writer.submit(fail, "En échec")
+    futures["Client 3"] = writer.submit(insert, "Client 3", 3)
+    release.set()
+
+    assert [futures[nom].result(5) for nom in ("Client 1", "Client 2", "Client 3")] == \
+        ["Client 1", "Client 2", "Client 3"]
+    with pytest.raises(ValueError, match="En échec"):
+        futures["En échec"].result(5)
+    writer.close()
+    # Écritures du lot validées, sans la ligne insérée avant l'échec
+    assert writer.batches == 2
+    assert committed(db_path) == [("Client 1", 1), ("Client 2", 2), ("Client 3", 3)]
+
+
+def test_futures_resolve_after_commit(db_path):
+    # Délai de regroupement long : l'écriture bloquante rejoint le lot de la première
+    writer = DBWriter(db_path, batch_size=2, batch_delay=5.0)
+    first = writer.submit(insert, "Client 1", 1)
+    _, release = blocking_write(writer)
+    # Même lot : écriture faite mais non validée, donc ni confirmée ni visible
+    assert not first.done() and committed(db_path) == []
+    release.set()
+    assert first.result(5) == "Client 1"
+    # Confirmée : déjà visible depuis une autre connexion
+    assert committed(db_path) == [("Client 1", 1)]
+    writer.close()
+
+
+def test_db_manager_batch_keeps_other_clients_when_one_save_fails(tmp_path):
+    db = DBManager(str(tmp_path / "test.db"))
+    db.start_writer()
+    _, release = blocking_write(db.writer)
+    record = {"date": "2024-01-02", "reference": "VNT-1", "libelle": "Vente", "total": 100.0, "solde": 100.0,
+              "type": 0}
+    futures = {nom: db.submit_simple_transactions([dict(record, nom=nom)], 100.0, {"nom": nom})
+               for nom in ("Client 1", "Client 2")}
+    # Ligne incomplète (sans type) : échec de la sauvegarde de ce seul client
+    broken = {key: value for key, value in record.items() if key != "type"}
+    futures["Incomplet"] = db.submit_simple_transactions([dict(broken, nom="Incomplet")], 100.0, {"nom": "Incomplet"})
+    release.set()
+
+    futures["Client 1"].result(5)
+    futures["Client 2"].result(5)
+    with pytest.raises(Exception):
+        futures["Incomplet"].result(5)
+    db.stop_writer()
+    assert db.get_client_summary("Client 1")["nb_lignes"] == db.get_client_summary("Client 2")["nb_lignes"] == 1
+    assert db.get_client_summary("Incomplet") is None
+    assert set(db.get_sync_states()) <= {"Client 1", "Client 2"}
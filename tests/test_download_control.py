@@ -0,0 +1,139 @@
+"""Transitions d'état du disjoncteur (CircuitBreaker) et du limiteur AIMD (AdaptiveLimiter)."""
+import time
+import pytest
+from core.download_control import AdaptiveLimiter, CircuitBreaker, DownloadError
+
+UNAUTHORIZED = DownloadError("Erreur HTTP 401: Unauthorized", 401)
+UNAVAILABLE = DownloadError("Erreur HTTP 503: Service Unavailable", 503)
+
+
+def test_breaker_reauthenticates_once_then_fails():
+    calls = []
+    breaker = CircuitBreaker(reauthenticate=lambda: calls.append(1), auth_threshold=2)
+    breaker.record(UNAUTHORIZED)
+    assert breaker.state == "fermé" and not calls
+    breaker.record(UNAUTHORIZED)
+    assert calls == [1] and breaker.state == "fermé" and breaker.epoch == 1
+
+    # Session de nouveau refusée après la réauthentification : abandon définitif
+    breaker.record(UNAUTHORIZED, epoch=1)
+    breaker.record(UNAUTHORIZED, epoch=1)
+    assert calls == [1] and breaker.is_failed() and not breaker.allow_request()
+
+
+def test_breaker_fails_without_reauthenticate():
+    breaker = CircuitBreaker(auth_threshold=1)
+    breaker.record(UNAUTHORIZED)
+    assert breaker.is_failed()
+
+
+def test_breaker_opens_then_probes_after_cooldown():
+    breaker = CircuitBreaker(outage_threshold=3, cooldown=0.0)
+    for _ in range(3):
+        assert breaker.allow_request()
+        breaker.record(UNAVAILABLE)
+    assert breaker.state == "ouvert" and breaker.epoch == 1
+
+    # Pause écoulée : un seul téléchargement d'essai
+    assert breaker.allow_request() and breaker.state == "semi-ouvert"
+    assert not breaker.allow_request()
+    breaker.record(None, epoch=1)
+    assert breaker.state == "fermé" and breaker.allow_request()
+
+
+def test_breaker_doubles_cooldown_when_probe_fails():
+    breaker = CircuitBreaker(outage_threshold=1, cooldown=10.0)
+    breaker.record(UNAVAILABLE)
+    assert breaker.state == "ouvert" and not breaker.allow_request()
+    assert 0 < breaker.retry_in() <= 10.0
+
+    breaker.open_until = time.monotonic()
+    assert breaker.allow_request()
+    breaker.record(UNAVAILABLE, epoch=breaker.epoch)
+    assert breaker.state == "ouvert" and breaker.cooldown == 20.0
+
+    # Succès de l'essai suivant : pause ramenée à sa valeur de départ
+    breaker.open_until = time.monotonic()
+    assert breaker.allow_request()
+    breaker.record(None, epoch=breaker.epoch)
+    assert breaker.state == "fermé" and breaker.cooldown == 10.0
+
+
+def test_breaker_ignores_results_from_previous_epoch():
+    breaker = CircuitBreaker(outage_threshold=1, cooldown=0.0)
+    stale_epoch = breaker.epoch
+    breaker.record(UNAVAILABLE)
+    assert breaker.allow_request() and breaker.state == "semi-ouvert"
+    # Requête lancée avant l'ouverture : son succès ne referme pas le circuit
+    breaker.record(None, epoch=stale_epoch)
+    assert breaker.state == "semi-ouvert"
+    breaker.record(None, epoch=breaker.epoch)
+    assert breaker.state == "fermé"
+
+
+def test_breaker_probe_with_other_error_closes():
+    breaker = CircuitBreaker(outage_threshold=1, cooldown=0.0)
+    breaker.record(UNAVAILABLE)
+    assert breaker.allow_request()
+    breaker.record(Exception("PDF de Client Test trop petit (10 bytes)"), epoch=breaker.epoch)
+    assert breaker.state == "fermé"
+
+
+def test_limiter_increases_after_healthy_window():
+    limiter = AdaptiveLimiter(initial=2, max_limit=3)
+    for _ in range(2):
+        limiter.acquire()
+        limiter.release(0.1)
+    assert limiter.limit == 3
+    for _ in range(3):
+        limiter.acquire()
+        limiter.release(0.1)
+    assert limiter.limit == 3  # Plafond max_limit
+
+
+def test_limiter_decreases_on_high_latency():
+    limiter = AdaptiveLimiter(initial=2, latency_target=1.0)
+    for _ in range(2):
+        limiter.acquire()
+        limiter.release(5.0)
+    assert limiter.limit == 1
+
+
+def test_limiter_halves_once_per_burst_of_congestion():
+    limiter = AdaptiveLimiter(initial=8)
+    for _ in range(3):
+        limiter.acquire()
+    for _ in range(3):
+        limiter.release(0.5, DownloadError("Erreur HTTP 429: Too Many Requests", 429))
+    assert limiter.limit == 4 and limiter.in_flight == 0
+    assert limiter.error_rate() == 1.0
+
+
+def test_limiter_ignores_non_congestion_errors():
+    limiter = AdaptiveLimiter(initial=4)
+    limiter.acquire()
+    limiter.release(0.5, UNAUTHORIZED)
+    assert limiter.limit == 4 and limiter.error_rate() == 0.0
+
+
+def test_limiter_retry_after_blocks_new_starts():
+    limiter = AdaptiveLimiter(initial=4)
+    limiter.acquire()
+    limiter.release(0.1, DownloadError("Erreur HTTP 503: Service Unavailable", 503, retry_after=0.3))
+    assert not limiter._can_start()
+    started = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - started >= 0.25
+    limiter.release(0.1)
+
+
+def test_limiter_call_releases_on_error():
+    limiter = AdaptiveLimiter(initial=2)
+
+    def fail():
+        raise UNAVAILABLE
+
+    with pytest.raises(DownloadError):
+        limiter.call(fail)
+    assert limiter.in_flight == 0 and limiter.limit == 1
+    assert limiter.call(lambda x: x * 2, 21) == 42 and limiter.in_flight == 0
@@ -0,0 +1,88 @@
+"""Migrations de database/migrations.py appliquées à une base au schéma d'origine."""
+import sqlite3
+import pytest
+from database.db_manager import DBManager
+from database.migrations import MIGRATIONS, SCHEMA_VERSION, migrate
+
+LEGACY_SCHEMA = """
+    CREATE TABLE simple_transactions (nom TEXT, date TEXT, reference TEXT, libelle TEXT, total REAL, solde REAL);
+    CREATE TABLE detailed_transactions (nom TEXT, date TEXT, produit TEXT, quantite REAL, prix_unitaire REAL,
+                                        remise REAL, prix_unitaire_remise REAL, total REAL, solde REAL);
+    CREATE TABLE client_keys (nom TEXT PRIMARY KEY, client_key TEXT);
+    CREATE TABLE solde_final (nom TEXT PRIMARY KEY, solde REAL);
+"""
+# (nom, date, reference, libelle, total, solde) dans l'ordre d'insertion des anciennes versions
+LEGACY_ROWS = [
+    ("Client A", "2024-01-02", "VNT-1", "Vente", 100.0, 100.0),
+    ("Client A", "2024-01-02", "VNT-1", "Vente", 100.0, 200.0),
+    ("Client A", "2024-01-02", "PAY-1", "Paiement vente", -50.0, 150.0),
+    ("Client A", "2024-01-03", None, "Retour vente", -20.0, 130.0),
+    ("Client A", "2024-01-04", "AVR-1", "Avoir client", -10.0, 120.0),
+    ("Client B", "2024-01-02", "VNT-2", "Vente", 300.0, 1300.0),
+    ("Client B", "2024-01-05", "PAY-2", "Paiement", -300.0, 1000.0),
+]
+
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.executemany("INSERT INTO simple_transactions VALUES (?, ?, ?, ?, ?, ?)", LEGACY_ROWS)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def columns(conn, table):
+    return {col[1] for col in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def test_migrations_upgrade_legacy_schema(legacy_db):
+    db = DBManager(legacy_db)
+    with db.connect() as conn:
+        versions = [row[0] for row in conn.execute("SELECT version FROM schema_version ORDER BY version")]
+        assert versions == [version for version, _, _ in MIGRATIONS] and versions[-1] == SCHEMA_VERSION
+
+        assert {"ordre", "occurrence", "type"} <= columns(conn, "simple_transactions")
+        assert "reference" in columns(conn, "detailed_transactions")
+        assert {"sync_state", "client_summary"} <= {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'")}
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert {"idx_simple_transactions_ordre", "idx_simple_transactions_identite",
+                "idx_simple_transactions_type", "idx_detailed_transactions_nom_date"} <= indexes
+        assert "idx_simple_transactions_cle" not in indexes
+
+        # Rang dans la journée, rang parmi les lignes identiques et type repris des lignes existantes
+        rows = conn.execute("SELECT ordre, occurrence, type FROM simple_transactions ORDER BY rowid").fetchall()
+        assert rows == [(0, 0, 0), (1, 1, 0), (2, 0, 1), (0, 0, 2), (0, 0, 3), (0, 0, 0), (0, 0, 1)]
+
+    assert db.get_client_summary("Client A") == {
+        "nom": "Client A", "total_ventes": 200.0, "total_paiements": -50.0, "total_avoirs": -10.0,
+        "total_retours": -20.0, "solde_initial": 0.0, "solde_final": 120.0, "last_date": "2024-01-04",
+        "nb_lignes": 5,
+    }
+    assert db.get_client_summary("Client B")["solde_initial"] == 1000.0
+
+
+def test_migrate_is_idempotent(legacy_db):
+    DBManager(legacy_db)
+    with sqlite3.connect(legacy_db) as conn:
+        before = conn.execute("SELECT * FROM simple_transactions ORDER BY rowid").fetchall()
+        assert migrate(conn) == SCHEMA_VERSION
+        assert conn.execute("SELECT COUNT(*) FROM schema_version").fetchone()[0] == len(MIGRATIONS)
+        assert conn.execute("SELECT * FROM simple_transactions ORDER BY rowid").fetchall() == before
+
+
+def test_migrated_rows_are_matched_by_upsert(legacy_db):
+    db = DBManager(legacy_db)
+    records = [{"nom": nom, "date": date, "reference": reference, "libelle": libelle, "total": total,
+                "solde": solde, "type": type_}
+               for (nom, date, reference, libelle, total, solde), type_ in zip(LEGACY_ROWS[:5], (0, 0, 1, 2, 3))]
+    with db.connect() as conn:
+        rowids = [row[0] for row in conn.execute(
+            "SELECT rowid FROM simple_transactions WHERE nom = 'Client A' ORDER BY date, ordre")]
+    db.save_simple_transactions(records, 120.0, {"nom": "Client A"})
+    with db.connect() as conn:
+        assert [row[0] for row in conn.execute(
+            "SELECT rowid FROM simple_transactions WHERE nom = 'Client A' ORDER BY date, ordre")] == rowids
@@ -0,0 +1,59 @@
+"""Cache d'analyse (ParseCache) : éviction LRU et invalidation par version du parseur."""
+import io
+import itertools
+import pytest
+import core.parse_cache
+from core.parse_cache import ParseCache
+
+CLIENT = {"nom": "Client Test"}
+RECORDS = [{"nom": "Ancien nom", "date": "2024-01-02", "reference": "VNT-1", "libelle": "Vente",
+            "total": 100.0, "solde": 100.0, "type": 0}]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Horloge strictement croissante : l'ordre LRU ne dépend pas de la résolution de time.time."""
+    ticks = itertools.count(1)
+    monkeypatch.setattr(core.parse_cache.time, "time", lambda: float(next(ticks)))
+
+
+def entry_size(tmp_path):
+    probe = ParseCache(str(tmp_path / "probe.db"), 10 ** 6)
+    probe.put("probe", RECORDS, 100.0)
+    with probe.connect() as conn:
+        return conn.execute("SELECT size FROM parse_cache").fetchone()[0]
+
+
+def test_get_returns_records_for_client(tmp_path):
+    cache = ParseCache(str(tmp_path / "cache.db"), 10 ** 6)
+    assert cache.get("absent", CLIENT) is None
+    cache.put("cle", RECORDS, 100.0)
+    records, solde_final = cache.get("cle", CLIENT)
+    assert solde_final == 100.0 and [record["nom"] for record in records] == [CLIENT["nom"]]
+
+
+def test_evicts_least_recently_read_entry_first(tmp_path, clock):
+    cache = ParseCache(str(tmp_path / "cache.db"), 3 * entry_size(tmp_path))
+    for key in ("a", "b", "c"):
+        cache.put(key, RECORDS, 100.0)
+    # "a" relu : "b" devient l'entrée la moins récemment utilisée
+    assert cache.get("a", CLIENT) is not None
+    cache.put("d", RECORDS, 100.0)
+    assert cache.get("b", CLIENT) is None
+    assert all(cache.get(key, CLIENT) is not None for key in ("a", "c", "d"))
+
+
+def test_skips_entries_larger_than_cache(tmp_path):
+    cache = ParseCache(str(tmp_path / "cache.db"), 10)
+    cache.put("cle", RECORDS, 100.0)
+    assert cache.get("cle", CLIENT) is None
+
+
+def test_parser_version_bump_misses(tmp_path, monkeypatch):
+    cache = ParseCache(str(tmp_path / "cache.db"), 10 ** 6)
+    pdf = io.BytesIO(b"%PDF-1.4 releve")
+    cache.put(ParseCache.key_for_file(pdf), RECORDS, 100.0)
+    assert cache.get(ParseCache.key_for_file(pdf), CLIENT) is not None
+
+    monkeypatch.setattr(core.parse_cache, "PARSER_VERSION", core.parse_cache.PARSER_VERSION + 1)
+    assert cache.get(ParseCache.key_for_file(pdf), CLIENT) is None
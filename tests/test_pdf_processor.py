@@ -0,0 +1,54 @@
+"""Analyse des relevés par PDFProcessor sur des relevés synthétiques."""
+import pytest
+from core import pdf_processor
+from core.pdf_processor import parse_pdf_file
+from benchmarks.synthetic_statement import generate_rows, generate_statement
+
+CLIENT = {"nom": "Client Test"}
+
+
+@pytest.fixture
+def statement(tmp_path):
+    pdf_path = str(tmp_path / "statement.pdf")
+    n_lines = generate_statement(pdf_path, n_pages=3, seed=1)
+    return pdf_path, n_lines
+
+
+def test_parse_pdf_file_without_page_workers_stays_sequential(statement, monkeypatch):
+    def parallel(*args, **kwargs):
+        raise AssertionError("extraction parallèle lancée avec page_workers=1")
+
+    monkeypatch.setattr(pdf_processor.PDFProcessor, "iter_page_words_parallel", parallel)
+    pdf_path, n_lines = statement
+    records, _ = parse_pdf_file(pdf_path, CLIENT, parallel_pages_threshold=1, page_workers=1)
+    assert len(records) == n_lines
+
+
+def test_parallel_pages_match_sequential(statement):
+    pdf_path, _ = statement
+    assert parse_pdf_file(pdf_path, CLIENT, parallel_pages_threshold=1, page_workers=2) == \
+        parse_pdf_file(pdf_path, CLIENT, parallel_pages_threshold=None)
+
+
+@pytest.mark.parametrize("layout", [True, False])
+def test_solde_final_in_left_margin_is_read(tmp_path, layout):
+    # Solde final sur la dernière page, à gauche de la colonne Date (hors de la zone du tableau)
+    pdf_path = str(tmp_path / "statement.pdf")
+    n_lines = generate_statement(pdf_path, n_pages=3, seed=2, solde_final_x=20)
+    records, solde_final = pdf_processor.PDFProcessor(layout=layout).extract_detailed_data(pdf_path, CLIENT)
+    assert len(records) == n_lines
+    assert solde_final == pytest.approx(generate_rows(n_lines, 1500.0, seed=2)[-1][4])
+    if layout:
+        # Totaux à séparateur de milliers lus par colonnes : soldes recalculés identiques au PDF
+        assert solde_final == pytest.approx(records[-1]["solde"])
+
+
+@pytest.mark.parametrize("line, expected", [
+    # Libellé terminé par un nombre : il ne doit pas être absorbé par le total
+    ("2024-01-02 Vente Réf 100 250,00 1 500,00", ("Vente Réf 100", 250.0, 1500.0)),
+    ("2024-03-27 - Paiement vente 1284,91 -1 929,90", ("- Paiement vente", 1284.91, -1929.9)),
+    ("2024-03-27 Vente 84.91 1.929,90", ("Vente", 84.91, 1929.9)),
+])
+def test_parse_line_keeps_trailing_number_in_libelle(line, expected):
+    parsed = pdf_processor.PDFProcessor().parse_line(line)
+    assert (parsed["libelle"], parsed["total_brut"], parsed["solde_lu"]) == expected
@@ -0,0 +1,140 @@
+"""Pipeline de runners/detailed_pdf.py avec un téléchargeur simulé et une base SQLite temporaire."""
+import io
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from runners import detailed_pdf
+from core.download_control import DownloadError
+from database.db_manager import DBManager
+from benchmarks.synthetic_statement import generate_statement
+
+
+class StubDownloader:
+    """
+    Même interface qu'AsyncStatementDownloader : relevés servis depuis la mémoire par
+    un pool de threads. Compte les tentatives par client et les PDFs téléchargés
+    pas encore analysés (parsed() à appeler en fin d'analyse).
+    """
+
+    def __init__(self, statements, max_per_host=4, failures=None):
+        self.statements = statements  # nom du client -> octets du PDF
+        self.max_per_host = max_per_host
+        self.failures = failures or {}  # nom du client -> échecs avant succès (None : toujours en échec)
+        self.attempts = Counter()
+        self.outstanding = 0
+        self.max_outstanding = 0
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_per_host)
+
+    def submit(self, client, start_date, end_date):
+        return self.executor.submit(self.download, client)
+
+    def download(self, client):
+        with self.lock:
+            self.attempts[client["nom"]] += 1
+            failures = self.failures.get(client["nom"], 0)
+            if failures is None or self.attempts[client["nom"]] <= failures:
+                return client, None, DownloadError("Erreur HTTP 503: Service Unavailable", 503)
+            self.outstanding += 1
+            self.max_outstanding = max(self.max_outstanding, self.outstanding)
+        return client, io.BytesIO(self.statements[client["nom"]]), None
+
+    def parsed(self):
+        with self.lock:
+            self.outstanding -= 1
+
+    def close(self):
+        self.executor.shutdown()
+
+
+def statement_bytes(tmp_path, name, n_pages):
+    pdf_path = str(tmp_path / f"{name}.pdf")
+    generate_statement(pdf_path, n_pages=n_pages, seed=n_pages)
+    with open(pdf_path, "rb") as f:
+        return f.read()
+
+
+def run_pipeline(tmp_path, clients, downloader, on_result=lambda client, error: None, **kwargs):
+    db = DBManager(str(tmp_path / "pipeline.db"))
+    try:
+        return detailed_pdf.run_pipeline(clients, None, db, "2017-01-01", "2025-04-10", downloader.max_per_host,
+                                         kwargs.pop("parse_workers", 2), on_result, downloader=downloader, **kwargs)
+    finally:
+        downloader.close()
+
+
+@pytest.fixture
+def in_process_parse(monkeypatch):
+    """Analyse simulée dans le processus du test : fonction d'analyse à fournir par le test."""
+    monkeypatch.setattr(detailed_pdf, "ProcessPoolExecutor", ThreadPoolExecutor)
+
+    def use(parse):
+        monkeypatch.setattr(detailed_pdf, "parse_pdf_file", parse)
+    return use
+
+
+def test_large_statement_gets_idle_cores_with_default_settings(tmp_path, monkeypatch, in_process_parse):
+    # Réglages par défaut sur une machine à 4 cœurs : PARSE_WORKERS = cpu_count
+    monkeypatch.setattr(os, "cpu_count", lambda: 4)
+    monkeypatch.setattr(detailed_pdf, "PARALLEL_PAGES_THRESHOLD", 2)
+    assigned = {}
+
+    def parse(pdf_file, client, page_workers=None):
+        assigned[client["nom"]] = page_workers
+        return [], None
+
+    in_process_parse(parse)
+    small, large = statement_bytes(tmp_path, "small", 1), statement_bytes(tmp_path, "large", 3)
+    downloader = StubDownloader({"Gros client": large, "Client 1": small, "Client 2": small})
+    clients = [{"nom": name} for name in ("Client 1", "Gros client", "Client 2")]
+    assert run_pipeline(tmp_path, clients, downloader, parse_workers=4) == []
+
+    assert assigned["Client 1"] == assigned["Client 2"] == 1
+    assert 1 < assigned["Gros client"] <= 4
+
+
+def test_backpressure_bounds_downloaded_pdfs(tmp_path, monkeypatch, in_process_parse):
+    monkeypatch.setattr(detailed_pdf, "PARSE_QUEUE_SIZE", 1)
+    pdf = statement_bytes(tmp_path, "small", 1)
+    names = [f"Client {i}" for i in range(12)]
+    downloader = StubDownloader(dict.fromkeys(names, pdf), max_per_host=2)
+
+    def parse(pdf_file, client, page_workers=None):
+        time.sleep(0.05)  # Analyse plus lente que les téléchargements
+        downloader.parsed()
+        return [], None
+
+    in_process_parse(parse)
+    assert run_pipeline(tmp_path, [{"nom": name} for name in names], downloader, parse_workers=1) == []
+    # PDFs en mémoire : téléchargements en cours + file d'analyse + analyse en cours
+    assert downloader.max_outstanding <= downloader.max_per_host + detailed_pdf.PARSE_QUEUE_SIZE + 1
+    assert downloader.outstanding == 0
+
+
+def test_on_result_called_once_per_client_after_retries(tmp_path, monkeypatch, in_process_parse):
+    monkeypatch.setattr(detailed_pdf, "backoff_delay", lambda attempt: 0.0)
+    pdf = statement_bytes(tmp_path, "small", 1)
+    names = ["Stable", "Instable", "En échec", "Illisible"]
+    downloader = StubDownloader(dict.fromkeys(names, pdf), failures={"Instable": 2, "En échec": None})
+
+    def parse(pdf_file, client, page_workers=None):
+        downloader.parsed()
+        if client["nom"] == "Illisible":
+            raise ValueError("PDF illisible")
+        return [], None
+
+    in_process_parse(parse)
+    results = []
+    failed = run_pipeline(tmp_path, [{"nom": name} for name in names], downloader,
+                          on_result=lambda client, error: results.append((client["nom"], error)), max_retries=2)
+
+    assert sorted(client["nom"] for client in failed) == ["En échec", "Illisible"]
+    assert Counter(name for name, _ in results) == Counter(names)
+    errors = dict(results)
+    assert errors["Stable"] is None and errors["Instable"] is None
+    assert isinstance(errors["En échec"], DownloadError) and isinstance(errors["Illisible"], ValueError)
+    # Réessais par client : max_retries + 1 tentatives au plus
+    assert downloader.attempts == {"Stable": 1, "Instable": 3, "En échec": 3, "Illisible": 3}
@@ -0,0 +1,85 @@
+"""Moteur de rapprochement en colonnes comparé à la boucle historique de extract_detailed_data."""
+import random
+import numpy as np
+import pandas as pd
+from core.reconciliation import reconcile, rereconcile
+
+LIBELLES = ("Vente", "Paiement vente", "Retour vente", "Avoir client", "Paiement", "Vente avoir")
+MONTANTS = (10.0, 25.5, 84.91, 100.0, 1929.9)
+
+
+def legacy_reconcile(raw_rows, solde):
+    """Boucle ligne à ligne d'origine (avant core.reconciliation), pour un seul client."""
+    paiements_par_date = {}
+    for row in raw_rows:
+        if "paiement" in row["libelle"].lower():
+            paiements_par_date.setdefault(row["date"], []).append(abs(row["total_brut"]))
+    paiements_a_ignorer = set()
+    for row in raw_rows:
+        if "retour" in row["libelle"].lower():
+            if abs(sum(paiements_par_date.get(row["date"], [])) - abs(row["total_brut"])) < 0.01:
+                paiements_a_ignorer.add(row["date"])
+    retours = {(r["date"], abs(r["total_brut"])) for r in raw_rows if "retour" in r["libelle"].lower()}
+    avoirs = {(r["date"], abs(r["total_brut"])) for r in raw_rows if "avoir" in r["libelle"].lower()}
+
+    records = []
+    for row in raw_rows:
+        date, type_ligne, brut = row["date"], row["libelle"].lower(), abs(row["total_brut"])
+        montant = -brut if ("paiement" in type_ligne or "retour" in type_ligne or "avoir" in type_ligne) else brut
+        appliquer = not ("paiement" in type_ligne and (
+            (date, brut) in retours or (date, brut) in avoirs or date in paiements_a_ignorer))
+        solde = round(solde + (montant if appliquer else 0.0), 2)
+        records.append({"nom": row["nom"], "date": date, "reference": row["reference"],
+                        "libelle": row["libelle"], "total": montant, "solde": solde})
+    return records
+
+
+def random_rows(rng, nom="Client Test"):
+    """Relevé aléatoire sur peu de jours et peu de montants, pour multiplier les collisions."""
+    rows = []
+    for index in range(rng.randint(0, 40)):
+        day = rng.randint(1, 6)
+        montant = rng.choice(MONTANTS) if rng.random() < 0.7 else round(rng.uniform(1, 3000), 2)
+        rows.append({"nom": nom, "date": f"2024-01-{day:02d}", "reference": f"REF{index}",
+                     "libelle": rng.choice(LIBELLES), "total_brut": montant if rng.random() < 0.9 else -montant,
+                     "solde_lu": 0.0})
+    rows.sort(key=lambda row: row["date"])
+    return rows
+
+
+def test_reconcile_matches_legacy_loop():
+    rng = random.Random(0)
+    for case in range(3000):
+        raw_rows = random_rows(rng)
+        solde_initial = round(rng.uniform(-5000, 5000), 2)
+        records = reconcile(raw_rows, solde_initial)
+        assert [{k: v for k, v in record.items() if k != "type"} for record in records] == \
+            legacy_reconcile(raw_rows, solde_initial), f"cas {case}"
+
+
+def test_rereconcile_recomputes_stored_rows():
+    rng = random.Random(0)
+    frames = []
+    for client in range(5):
+        records = reconcile(random_rows(rng, f"Client {client}"), 1000.0 * client)
+        frames.append(pd.DataFrame(records, columns=["nom", "date", "libelle", "total", "solde"]))
+    expected = pd.concat(frames, ignore_index=True)
+    # Totaux stockés non signés et soldes faux, sauf celui de la première ligne de chaque client
+    stored = expected.assign(total=expected["total"].abs())
+    stored.loc[stored["nom"].duplicated(), "solde"] = 0.0
+    totals, soldes = rereconcile(stored)
+    np.testing.assert_array_equal(totals, expected["total"].to_numpy())
+    np.testing.assert_allclose(soldes, expected["solde"].to_numpy(), atol=1e-9)
+
+
+def test_rereconcile_keeps_opening_balance_when_first_row_effect_changes():
+    # Stocké avec des règles où le paiement du premier jour était appliqué (solde initial 1000) ;
+    # les règles actuelles le neutralisent (retour du même montant le même jour)
+    stored = pd.DataFrame([
+        {"nom": "Client Test", "date": "2024-01-01", "libelle": "Paiement vente", "total": -100.0, "solde": 900.0},
+        {"nom": "Client Test", "date": "2024-01-01", "libelle": "Retour vente", "total": -100.0, "solde": 800.0},
+        {"nom": "Client Test", "date": "2024-01-02", "libelle": "Vente", "total": 50.0, "solde": 850.0},
+    ])
+    totals, soldes = rereconcile(stored)
+    np.testing.assert_array_equal(totals, [-100.0, -100.0, 50.0])
+    np.testing.assert_allclose(soldes, [1000.0, 900.0, 950.0])
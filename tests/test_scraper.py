@@ -0,0 +1,121 @@
+"""Contrôle léger de la session (probe_session) et lecture des identifiants clients, avec requests et Chrome simulés."""
+import json
+from types import SimpleNamespace
+import pytest
+from core.scraper import PharmaScraper
+
+
+class StubResponse:
+    def __init__(self, status_code, content_type, body):
+        self.status_code = status_code
+        self.headers = {"Content-Type": content_type} if content_type else {}
+        self.body = body
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.body), chunk_size):
+            yield self.body[start:start + chunk_size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class StubSession:
+    def __init__(self, response):
+        self.response = response
+
+    def get(self, url, **kwargs):
+        return self.response
+
+
+def probe(status_code, content_type, body):
+    scraper = SimpleNamespace(session=StubSession(StubResponse(status_code, content_type, body)))
+    return PharmaScraper.probe_session(scraper)
+
+
+@pytest.mark.parametrize("content_type, body", [
+    ("application/pdf", b"%PDF-1.7\n"),
+    ("application/pdf; charset=binary", b""),
+    ("application/octet-stream", b"%PDF-1.4\n"),
+    (None, b"%PDF-1.4\n"),
+])
+def test_probe_accepts_pdf(content_type, body):
+    assert probe(200, content_type, body)
+
+
+@pytest.mark.parametrize("status_code, content_type, body", [
+    (200, "text/plain", b"Unauthorized"),
+    (200, "text/html; charset=utf-8", b"<html>Connexion</html>"),
+    (200, "application/json", b'{"error": "unauthenticated"}'),
+    (200, None, b""),
+    (401, "application/pdf", b"%PDF-1.7\n"),
+])
+def test_probe_rejects_non_pdf(status_code, content_type, body):
+    assert not probe(status_code, content_type, body)
+
+
+class StubDriver:
+    """Journal de performance de Chrome : rempli par les chargements de page tant que le domaine Network est actif."""
+
+    def __init__(self):
+        self.network = True  # Domaine ouvert par chromedriver avec perfLoggingPrefs
+        self.log = []
+        self.bodies = {}
+        self.commands = []
+
+    def load_page(self, customers):
+        if self.network:
+            request_id = str(len(self.bodies))
+            self.bodies[request_id] = json.dumps({"data": customers})
+            self.log.append({"message": json.dumps({"message": {
+                "method": "Network.responseReceived",
+                "params": {"requestId": request_id, "response": {
+                    "url": "https://api.pharma.sobrus.com/customers?page=1", "mimeType": "application/json"}},
+            }})})
+
+    def execute_cdp_cmd(self, cmd, params):
+        self.commands.append(cmd)
+        if cmd in ("Network.enable", "Network.disable"):
+            self.network = cmd == "Network.enable"
+            return {}
+        return {"body": self.bodies[params["requestId"]]}
+
+    def get_log(self, log_type):
+        entries, self.log = self.log, []
+        return entries
+
+    def quit(self):
+        pass
+
+
+def visit(scraper, driver, customers, with_ids):
+    driver.load_page(customers)
+    clients = [{"nom": customer["name"], "client_id": str(customer["id"]) if with_ids else None}
+               for customer in customers]
+    return scraper.harvest_client_ids(clients), clients
+
+
+def test_network_capture_starts_after_first_missing_id(tmp_path):
+    scraper = PharmaScraper.__new__(PharmaScraper)
+    scraper.download_dir = str(tmp_path / "downloads")
+    scraper.capture_network, scraper.network_capture_active = True, False
+    scraper._driver = driver = StubDriver()
+    scraper._set_network_capture(False)  # Comme au lancement du driver
+
+    # Identifiants dans le tableau : pas de capture, rien ne s'accumule
+    for page in range(3):
+        assert visit(scraper, driver, [{"id": page, "name": f"Client {page}"}], with_ids=True)[0] == 0
+    assert driver.log == [] and driver.commands == ["Network.disable"]
+
+    # Premier identifiant manquant : capture démarrée, fiche ouverte pour cette page
+    assert visit(scraper, driver, [{"id": 10, "name": "Client 10"}], with_ids=False)[0] == 1
+    assert driver.network and scraper.network_capture_active
+
+    # Pages suivantes : journal vidé à chaque page, même sans identifiant manquant
+    assert visit(scraper, driver, [{"id": 11, "name": "Client 11"}], with_ids=True)[0] == 0
+    assert driver.log == []
+    missing, clients = visit(scraper, driver, [{"id": 12, "name": "Client  12"}], with_ids=False)
+    assert missing == 0 and clients[0]["client_id"] == "12"
+    assert driver.log == []
@@ -0,0 +1,89 @@
+"""Relevés par tranches de dates : découpage (split_date_range) et fusion (parse_pdf_shards)."""
+import threading
+import time
+import pytest
+from core.download_control import AdaptiveLimiter
+from core.scraper import PharmaScraper, split_date_range
+from core.pdf_processor import parse_pdf_shards
+from benchmarks.synthetic_statement import generate_rows, generate_statement
+
+CLIENT = {"nom": "Client Test"}
+
+
+def test_split_date_range_by_year():
+    assert split_date_range("2017-03-15", "2019-02-01") == [
+        ("2017-03-15", "2017-12-31"), ("2018-01-01", "2018-12-31"), ("2019-01-01", "2019-02-01"),
+    ]
+
+
+def test_split_date_range_by_quarter():
+    assert split_date_range("2024-11-20", "2025-04-10", "quarter") == [
+        ("2024-11-20", "2024-12-31"), ("2025-01-01", "2025-03-31"), ("2025-04-01", "2025-04-10"),
+    ]
+
+
+def test_split_date_range_single_day_and_empty():
+    assert split_date_range("2025-04-10", "2025-04-10", "quarter") == [("2025-04-10", "2025-04-10")]
+    assert split_date_range("2025-04-11", "2025-04-10") == []
+
+
+def test_split_date_range_rejects_unknown_period():
+    with pytest.raises(ValueError):
+        split_date_range("2025-01-01", "2025-12-31", "month")
+
+
+def write_shard(tmp_path, name, n_lines, solde_initial, seed):
+    pdf_path = str(tmp_path / name)
+    generate_statement(pdf_path, n_lines=n_lines, solde_initial=solde_initial, seed=seed)
+    return pdf_path, [row[4] for row in generate_rows(n_lines, solde_initial, seed)]
+
+
+def test_parse_pdf_shards_chains_negative_balances(tmp_path):
+    first, first_soldes = write_shard(tmp_path, "2017.pdf", 40, -100000.0, seed=4)
+    assert first_soldes[-1] < 0
+    second, second_soldes = write_shard(tmp_path, "2018.pdf", 40, first_soldes[-1], seed=5)
+    records, solde_final = parse_pdf_shards(
+        [("2017-01-01", "2017-12-31", first), ("2018-01-01", "2018-12-31", second)], CLIENT
+    )
+    assert [record["solde"] for record in records] == pytest.approx(first_soldes + second_soldes)
+    assert solde_final == pytest.approx(second_soldes[-1])
+
+
+def test_parse_pdf_shards_warns_on_balance_gap(tmp_path, capsys):
+    first, first_soldes = write_shard(tmp_path, "2017.pdf", 40, 1500.0, seed=4)
+    # Solde initial de la tranche suivante décalé de 50 par rapport au solde final précédent
+    second, second_soldes = write_shard(tmp_path, "2018.pdf", 40, first_soldes[-1] + 50, seed=5)
+    records, _ = parse_pdf_shards(
+        [("2017-01-01", "2017-12-31", first), ("2018-01-01", "2018-12-31", second)], CLIENT
+    )
+    assert "solde final de la tranche précédente" in capsys.readouterr().out
+    # Solde courant enchaîné depuis la tranche précédente, comme une analyse unique
+    assert [record["solde"] for record in records] == pytest.approx(
+        first_soldes + [solde - 50 for solde in second_soldes]
+    )
+
+
+class FakeScraper:
+    """Téléchargement simulé : note le nombre de créneaux du limiteur occupés pendant chaque requête."""
+
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self.in_flight = []
+        self.lock = threading.Lock()
+
+    def download_detailed_pdf_api_with_requests(self, client, start_date, end_date, timeout=30, in_memory=False):
+        with self.lock:
+            self.in_flight.append(self.limiter.in_flight)
+        time.sleep(0.05)
+        return f"{start_date}.pdf"
+
+
+def test_download_shards_takes_one_limiter_slot_per_request():
+    limiter = AdaptiveLimiter(initial=2, max_limit=2)
+    scraper = FakeScraper(limiter)
+    results = PharmaScraper.download_detailed_pdf_shards(scraper, CLIENT, "2017-01-01", "2020-12-31", "year",
+                                                         max_workers=4, limiter=limiter)
+    assert [pdf_file for _, _, pdf_file in results] == ["2017-01-01.pdf", "2018-01-01.pdf", "2019-01-01.pdf",
+                                                        "2020-01-01.pdf"]
+    assert len(scraper.in_flight) == 4 and max(scraper.in_flight) <= 2
+    assert limiter.in_flight == 0 and len(limiter.outcomes) == 4
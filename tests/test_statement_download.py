@@ -0,0 +1,56 @@
+"""Réception des relevés (StatementBuffer) : mémoire, fichier temporaire et taille minimale."""
+import io
+import os
+import pytest
+import core.statement_download
+from core.statement_download import MIN_PDF_BYTES, StatementBuffer
+from runners.detailed_pdf import discard_pdf
+
+CLIENT = {"nom": "Client Test"}
+SPOOL_MAX_BYTES = 4096
+
+
+@pytest.fixture(autouse=True)
+def small_spool(monkeypatch):
+    monkeypatch.setattr(core.statement_download, "PDF_SPOOL_MAX_BYTES", SPOOL_MAX_BYTES)
+
+
+def receive(size, chunk_size=1000):
+    buffer = StatementBuffer(CLIENT)
+    body = b"%PDF" + b"x" * (size - 4)
+    for start in range(0, size, chunk_size):
+        buffer.write(body[start:start + chunk_size])
+    return buffer, body
+
+
+def test_small_statement_stays_in_memory():
+    buffer, body = receive(SPOOL_MAX_BYTES)
+    pdf_file = buffer.result()
+    assert isinstance(pdf_file, io.BytesIO) and pdf_file.read() == body
+    assert buffer.spool_path is None
+
+
+def test_large_statement_spills_to_temp_file():
+    buffer, body = receive(3 * SPOOL_MAX_BYTES)
+    pdf_file = buffer.result()
+    try:
+        assert isinstance(pdf_file, str) and pdf_file == buffer.spool_path
+        with open(pdf_file, "rb") as f:
+            assert f.read() == body
+    finally:
+        discard_pdf(pdf_file)
+    assert not os.path.exists(pdf_file)
+
+
+def test_discard_removes_temp_file_after_failure():
+    buffer, _ = receive(2 * SPOOL_MAX_BYTES)
+    spool_path = buffer.spool_path
+    assert os.path.exists(spool_path)
+    buffer.discard()
+    assert not os.path.exists(spool_path)
+
+
+def test_short_body_is_rejected():
+    buffer, _ = receive(MIN_PDF_BYTES - 1)
+    with pytest.raises(Exception, match="trop petit"):
+        buffer.result()
@@ -13,6 +13,8 @@ import threading
 from config.config import AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_REGION, AWS_BUCKET
 from core.s3_utils import download_from_s3
 from core.scraper import PharmaScraper
+from database.db_manager import DBManager
+from core.reconciliation import TYPE_LABELS
 
 def verify_credentials(login, password):
     scraper = PharmaScraper()
@@ -165,6 +167,8 @@ def display_work_interface(login, password, db_path, s3_db_name):
     if "s3_downloaded" not in st.session_state:
         with st.spinner("Chargement depuis S3..."):
             download_from_s3(AWS_BUCKET, s3_db_name, db_path)
+            # Migrations du schéma (index, colonnes) si la base téléchargée est ancienne
+            DBManager(db_path)
             st.session_state.s3_downloaded = True
 
     menu_option = st.sidebar.radio("Menu", ("Recherche des clients", "Ventes détaillées par client"))
@@ -245,35 +249,36 @@ def display_work_interface(login, password, db_path, s3_db_name):
                 cursor = conn.cursor()
                 cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='simple_transactions'")
                 if cursor.fetchone():
-                    df_simple = pd.read_sql_query("SELECT * FROM simple_transactions WHERE nom = ?", conn,
-                                                  params=(selected_client,))
-                    if not df_simple.empty:
+                    # Totaux et soldes lus dans client_summary, tenu à jour à chaque sauvegarde
+                    summary = DBManager(db_path).get_client_summary(selected_client)
+                    if summary is not None:
                         st.subheader(f"Mouvements pour {selected_client}")
-
-                        solde_initial = df_simple.iloc[0]["solde"] - df_simple.iloc[0]["total"]
-                        st.write(f"🔹 Solde initial (recalculé) : **{solde_initial:.2f}**")
-
-                        libelles = df_simple["libelle"].str.lower()
-                        total_ventes = df_simple[libelles.str.contains("vente") & ~libelles.str.contains(
-                            "paiement") & ~libelles.str.contains("retour")]["total"].sum()
-                        total_paiements = df_simple[libelles.str.contains("paiement")]["total"].sum()
-                        total_avoirs = df_simple[libelles.str.contains("avoir")]["total"].sum()
-                        total_retours = df_simple[libelles.str.contains("retour")]["total"].sum()
+                        st.write(f"🔹 Solde initial (recalculé) : **{summary['solde_initial']:.2f}**")
 
                         st.markdown(f"""
-                        - 💰 **Total ventes :** {total_ventes:.2f}  
-                        - 🔻 **Total paiements :** {total_paiements:.2f}  
-                        - 🟢 **Total avoirs :** {total_avoirs:.2f}  
-                        - 🔁 **Total retours :** {total_retours:.2f}
+                        - 💰 **Total ventes :** {summary['total_ventes']:.2f}  
+                        - 🔻 **Total paiements :** {summary['total_paiements']:.2f}  
+                        - 🟢 **Total avoirs :** {summary['total_avoirs']:.2f}  
+                        - 🔁 **Total retours :** {summary['total_retours']:.2f}  
+                        - 📅 **Dernier mouvement :** {summary['last_date']} ({summary['nb_lignes']} lignes)
                         """)
 
-                        st.dataframe(df_simple[["date", "reference", "libelle", "total", "solde"]].style.format({
+                        # Filtre sur la colonne type (entier indexé) plutôt que sur le texte des libellés
+                        selected_types = st.multiselect("Types de mouvements", list(TYPE_LABELS),
+                                                        default=list(TYPE_LABELS), format_func=TYPE_LABELS.get,
+                                                        key="detailed_types")
+                        df_simple = pd.read_sql_query(
+                            "SELECT nom, date, reference, libelle, total, solde, type FROM simple_transactions "
+                            f"WHERE nom = ? AND type IN ({', '.join('?' * len(selected_types)) or 'NULL'}) "
+                            "ORDER BY date, ordre", conn, params=(selected_client, *selected_types))
+                        df_simple["type"] = df_simple["type"].map(TYPE_LABELS)
+                        st.dataframe(df_simple[["date", "reference", "type", "libelle", "total", "solde"]].style.format({
                             "total": "{:.2f}", "solde": "{:.2f}"
                         }).set_properties(**{"text-align": "right"}), use_container_width=True)
 
                         df_solde = pd.read_sql_query("SELECT solde FROM solde_final WHERE nom=?", conn,
                                                      params=(selected_client,))
-                        solde_final_calcule = df_simple.iloc[-1]["solde"]
+                        solde_final_calcule = summary["solde_final"]
                         if not df_solde.empty:
                             solde_final_pdf = float(df_solde.iloc[0]["solde"])
                             st.markdown(f"""✅ **Solde final (calculé)** : {solde_final_calcule:.2f}  